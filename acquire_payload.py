@@ -0,0 +1,142 @@
+import base64
+import json
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+MULTIPART_MEDIA_TYPE = "multipart/mixed"
+CHUNK_SIZE = 64 * 1024
+
+BLOB_CONTENT_TYPES = {
+    "xz_array": "application/octet-stream",
+    "image_jpeg": "image/jpeg",
+}
+
+
+def make_blob(sensor_type: str, fmt: str, value: bytes, acquisition_time: str) -> Dict[str, Any]:
+    """Raw sensor payload kept as bytes until the response format is known."""
+    return {
+        "type": sensor_type,
+        "format": fmt,
+        "value": value,
+        "acquisition_time": acquisition_time,
+    }
+
+
+def wants_multipart(accept: Optional[str]) -> bool:
+    """True if the client asked for the multipart/mixed response via the Accept header."""
+    if not accept:
+        return False
+    return any(part.split(";")[0].strip().lower() == MULTIPART_MEDIA_TYPE for part in accept.split(","))
+
+
+def blobs_to_json(blobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """JSON schema 1.0 sensors list: every blob base64-encoded inline."""
+    return [
+        {
+            "type": blob["type"],
+            "raw_data": {
+                "format": blob["format"],
+                "value": base64.b64encode(blob["value"]).decode("utf-8"),
+            },
+            "acquisition_time": blob["acquisition_time"],
+        }
+        for blob in blobs
+    ]
+
+
+def blobs_to_references(blobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Sensors list for the multipart response. Each raw_data.value is a
+    "cid:" reference to the Content-ID of the part carrying the raw bytes.
+    """
+    return [
+        {
+            "type": blob["type"],
+            "raw_data": {
+                "format": blob["format"],
+                "value": f"cid:sensor-{idx}",
+            },
+            "acquisition_time": blob["acquisition_time"],
+        }
+        for idx, blob in enumerate(blobs)
+    ]
+
+
+def new_boundary() -> str:
+    return f"acquire-{uuid.uuid4().hex}"
+
+
+def iter_multipart(document: Dict[str, Any], blobs: List[Dict[str, Any]], boundary: str) -> Iterator[bytes]:
+    """
+    Yield a multipart/mixed body: one application/json part with the response
+    document followed by one part per sensor blob. Blobs are sliced through a
+    memoryview so large images are streamed without extra copies.
+    """
+    delimiter = f"--{boundary}\r\n".encode("ascii")
+
+    body = json.dumps(document).encode("utf-8")
+    yield delimiter
+    yield (
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode("ascii")
+    yield body
+    yield b"\r\n"
+
+    for idx, blob in enumerate(blobs):
+        value = memoryview(blob["value"])
+        content_type = BLOB_CONTENT_TYPES.get(blob["format"].split(";")[0], "application/octet-stream")
+        yield delimiter
+        yield (
+            f"Content-Type: {content_type}\r\n"
+            f"Content-ID: <sensor-{idx}>\r\n"
+            f"X-Sensor-Format: {blob['format']}\r\n"
+            f"Content-Length: {len(value)}\r\n\r\n"
+        ).encode("ascii")
+        for offset in range(0, len(value), CHUNK_SIZE):
+            yield bytes(value[offset:offset + CHUNK_SIZE])
+        yield b"\r\n"
+
+    yield f"--{boundary}--\r\n".encode("ascii")
+
+
+def benchmark(xz_size: int = 5000, image_size: int = 2 * 1024 * 1024, repeat: int = 20) -> Dict[str, Dict[str, float]]:
+    """
+    Compare bytes on the wire and server CPU time of the JSON and multipart
+    responses for one profiler (XZ + image) and one camera image.
+    """
+    import os
+    import time
+    import zlib
+
+    import numpy as np
+
+    xz = np.stack([np.arange(xz_size, dtype=np.float32), np.sin(np.arange(xz_size) / 10.0).astype(np.float32)], axis=1)
+    blobs = [
+        make_blob("profiler", "xz_array", zlib.compress(xz.tobytes()), "2025-01-01T00:00:00Z"),
+        make_blob("profiler", "image_jpeg", os.urandom(image_size // 4), "2025-01-01T00:00:00Z"),
+        make_blob("camera", "image_jpeg", os.urandom(image_size), "2025-01-01T00:00:00Z"),
+    ]
+    document = {"metadata": {}, "data": {"sensors": []}, "analytics": {"objects": []}}
+
+    def run_json():
+        doc = dict(document, data={"sensors": blobs_to_json(blobs)})
+        return len(json.dumps(doc).encode("utf-8"))
+
+    def run_multipart():
+        doc = dict(document, data={"sensors": blobs_to_references(blobs)})
+        return sum(len(chunk) for chunk in iter_multipart(doc, blobs, new_boundary()))
+
+    results = {}
+    for name, fn in (("json", run_json), ("multipart", run_multipart)):
+        start = time.process_time()
+        for _ in range(repeat):
+            size = fn()
+        cpu_ms = (time.process_time() - start) * 1000.0 / repeat
+        results[name] = {"bytes": size, "cpu_ms": cpu_ms}
+    return results
+
+
+if __name__ == "__main__":
+    for name, stats in benchmark().items():
+        print(f"{name:>10}: {stats['bytes']:>10d} bytes, {stats['cpu_ms']:.2f} ms CPU per response")
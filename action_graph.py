@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+class ActionGraph:
+    """
+    Runs the actions of one position as a dependency graph.
+
+    Each node is a callable; a node starts as soon as all of its
+    dependencies have finished, so independent nodes run concurrently on
+    the given executor. A node may return a follow-up callable (persistence
+    or analysis) which is started in the background and is not waited for.
+    A failed node is logged and treated as finished so its dependents (e.g.
+    the robot resume) still run.
+    """
+
+    def __init__(self, nodes, dependencies=None):
+        self.nodes = dict(nodes)
+        # Dependencies on nodes that are not part of this graph are dropped
+        self.dependencies = {
+            name: [dep for dep in (dependencies or {}).get(name, []) if dep in self.nodes and dep != name]
+            for name in self.nodes
+        }
+        self._check_cycles()
+
+    def _check_cycles(self):
+        remaining = {name: set(deps) for name, deps in self.dependencies.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Action dependencies contain a cycle: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def run(self, executor, background=None):
+        """
+        Execute the graph. `background(fn)` starts follow-up callables.
+        Returns {node: {"start_ms", "end_ms", "duration_ms", "error"}} relative to the call.
+        """
+        t0 = time.perf_counter()
+        timings = {}
+        done = set()
+        running = {}
+
+        def timed(name):
+            start = time.perf_counter()
+            error = None
+            follow_up = None
+            try:
+                follow_up = self.nodes[name]()
+            except Exception as e:
+                error = str(e)
+                print(f"[Actions] {name} failed: {e}")
+            end = time.perf_counter()
+            timings[name] = {
+                "start_ms": round((start - t0) * 1000, 1),
+                "end_ms": round((end - t0) * 1000, 1),
+                "duration_ms": round((end - start) * 1000, 1),
+                "error": error,
+            }
+            return follow_up
+
+        while len(done) < len(self.nodes):
+            for name, deps in self.dependencies.items():
+                if name not in done and name not in running.values() and all(d in done for d in deps):
+                    running[executor.submit(timed, name)] = name
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                done.add(name)
+                follow_up = future.result()
+                if callable(follow_up) and background is not None:
+                    background(follow_up)
+        return timings
+
+
+def format_timings(timings):
+    """One line per node ordered by start time, e.g. 'Camera        12.0 ->  95.3 ms'."""
+    lines = []
+    for name, t in sorted(timings.items(), key=lambda item: item[1]["start_ms"]):
+        suffix = f"  ERROR: {t['error']}" if t["error"] else ""
+        lines.append(f"{name:<16}{t['start_ms']:8.1f} -> {t['end_ms']:8.1f} ms{suffix}")
+    return "\n".join(lines)
@@ -3,27 +3,55 @@ import uuid
 import yaml
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import atexit
-import oxapi
 import datetime
-
-from frameGrab import Camera
-from plcController import PlcCommunicate
+import json
+import numpy as np
+
+from action_graph import ActionGraph, format_timings
+from devices import DeviceSession
+from frame_persister import FramePersister
+from profile_filter import ProfileFilter
+from profile_grid import EncoderSweep
+from profile_stats import RunningProfileStats
+from height_map import HeightMap
+from area_detector import AreaConfig, AreaDetector
+from temporal_codec import TemporalProfileWriter
+from laser_line import LaserLineConfig, LaserLineExtractor, save_line
 from weldInspector import WeldInspector
 
+# Node -> nodes it waits for. Resume fires once every sensor has exposed;
+# saving, inspection and the profiler captures continue in the background.
+# Nodes that drive the same ox client, in the order they must run. Each one
+# waits for all earlier ones directly, as absent nodes are dropped from a graph.
+SERIAL_PROFILER_NODES = ("LaserImage", "Profiler_center", "Profiler")
+
+DEFAULT_ACTION_DEPENDENCIES = {
+    "Camera": ["Light"],
+    "LaserImage": ["Setup"],
+    "Profiler_center": ["Setup", "LaserImage"],
+    # The sweep starts as the node finishes, so GetImage and the center capture are done by then
+    "Profiler": ["Setup", "LaserImage", "Profiler_center"],
+    "Light_Off": ["Camera"],
+    "Resume": ["Camera", "LaserImage", "Profiler", "Profiler_center", "Light_Off"],
+}
+
 def load_config():
     with open("Config/config.yaml", "r") as f:
         return yaml.safe_load(f)
 
 class Acquisition:
-    def __init__(self, config):
+    def __init__(self, config, devices=None):
         self.config = config
-        self.plc = PlcCommunicate("127.0.0.1",12345)
-        self.camera = Camera(camStr='Nahar_VI')
-
-        c_thread1 = threading.Thread(target=self.camera.initialize)
-        c_thread1.start()
+        # Warm device connections shared with the HTTP API when one is passed in
+        if devices is None:
+            devices = DeviceSession(config)
+            devices.open()
+        self.devices = devices
+        self.plc = self.devices.plc
+        self.camera = self.devices.camera
 
         self.position_actions = {
     int(k): [str(action) for action in v]
@@ -33,16 +61,46 @@ class Acquisition:
         self.inspector = WeldInspector(config)
         self.use_camera = config.get("Use_Camera", True)
         self.exposure_map = config.get("Position_Exposure", {})
+        self.pixel_format_map = config.get("Position_Pixel_Format") or {}
+        self.readout_config = {int(k): v for k, v in (config.get("Position_Camera_Readout") or {}).items()}
+        self.encoder_capture = {int(k): v for k, v in (config.get("Profiler_Encoder_Capture") or {}).items()}
+        self.height_map_config = config.get("Profiler_Height_Map") or {}
+        self.center_recording = config.get("Profiler_Center_Recording") or {}
+        self.center_stats_config = config.get("Profiler_Center_Stats") or {}
+        self.area_detector = AreaDetector(AreaConfig(**(config.get("Area_Detection") or {})))
+        self.laser_line = LaserLineExtractor(LaserLineConfig(**(config.get("Laser_Line") or {})))
+        self.action_dependencies = self.load_action_dependencies(config)
+        self.action_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="action")
+        persistence = config.get("Frame_Persistence") or {}
+        self.persister = FramePersister(persistence.get("raw_images", "link"), persistence.get("jpeg_quality", 95))
 
         self.last_position = -1
         self.was_home = True
         self.session_id = None
         self.output_dir = None
 
-        self.profiler = None
-        self._init_profiler()
         atexit.register(self._disconnect_profiler)
+        atexit.register(self.persister.close)
+        atexit.register(self.inspector.save_templates)
         
+    @staticmethod
+    def load_action_dependencies(config):
+        """
+        Configured dependencies merged over the defaults. Resume must still
+        wait for every stationary sensor node, or the robot would move
+        during an exposure, and the profiler nodes must stay serialized.
+        """
+        configured = (config.get("Action_Graph") or {}).get("dependencies") or {}
+        dependencies = {**DEFAULT_ACTION_DEPENDENCIES, **configured}
+        missing = set(DEFAULT_ACTION_DEPENDENCIES["Resume"]) - set(dependencies.get("Resume") or [])
+        if missing:
+            raise ValueError(f"Action_Graph: Resume must depend on {sorted(missing)}")
+        for i, node in enumerate(SERIAL_PROFILER_NODES):
+            missing = set(SERIAL_PROFILER_NODES[:i]) - set(dependencies.get(node) or [])
+            if missing:
+                raise ValueError(f"Action_Graph: {node} shares the profiler and must depend on {sorted(missing)}")
+        return dependencies
+
     def generate_session_id(self):
         counter_file = "session_counter.txt"
         prefix = "TVS"
@@ -72,130 +130,289 @@ class Acquisition:
 
 
 
-    def _init_profiler(self):
-        try:
-            self.profiler = oxapi.ox("192.168.0.250", 1234)
-            self.profiler.Connect()
-            self.profiler.Login("admin", "")
-            print("[Profiler] Connected and logged in.")
-        except Exception as e:
-            print(f"[Profiler] Connection failed: {e}")
-            self.profiler = None
+    @property
+    def profiler(self):
+        return self.devices.profiler
 
     def _ensure_profiler_ready(self):
-        if self.profiler is None:
-            print("[Profiler] Not connected. Reconnecting...")
-            self._init_profiler()
-        return self.profiler is not None
+        return self.devices.ensure_profiler()
 
     def _disconnect_profiler(self):
-        if self.profiler:
-            print("[Profiler] Disconnecting...")
-            self.profiler.Disconnect()
+        self.devices.close()
+
+    def _start_encoder_sweep(self, position_no):
+        """
+        Switch the profiler to encoder-step triggering for this position.
+        Returns (sweep, previous_trigger) or (None, None) if not configured.
+        """
+        encoder_cfg = self.encoder_capture.get(position_no)
+        if not encoder_cfg:
+            return None, None
+
+        # The whole configuration is read before the sensor is touched, so a
+        # config error cannot leave it in encoder-triggered mode
+        try:
+            x_start, x_stop, x_step = encoder_cfg["x_grid"]
+            sweep = EncoderSweep(
+                np.arange(x_start, x_stop + x_step * 0.5, x_step),
+                encoder_cfg["travel_step"],
+                encoder_cfg.get("mm_per_count", 1.0),
+            )
+            trigger = (encoder_cfg["trigger_mode"], encoder_cfg.get("trigger_option", 0), 0, encoder_cfg["encoder_steps"])
+        except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+            print(f"[Profiler] Invalid Profiler_Encoder_Capture for position {position_no}, capturing free running: {e!r}")
+            return None, None
+
+        try:
+            previous_trigger = self.profiler.GetTrigger()
+        except Exception as e:
+            print(f"[Profiler] Encoder trigger setup failed, capturing free running: {e}")
+            return None, None
+        try:
+            self.profiler.ConfigureTrigger(*trigger)
+        except Exception as e:
+            print(f"[Profiler] Encoder trigger setup failed, capturing free running: {e}")
+            try:
+                self.profiler.ConfigureTrigger(*previous_trigger)
+            except Exception as e:
+                print(f"[Profiler] Could not restore trigger configuration: {e}")
+            return None, None
+
+        print(f"[Profiler] Encoder trigger every {encoder_cfg['encoder_steps']} steps for position {position_no}")
+        return sweep, previous_trigger
+
+    def _finish_encoder_sweep(self, sweep, previous_trigger, profiler_dir):
+        try:
+            self.profiler.ConfigureTrigger(*previous_trigger)
+        except Exception as e:
+            print(f"[Profiler] Could not restore trigger configuration: {e}")
+
+        if len(sweep) == 0:
+            print("[Profiler] No profiles passed the ingest filter, sweep not saved.")
+            return
+        travel, x_grid, z = sweep.finish()
+        sweep_path = os.path.join(profiler_dir, "sweep.npz")
+        np.savez(sweep_path, travel=travel, x=x_grid, z=z)
+        print(f"[Profiler] {len(sweep)} profiles resampled to {z.shape} grid: {sweep_path}")
+
+    def _start_height_map(self, position_no, profiler_dir):
+        cfg = self.height_map_config
+        if position_no not in cfg.get("positions", []):
+            return None
+        x_start, x_stop, x_step = cfg["x_grid"]
+        return HeightMap(
+            os.path.join(profiler_dir, "height_map"),
+            np.arange(x_start, x_stop + x_step * 0.5, x_step),
+            capacity=cfg.get("capacity", 512),
+        )
+
+    def _append_to_height_map(self, height_map, profiles):
+        use_encoder = self.height_map_config.get("coordinate", "encoder") == "encoder"
+        x_list, z_list, coords = [], [], []
+        for (_, _, _, _, _, _, timestamp, length, encoder, x, z, _) in profiles:
+            if z is None or length < 2:
+                continue
+            x_list.append(np.asarray(x, dtype=np.float64))
+            z_list.append(np.asarray(z, dtype=np.float64))
+            coords.append(encoder if use_encoder else timestamp)
+        height_map.append_profiles(x_list, z_list, coords)
 
     def take_profiler_center(self, position_no):
         if not self._ensure_profiler_ready():
             return
 
-        stream = self.profiler.CreateStream()
-        stream.Start()
-        stream.ClearMeasurementQueue()
+        stream = self.devices.profiler_stream
+        try:
+            stream.arm(position_no)
+        except RuntimeError as e:
+            print(f"[Profiler] Center capture for position {position_no} skipped: {e}")
+            return
 
         timestamp_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         profiler_dir = os.path.join("profiler_centers", f"pos_{position_no}_{timestamp_str}")
         os.makedirs(profiler_dir, exist_ok=True)
-        log_path = os.path.join(profiler_dir, "profile_center.txt")
-
-        print(f"[Profiler] Capturing center values for position {position_no} (5 seconds)")
-
+        ingest = ProfileFilter(self.config)
+        recording = self.center_recording
+        mode = recording.get("mode", "text")  # text, delta or stats
+        # The capture ends early once the center profile's confidence interval is below tolerance
+        stop = self.center_stats_config
+        max_duration = stop.get("max_duration", 5.0)
+        tolerance = stop.get("tolerance")
+        z_score = stop.get("z_score", 1.96)
+        coverage = stop.get("coverage", 0.95)
+        min_profiles = stop.get("min_profiles", 20)
+
+        print(f"[Profiler] Capturing center values for position {position_no} (up to {max_duration} s, {mode})")
+
+        f = None
+        writer = None
+        center_stats = RunningProfileStats(stop.get("max_points", 2048))
+        converged = False
+        start_time = time.time()
+        last = False
         try:
-            start_time = time.time()
-            with open(log_path, "w") as f:
-                while time.time() - start_time < 5:
-                    time.sleep(0.005)
-
-                    if stream.GetProfileCount() > 0:
-                        (
-                            blockId, confiMode, ntpSync, valid,
-                            alarm, quality, timestamp, length,
-                            encoder, x, z, i
-                        ) = stream.ReadProfile()
-
+            while not last:
+                time.sleep(0.005)
+                # The last read flushes what the transport still holds back
+                last = time.time() - start_time >= max_duration
+
+                profiles = ingest.filter(stream.read_available(position_no, flush=last))
+                if not profiles:
+                    continue
+                center_stats.update([p[9] for p in profiles], [p[10] for p in profiles])
+
+                if mode == "delta":
+                    if writer is None:
+                        writer = TemporalProfileWriter(
+                            os.path.join(profiler_dir, "profile_center.xzs"),
+                            keyframe_interval=recording.get("keyframe_interval", 32),
+                            precision=recording.get("precision", 3),
+                            codec=recording.get("codec", "zlib"),
+                            level=recording.get("level", 1),
+                        )
+                    for profile in profiles:
+                        writer.append(profile[9], profile[10])
+                elif mode == "text":
+                    for (
+                        blockId, confiMode, ntpSync, valid,
+                        alarm, quality, timestamp, length,
+                        encoder, x, z, i
+                    ) in profiles:
+                        if f is None:
+                            f = open(os.path.join(profiler_dir, "profile_center.txt"), "w")
                         f.write(f"Timestamp: {timestamp}, Length: {length}\n")
                         f.write("X: " + ",".join(map(str, x)) + "\n")
                         f.write("Z: " + ",".join(map(str, z)) + "\n\n")
 
+                if tolerance is not None and center_stats.converged(tolerance, z_score, coverage, min_profiles):
+                    converged = True
+                    break
+
         except Exception as e:
             print(f"[Profiler] Error: {e}")
-
-        stream.Stop()
-        print(f"[Profiler] Finished center value capture for position {position_no}")
+        finally:
+            # Closed before anything else can raise, so the next position can arm
+            stats = stream.disarm(position_no)
+            if f is not None:
+                f.close()
+            if writer is not None:
+                writer.close()
+            audit = ingest.write_audit(os.path.join(profiler_dir, "ingest_audit.json"))
+
+        duration = time.time() - start_time
+        center_ci = center_stats.center_ci(z_score, coverage)
+        if center_stats.profiles:
+            center_stats.save(
+                os.path.join(profiler_dir, "profile_center_stats.npz"),
+                duration_s=duration, converged=converged, center_ci=center_ci,
+                tolerance=np.nan if tolerance is None else tolerance,
+            )
+        print(f"[Profiler] Center of position {position_no}: {center_stats.profiles} profiles in {duration:.2f} s, "
+              f"CI +-{center_ci:.4f}{' (converged)' if converged else ''}")
+        print(f"[Profiler] Finished center value capture for position {position_no}: {stats}, "
+              f"kept {audit['kept']}, dropped {audit['dropped_by_reason']}")
 
     def collect_profiler_data(self, position_no):
         if not self._ensure_profiler_ready():
             return
 
-        stream = self.profiler.CreateStream()
-        stream.Start()
-        stream.ClearMeasurementQueue()
-
         timestamp_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         profiler_dir = os.path.join("profiler_data", f"pos_{position_no}_{timestamp_str}")
         os.makedirs(profiler_dir, exist_ok=True)
         log_path = os.path.join(profiler_dir, "profile_log.txt")
+        ingest = ProfileFilter(self.config)
+        height_map = None
+
+        # Armed after the trigger switch so free-running profiles are dropped;
+        # from here on every exit restores the previous trigger
+        sweep, previous_trigger = self._start_encoder_sweep(position_no)
+        stream = self.devices.profiler_stream
+        try:
+            stream.arm(position_no)
+        except RuntimeError as e:
+            print(f"[Profiler] Capture for position {position_no} skipped: {e}")
+            if sweep is not None:
+                self._finish_encoder_sweep(sweep, previous_trigger, profiler_dir)
+            return
 
         print(f"[Profiler] Started for position {position_no}")
 
+        # The log and height map are only created once a profile passes the
+        # ingest filter, so an empty sweep writes nothing but the audit.
+        f = None
+        last = False
         try:
-            with open(log_path, "w") as f:
-                while True:
-                    time.sleep(0.005)
-                    current_position = self.plc.read_registers(self.registers["Position_No"])
-                    robot_home = self.plc.read_registers(self.registers["Robot_Home"])
-                    if robot_home == 1 or current_position != position_no:
-                        print(f"[Profiler] Ending capture for position {position_no}")
-                        break
-
-                    if stream.GetProfileCount() > 0:
-                        (
-                            blockId, confiMode, ntpSync, valid,
-                            alarm, quality, timestamp, length,
-                            encoder, x, z, i
-                        ) = stream.ReadProfile()
-
-                        f.write(f"Timestamp: {timestamp}, Length: {length}\n")
-                        f.write("X: " + ",".join(map(str, x)) + "\n")
-                        f.write("Z: " + ",".join(map(str, z)) + "\n\n")
+            while not last:
+                time.sleep(0.005)
+                current_position = self.plc.read_registers(self.registers["Position_No"])
+                robot_home = self.plc.read_registers(self.registers["Robot_Home"])
+                if robot_home == 1 or current_position != position_no:
+                    print(f"[Profiler] Ending capture for position {position_no}")
+                    last = True
+
+                # The last read flushes what the transport still holds back
+                profiles = ingest.filter(stream.read_available(position_no, flush=last))
+                if not profiles:
+                    continue
+                if f is None:
+                    f = open(log_path, "w")
+                    height_map = self._start_height_map(position_no, profiler_dir)
+                for (
+                    blockId, confiMode, ntpSync, valid,
+                    alarm, quality, timestamp, length,
+                    encoder, x, z, i
+                ) in profiles:
+                    f.write(f"Timestamp: {timestamp}, Length: {length}\n")
+                    f.write("X: " + ",".join(map(str, x)) + "\n")
+                    f.write("Z: " + ",".join(map(str, z)) + "\n\n")
+                    if sweep is not None:
+                        sweep.append(encoder, x, z)
+                if height_map is not None:
+                    self._append_to_height_map(height_map, profiles)
 
         except Exception as e:
             print(f"[Profiler] Error: {e}")
-
-        stream.Stop()
-
-    def capture_laser_image(self, position_no):
+        finally:
+            # Closed before anything else can raise, so the next position can arm
+            stats = stream.disarm(position_no)
+            if f is not None:
+                f.close()
+            audit = ingest.write_audit(os.path.join(profiler_dir, "ingest_audit.json"))
+            if sweep is not None:
+                self._finish_encoder_sweep(sweep, previous_trigger, profiler_dir)
+
+        print(f"[Profiler] Capture stats for position {position_no}: {stats}, "
+              f"kept {audit['kept']}, dropped {audit['dropped_by_reason']}")
+
+        if height_map is not None:
+            rows = height_map.finish()
+            print(f"[Profiler] Height map with {rows} rows written to {height_map.directory}")
+            blobs = self.area_detector.detect_height_map(HeightMap.load(height_map.directory))
+            with open(os.path.join(profiler_dir, "area_blobs.json"), "w") as f:
+                json.dump([blob.to_dict() for blob in blobs], f, indent=2)
+
+    def grab_laser_image(self, position_no):
+        """Exposure part of LaserImage: read the raw sensor image. Returns the GetImage() result or None."""
         if not self._ensure_profiler_ready():
-            return
+            return None
 
-        try:
-            width, height, maxPixels = self.profiler.GetImageInfo()
-            print(f"[LaserImage] Image info: {width}x{height}, Max Pixels: {maxPixels}")
-
-            retries = 2
-            success = False
-            for attempt in range(retries):
-                try:
-                    time.sleep(0.2)
-                    result = self.profiler.GetImage()
-                    success = True
-                    break
-                except Exception as e:
-                    print(f"[LaserImage] Attempt {attempt + 1} failed: {e}")
-                    time.sleep(0.2)  
+        width, height, maxPixels = self.profiler.GetImageInfo()
+        print(f"[LaserImage] Image info: {width}x{height}, Max Pixels: {maxPixels}")
 
-            if not success:
-                print("[LaserImage] Failed to acquire image after retries.")
-                return
+        retries = 2
+        for attempt in range(retries):
+            try:
+                return self.profiler.GetImage()
+            except Exception as e:
+                print(f"[LaserImage] Attempt {attempt + 1} failed: {e}")
+                time.sleep(0.2)
+
+        print("[LaserImage] Failed to acquire image after retries.")
+        return None
 
+    def save_laser_image(self, position_no, result):
+        """Persistence part of LaserImage: PNG plus the extracted laser line."""
+        try:
             roiHeight, roiWidth, rowOffset, colOffset, rowBinning, colBinning, pixels, saveImageFunc = result
 
             timestamp_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -206,8 +423,145 @@ class Acquisition:
             saveImageFunc(filename)
             print(f"[LaserImage] Saved: {filename}")
 
+            # Independent profile from the pixel buffer, to cross-check the sensor's own algorithm
+            image = np.asarray(pixels, dtype=np.uint8).reshape(roiHeight, roiWidth)
+            line = self.laser_line.extract(image, rowOffset, colOffset, rowBinning, colBinning)
+            save_line(os.path.splitext(filename)[0] + "_line.npz", line)
+            print(f"[LaserImage] Laser line found in {int(line['valid'].sum())}/{roiWidth} columns")
+
+        except Exception as e:
+            print(f"[LaserImage] Error during capture: {e}")
+
+    def capture_laser_image(self, position_no):
+        try:
+            result = self.grab_laser_image(position_no)
         except Exception as e:
             print(f"[LaserImage] Error during capture: {e}")
+            return
+        if result is not None:
+            self.save_laser_image(position_no, result)
+
+    def readout_window(self, position_no):
+        """
+        Sensor readout (window, binning) for a position, or None for the full
+        frame. The window is the weld ROI grown by the configured margin on
+        every side (room for alignment) unless given explicitly.
+        """
+        cfg = self.readout_config.get(position_no)
+        if not cfg:
+            return None
+        window = cfg.get("window")
+        if window is None:
+            ref_data = self.config["Weld_Reference_ROIs"].get(str(position_no))
+            if not ref_data:
+                return None
+            x, y, w, h = ref_data["roi"]
+            margin = cfg.get("margin", 64)
+            window = [max(x - margin, 0), max(y - margin, 0), w + 2 * margin, h + 2 * margin]
+        return window, cfg.get("binning", 1)
+
+    def grab_camera_frame(self, position_no):
+        """Exposure part of Camera. Returns (frame, origin); origin is None for full frames."""
+        if not self.use_camera:
+            raw_path = os.path.join("raw_images", f"pos_{position_no}.jpg")
+            if not os.path.exists(raw_path):
+                print(f"Raw image not found: {raw_path}. Skipping inspection.")
+                return None, None
+            frame = cv2.imread(raw_path)
+            if frame is None:
+                print(f"Failed to load raw image: {raw_path}")
+                return None, None
+            print(f"Loaded raw image instead of capturing: {raw_path}")
+            origin = None
+            origin_path = os.path.splitext(raw_path)[0] + ".origin.json"
+            if os.path.exists(origin_path):
+                with open(origin_path, "r") as f:
+                    origin = tuple(json.load(f))
+            return frame, origin
+
+        exposure = self.exposure_map.get(position_no, None)
+        if exposure is not None:
+            print(f"Setting exposure to {exposure} for position {position_no}")
+
+        pixel_format = self.pixel_format_map.get(position_no)
+        readout = self.readout_window(position_no)
+        if readout is not None:
+            frame, origin = self.devices.grab_window(readout[0], readout[1], exposure, pixel_format)
+        else:
+            frame, origin = self.devices.grab_frame(exposure, pixel_format), None
+        if frame is None:
+            print("Primary camera failed. Switching to webcam.")
+            cap = cv2.VideoCapture(0)
+            ret, frame = cap.read()
+            cap.release()
+            if not ret or frame is None:
+                print("Webcam capture failed. Skipping image save.")
+                return None, None
+            origin = None
+        return frame, origin
+
+    def save_and_inspect(self, position_no, frame, origin=None):
+        """Persistence and analysis part of Camera: the frame is inspected in memory while it is written."""
+        filename = os.path.join(self.output_dir, f"scan_position_{position_no}.jpg")
+        raw_copies = []
+        if self.use_camera:
+            raw_path = os.path.join("raw_images", f"pos_{position_no}.jpg")
+            raw_copies.append(raw_path)
+            # Windowed frames keep their sensor origin so the raw image can be re-inspected
+            origin_path = os.path.splitext(raw_path)[0] + ".origin.json"
+            if origin is not None:
+                os.makedirs("raw_images", exist_ok=True)
+                with open(origin_path, "w") as f:
+                    json.dump(list(origin), f)
+            elif os.path.exists(origin_path):
+                os.remove(origin_path)
+        self.persister.submit(frame, filename, raw_copies)
+        self.inspector.inspect(position_no, frame, origin)
+
+    def build_action_graph(self, position_no, actions):
+        """
+        Nodes for one position. Sensor nodes only expose; persistence and
+        analysis are returned as follow-ups and run after the graph moves on.
+        """
+        nodes = {}
+
+        if any(action in actions for action in ("LaserImage", "Profiler", "Profiler_center")):
+            # One LoadParameterSetup switches FOV, resampling and exposure for this position
+            nodes["Setup"] = lambda: self.devices.select_profiler_setup(position_no)
+
+        if "Light" in actions:
+            def light_on():
+                self.plc.write(self.registers["Light_Trigger"], 1)
+                time.sleep(0.01)
+            nodes["Light"] = light_on
+            nodes["Light_Off"] = lambda: self.plc.write(self.registers["Light_Trigger"], 0)
+
+        if "Camera" in actions:
+            def camera():
+                frame, origin = self.grab_camera_frame(position_no)
+                if frame is not None:
+                    return lambda: self.save_and_inspect(position_no, frame, origin)
+            nodes["Camera"] = camera
+
+        if "LaserImage" in actions:
+            def laser_image():
+                result = self.grab_laser_image(position_no)
+                if result is not None:
+                    return lambda: self.save_laser_image(position_no, result)
+            nodes["LaserImage"] = laser_image
+
+        # The profiler sweep runs until the robot leaves, so its node only starts it.
+        # The center capture needs the part stationary: Resume waits for it.
+        if "Profiler" in actions:
+            nodes["Profiler"] = lambda: lambda: self.collect_profiler_data(position_no)
+        if "Profiler_center" in actions:
+            nodes["Profiler_center"] = lambda: self.take_profiler_center(position_no)
+
+        nodes["Resume"] = self.resume_robot
+        return ActionGraph(nodes, self.action_dependencies)
+
+    def run_background(self, fn):
+        threading.Thread(target=fn, daemon=True).start()
 
     def check_and_acquire(self):
         print("In Acquire")
@@ -248,70 +602,11 @@ class Acquisition:
             actions = self.position_actions.get(position_no, [])
             print(f"Actions for position {position_no}: {actions}")
 
-            if "Light" in actions:
-                self.plc.write(self.registers["Light_Trigger"], 1)
-                time.sleep(0.01)
-
-            if "Camera" in actions:
-                filename = os.path.join(self.output_dir, f"scan_position_{position_no}.jpg")
-
-                if self.use_camera:
-                    exposure = self.exposure_map.get(position_no, None)
-                    if exposure is not None:
-                        print(f"Setting exposure to {exposure} for position {position_no}")
-                        self.camera.expo_control(exposure)
-
-                    frame = self.camera.get_image_mv()
-                    if frame is None:
-                        print("Primary camera failed. Switching to webcam.")
-                        cap = cv2.VideoCapture(0)
-                        ret, frame = cap.read()
-                        cap.release()
-                        if not ret or frame is None:
-                            print("Webcam capture failed. Skipping image save.")
-                            return
-
-                    cv2.imwrite(filename, frame)
-                    print(f"Image saved to {filename}")
-
-                    raw_dir = os.path.join("raw_images")
-                    os.makedirs(raw_dir, exist_ok=True)
-                    raw_path = os.path.join(raw_dir, f"pos_{position_no}.jpg")
-                    cv2.imwrite(raw_path, frame)
-                    print(f"Raw image saved to {raw_path}")
-                    # self.plc.write(11, 1)
-                    # time.sleep(0.8)
-                    # self.plc.write(11, 0)
-                    # print("DONE")
-                    
-                else:
-                    raw_path = os.path.join("raw_images", f"pos_{position_no}.jpg")
-                    if not os.path.exists(raw_path):
-                        print(f"Raw image not found: {raw_path}. Skipping inspection.")
-                        return
-                    frame = cv2.imread(raw_path)
-                    if frame is None:
-                        print(f"Failed to load raw image: {raw_path}")
-                        return
-                    cv2.imwrite(filename, frame)
-                    print(f"Loaded raw image instead of capturing: {raw_path}")
-
-                threading.Thread(target=self.inspector.inspect, args=(position_no, filename), daemon=True).start()
-
-            if "LaserImage" in actions:
-                self.capture_laser_image(position_no)
-
-            if "Profiler" in actions:
-                threading.Thread(target=self.collect_profiler_data, args=(position_no,), daemon=True).start()
-
-            if "Profiler_center" in actions:
-                threading.Thread(target=self.take_profiler_center, args=(position_no,), daemon=True).start()
-
-            if "Light" in actions:
-                self.plc.write(self.registers["Light_Trigger"], 0)
-
-            self.resume_robot()
+            timings = self.build_action_graph(position_no, actions).run(self.action_executor, self.run_background)
             print("------------------- [ROBOT] Operations Resumed ------------------------------")
+            print(f"[Actions] Position {position_no} dwell {timings['Resume']['end_ms']:.1f} ms\n{format_timings(timings)}")
+            with open(os.path.join(self.output_dir, "action_timings.jsonl"), "a") as f:
+                f.write(json.dumps({"position_no": position_no, "time": time.time(), "nodes": timings}) + "\n")
             time.sleep(0.001)
 
 if __name__ == "__main__":
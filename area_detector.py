@@ -0,0 +1,174 @@
+import time
+import warnings
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+import numpy as np
+from scipy import ndimage
+from scipy.signal import savgol_filter
+
+
+@dataclass
+class AreaConfig:
+    ROW_WINDOW: int = 101         # Savitzky-Golay window along X (points)
+    ROW_POLYORDER: int = 2
+    COLUMN_BLOCK: int = 400       # Rows per block for the column-wise median surface
+    THRESHOLD: float = 8.0        # Multiplier for median absolute deviation
+    MIN_DEPTH: float = 30.0       # Minimum |residual| to consider a point part of a blob
+    MIN_AREA: int = 20            # Minimum blob size in grid cells
+    CONNECTIVITY: int = 2         # 1: 4-connected, 2: 8-connected
+
+
+@dataclass
+class AreaBlob:
+    type: str          # "hole" (below surface) or "nut" (above surface)
+    row_min: int
+    row_max: int
+    col_min: int
+    col_max: int
+    x_min: float
+    x_max: float
+    y_min: float
+    y_max: float
+    area: int          # grid cells
+    depth: float       # mean residual height (negative for holes)
+    peak: float        # extreme residual height
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class AreaDetector:
+    """
+    Finds holes and nuts on a 2-D height map (rows = profiles, columns = X).
+
+    The surface is removed with a separable robust trend (column-wise median
+    across profiles, then Savitzky-Golay along each profile), so a feature
+    that spans many profiles is found once as one connected component.
+    """
+
+    def __init__(self, config: Optional[AreaConfig] = None):
+        self.config = config or AreaConfig()
+
+    def _column_surface(self, z: np.ndarray) -> np.ndarray:
+        """
+        Column-wise median surface: the median of each column over blocks of
+        COLUMN_BLOCK rows, linearly interpolated between block centers. Features
+        shorter than half a block along the travel axis do not affect it.
+        """
+        rows, cols = z.shape
+        block = max(1, min(self.config.COLUMN_BLOCK, rows))
+        n_blocks = -(-rows // block)
+        padded = np.full((n_blocks * block, cols), np.nan, dtype=np.float32)
+        padded[:rows] = z
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+            medians = np.nanmedian(padded.reshape(n_blocks, block, cols), axis=1)
+        medians = np.where(np.isfinite(medians), medians, 0.0)
+        if n_blocks == 1:
+            return np.broadcast_to(medians[0], (rows, cols))
+
+        centers = (np.arange(n_blocks) * block + (block - 1) / 2.0)
+        row_idx = np.arange(rows, dtype=np.float64)
+        i1 = np.clip(np.searchsorted(centers, row_idx, side="right"), 1, n_blocks - 1)
+        i0 = i1 - 1
+        w = np.clip((row_idx - centers[i0]) / (centers[i1] - centers[i0]), 0.0, 1.0)[:, None]
+        return (medians[i0] * (1.0 - w) + medians[i1] * w).astype(np.float32)
+
+    def detrend(self, z: np.ndarray, valid: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Residual height map (NaN where invalid).
+        1. subtract the column-wise median surface (part shape along X)
+        2. subtract a row-wise Savitzky-Golay trend of the remainder (per-profile
+           drift), fitted with points beyond +-MIN_DEPTH/2 zeroed so features do
+           not pull the trend towards themselves
+        """
+        cfg = self.config
+        z = np.asarray(z, dtype=np.float32)
+        if valid is None:
+            valid = np.isfinite(z)
+        else:
+            valid = np.asarray(valid, dtype=bool) & np.isfinite(z)
+
+        masked = np.where(valid, z, np.nan).astype(np.float32)
+        residual = masked - self._column_surface(masked)
+
+        rows, cols = residual.shape
+        clip = cfg.MIN_DEPTH / 2.0
+        inliers = valid & (np.abs(np.where(valid, residual, 0.0)) <= clip)
+        clipped = np.where(inliers, residual, 0.0)
+        window = min(cfg.ROW_WINDOW, cols if cols % 2 else cols - 1)
+        if window > cfg.ROW_POLYORDER:
+            residual = residual - savgol_filter(clipped, window, cfg.ROW_POLYORDER, axis=1)
+
+        residual = residual.astype(np.float32)
+        residual[~valid] = np.nan
+        return residual
+
+    def detect(self, z: np.ndarray, x: np.ndarray, y: np.ndarray,
+               valid: Optional[np.ndarray] = None) -> List[AreaBlob]:
+        """
+        Detect blobs on a height map.
+        - z: (rows, cols) heights
+        - x: (cols,) X coordinate of each column
+        - y: (rows,) travel coordinate of each row (encoder or timestamp)
+        """
+        cfg = self.config
+        if z.size == 0 or z.shape[0] < 3 or z.shape[1] < 3:
+            return []
+
+        residual = self.detrend(z, valid)
+        finite = np.isfinite(residual)
+        if not finite.any():
+            return []
+
+        values = residual[finite]
+        med = np.median(values)
+        mad = np.median(np.abs(values - med))
+        threshold = max(cfg.THRESHOLD * mad, cfg.MIN_DEPTH)
+
+        filled = np.where(finite, residual, 0.0)
+        structure = ndimage.generate_binary_structure(2, cfg.CONNECTIVITY)
+        blobs = []
+        for feature_type, mask in (("hole", filled < med - threshold), ("nut", filled > med + threshold)):
+            labels, count = ndimage.label(mask, structure=structure)
+            if count == 0:
+                continue
+            index = np.arange(1, count + 1)
+            areas = ndimage.sum_labels(mask, labels, index)
+            depths = ndimage.mean(filled, labels, index)
+            peaks = (ndimage.minimum if feature_type == "hole" else ndimage.maximum)(filled, labels, index)
+            for label_idx, bbox in enumerate(ndimage.find_objects(labels)):
+                if bbox is None or areas[label_idx] < cfg.MIN_AREA:
+                    continue
+                row_slice, col_slice = bbox
+                blobs.append(AreaBlob(
+                    type=feature_type,
+                    row_min=int(row_slice.start),
+                    row_max=int(row_slice.stop - 1),
+                    col_min=int(col_slice.start),
+                    col_max=int(col_slice.stop - 1),
+                    x_min=float(x[col_slice.start]),
+                    x_max=float(x[col_slice.stop - 1]),
+                    y_min=float(y[row_slice.start]),
+                    y_max=float(y[row_slice.stop - 1]),
+                    area=int(areas[label_idx]),
+                    depth=float(depths[label_idx]),
+                    peak=float(peaks[label_idx]),
+                ))
+        return blobs
+
+    def detect_height_map(self, height_map: dict) -> List[AreaBlob]:
+        """Run detect() on a map opened with HeightMap.load()."""
+        start = time.perf_counter()
+        z = np.asarray(height_map["z"])
+        valid = np.asarray(height_map["valid"])
+        blobs = self.detect(z, height_map["x"], np.asarray(height_map["coords"]), valid)
+        print(f"[AreaDetector] {len(blobs)} blobs on {z.shape} map in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return blobs
+
+
+def detect_height_map_in_worker(directory: str, config: Optional[AreaConfig] = None) -> List[dict]:
+    """Process-pool entry point: load a finished height map and detect blobs."""
+    from height_map import HeightMap
+    return [blob.to_dict() for blob in AreaDetector(config).detect_height_map(HeightMap.load(directory))]
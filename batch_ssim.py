@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+from scipy.ndimage import uniform_filter
+
+# Same constants as skimage.metrics.structural_similarity defaults for uint8
+WIN_SIZE = 7
+K1, K2 = 0.01, 0.03
+DATA_RANGE = 255.0
+
+
+def local_stats(images, win_size=WIN_SIZE):
+    """
+    Local mean and sample variance of a (N, h, w) stack over win_size x
+    win_size windows. Returns (images as float32, mean, variance); the
+    reference side of batch_ssim, computed once per reference set and ROI.
+    """
+    x = np.ascontiguousarray(images, dtype=np.float32)
+    size = (1, win_size, win_size)
+    cov_norm = win_size ** 2 / (win_size ** 2 - 1)
+    ux = uniform_filter(x, size)
+    vx = uniform_filter(x * x, size)
+    vx -= ux * ux
+    vx *= cov_norm
+    return x, ux, vx
+
+
+def batch_ssim(ref_stats, test, win_size=WIN_SIZE, data_range=DATA_RANGE):
+    """
+    SSIM of one test image against every reference of a stack in a single
+    vectorized pass. ref_stats comes from local_stats(). Returns (scores of
+    shape (N,), SSIM maps of shape (N, h, w)). Matches skimage's
+    structural_similarity with its defaults (uniform window, sample
+    covariance, border of win_size // 2 excluded from the mean).
+    """
+    x, ux, vx = ref_stats
+    y, uy, vy = local_stats(np.asarray(test)[None], win_size)
+    size = (1, win_size, win_size)
+    cov_norm = win_size ** 2 / (win_size ** 2 - 1)
+    vxy = uniform_filter(x * y, size)
+    vxy -= ux * uy
+    vxy *= cov_norm
+
+    c1 = (K1 * data_range) ** 2
+    c2 = (K2 * data_range) ** 2
+    s = (2 * ux * uy + c1) * (2 * vxy + c2)
+    s /= (ux * ux + uy * uy + c1) * (vx + vy + c2)
+    pad = (win_size - 1) // 2
+    scores = s[:, pad:s.shape[1] - pad, pad:s.shape[2] - pad].mean(axis=(1, 2), dtype=np.float64)
+    return scores, s
+
+
+if __name__ == "__main__":
+    from skimage.metrics import structural_similarity
+
+    rng = np.random.default_rng(0)
+    h, w = 505, 560
+    base = np.clip(128 + 60 * np.sin(np.arange(w) / 9.0)[None, :] + rng.normal(0, 8, (h, w)), 0, 255)
+    test = np.clip(base + rng.normal(0, 10, (h, w)), 0, 255).astype(np.uint8)
+    print(f"ROI {w}x{h}")
+    for n in (1, 2, 4, 8, 16):
+        refs = np.clip(base[None] * rng.uniform(0.8, 1.2, (n, 1, 1)) + rng.normal(0, 10, (n, h, w)), 0, 255)
+        refs = refs.astype(np.uint8)
+
+        start = time.perf_counter()
+        expected = [structural_similarity(r, test, full=True)[0] for r in refs]
+        loop_s = time.perf_counter() - start
+
+        stats = local_stats(refs)
+        start = time.perf_counter()
+        scores, _ = batch_ssim(stats, test)
+        batch_s = time.perf_counter() - start
+
+        error = float(np.abs(scores - expected).max())
+        assert error < 1e-4, f"batch SSIM differs from skimage by {error}"
+        print(f"N={n:2d}  skimage x N {loop_s * 1000:7.1f} ms  batch {batch_s * 1000:6.1f} ms  "
+              f"({loop_s / batch_s:4.1f}x)  max |diff| {error:.1e}")
@@ -0,0 +1,237 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from profiler_setups import ProfilerSetupManager
+from profiler_stream import ProfilerStreamManager
+
+
+class DeviceSession:
+    """
+    Opens the profiler, camera and PLC once and keeps them warm.
+
+    Each device gets its own single-worker executor, so driver calls are
+    serialized per device while different devices run concurrently. The
+    blocking methods are used by the PLC loop in app.py; the *_async
+    variants are used by the FastAPI endpoints in main.py.
+
+    Driver modules are imported on open so main.py still runs on its
+    placeholders where the SDKs are not installed.
+    """
+
+    def __init__(self, config):
+        plc_cfg = config.get("PLC", {})
+        profiler_cfg = config.get("Profiler", {})
+        camera_cfg = config.get("Camera", {})
+
+        self.registers = config.get("PLC_Registers", {})
+        self.plc_host = plc_cfg.get("host", plc_cfg.get("IP", "127.0.0.1"))
+        self.plc_port = plc_cfg.get("port", plc_cfg.get("Port", 12345))
+        self.profiler_ip = profiler_cfg.get("ip", "192.168.0.250")
+        self.profiler_port = profiler_cfg.get("port", 1234)
+        self.profiler_role = profiler_cfg.get("role", "admin")
+        self.profiler_password = profiler_cfg.get("password", "")
+        self.camera_name = camera_cfg.get("name", "Nahar_VI")
+
+        self.plc = None
+        self.camera = None
+        self.profiler = None
+        self.profiler_lock = threading.Lock()
+        transport = config.get("Profiler_Stream", {}).get("transport", "oxstream")
+        if transport == "udp":
+            # udp_ingest's datagram layout has not been checked against the sensor's
+            # UDP profile format yet, so profiles would be decoded from guessed offsets
+            raise ValueError(
+                "Profiler_Stream.transport 'udp' is not supported yet: the datagram layout in "
+                "udp_ingest.py is unverified against the sensor firmware. Use 'oxstream'."
+            )
+        if transport != "oxstream":
+            raise ValueError(f"Unknown Profiler_Stream.transport '{transport}', expected 'oxstream'")
+        self.profiler_stream = ProfilerStreamManager(config)
+        self.profiler_setups = ProfilerSetupManager(config)
+
+        self.executors = {
+            name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+            for name in ("plc", "camera", "profiler")
+        }
+
+    # ------------------------------------------------------------------ lifecycle
+
+    def open(self, use_camera=True, use_profiler=True):
+        self.open_plc()
+        if use_camera:
+            self.open_camera()
+        if use_profiler:
+            self.open_profiler()
+
+    def open_plc(self):
+        from plcController import PlcCommunicate
+        self.plc = PlcCommunicate(self.plc_host, self.plc_port)
+        if not self.plc.connect():
+            print(f"[Devices] PLC {self.plc_host}:{self.plc_port} not reachable, will retry on use.")
+
+    def open_camera(self):
+        try:
+            from frameGrab import Camera
+        except Exception as e:
+            print(f"[Devices] Camera driver unavailable: {e}")
+            return
+        self.camera = Camera(camStr=self.camera_name)
+        # initialize() enumerates, opens and then keeps the device connected
+        threading.Thread(target=self.camera.initialize, daemon=True).start()
+
+    def open_profiler(self):
+        with self.profiler_lock:
+            try:
+                import oxapi
+                self.profiler = oxapi.ox(self.profiler_ip, self.profiler_port)
+                self.profiler.Connect()
+                self.profiler.Login(self.profiler_role, self.profiler_password)
+                print("[Profiler] Connected and logged in.")
+            except Exception as e:
+                print(f"[Profiler] Connection failed: {e}")
+                self.profiler = None
+                return
+            # A bad setup or stream must not drop a working connection
+            self.profiler_setups.reset()
+            try:
+                self.profiler_setups.store_all(self.profiler)
+            except Exception as e:
+                print(f"[Profiler] Storing parameter setups failed: {e}")
+            try:
+                self.profiler_stream.open(self.profiler)
+            except Exception as e:
+                print(f"[Profiler] Stream setup failed: {e}")
+
+    def ensure_profiler(self):
+        if self.profiler is None:
+            print("[Profiler] Not connected. Reconnecting...")
+            self.open_profiler()
+        elif not self.profiler_stream.is_open():
+            try:
+                self.profiler_stream.open(self.profiler)
+            except Exception as e:
+                print(f"[Profiler] Stream setup failed: {e}")
+        return self.profiler is not None
+
+    def close(self):
+        self.profiler_stream.close()
+        if self.profiler is not None:
+            print("[Profiler] Disconnecting...")
+            try:
+                self.profiler.Disconnect()
+            except Exception as e:
+                print(f"[Profiler] Disconnect failed: {e}")
+            self.profiler = None
+        if self.camera is not None:
+            self.camera.close()
+        if self.plc is not None:
+            self.plc.close()
+        for executor in self.executors.values():
+            executor.shutdown(wait=False)
+
+    def camera_stats(self):
+        """Connection counters and reconnect latency of the camera, None without one."""
+        if self.camera is None:
+            return None
+        return dict(self.camera.reconnect_stats, connected=self.camera.g_bConnect)
+
+    # ------------------------------------------------------------------ blocking API
+
+    def read_position_no(self):
+        return self.plc.read_registers(self.registers["Position_No"])
+
+    def set_light(self, on):
+        return self.plc.write(self.registers["Light_Trigger"], 1 if on else 0)
+
+    def select_profiler_setup(self, position_no):
+        """Switch the profiler to the stored parameter setup for a position."""
+        if not self.ensure_profiler():
+            return
+        try:
+            self.profiler_setups.select(self.profiler, position_no)
+        except Exception as e:
+            print(f"[Profiler] Loading setup for position {position_no} failed: {e}")
+
+    def grab_frame(self, exposure=None, pixel_format=None):
+        """
+        Grab one frame from the warm camera stream: BGR, or single-channel for
+        pixel_format Mono8/BayerGray. Returns None if not connected.
+        """
+        if self.camera is None or not self.camera.g_bConnect:
+            return None
+        if exposure is not None:
+            self.camera.expo_control(exposure)
+        self.camera.set_output_format(pixel_format)
+        self.camera.set_readout(None)
+        return self.camera.get_image_mv()
+
+    def grab_window(self, window, binning=1, exposure=None, pixel_format=None):
+        """
+        Grab one frame reading out only `window` (x, y, w, h in full-resolution
+        pixels) of the sensor. Returns (frame, origin) where origin is the
+        (offset_x, offset_y, binning) actually applied, or (None, None). When
+        the window cannot be applied a full frame is grabbed with origin None.
+        """
+        if self.camera is None or not self.camera.g_bConnect:
+            return None, None
+        if exposure is not None:
+            self.camera.expo_control(exposure)
+        self.camera.set_output_format(pixel_format)
+        origin = self.camera.set_readout(window, binning)
+        if origin is None:
+            print("[Devices] Readout window not applied, grabbing the full frame")
+            if self.camera.set_readout(None) is None:
+                return None, None
+        return self.camera.get_image_mv(), origin
+
+    def read_profile(self):
+        """
+        Read the latest profile and raw laser image from the profiler.
+        Returns (xz_data, image, precision) with xz_data an (N, 2) float32 array in
+        sensor units, image the raw sensor image as a 2-D uint8 array and precision
+        the number of decimals the sensor reported the points with.
+        """
+        if not self.ensure_profiler():
+            raise RuntimeError("Profiler not connected")
+
+        quality, timestamp, precision, x_start, length, x, z = self.profiler.GetProfile()
+        scale = 10.0 ** -precision
+        xz_data = np.empty((length, 2), dtype=np.float32)
+        xz_data[:, 0] = np.asarray(x[:length], dtype=np.float32) * scale
+        xz_data[:, 1] = np.asarray(z[:length], dtype=np.float32) * scale
+
+        roi_height, roi_width, _, _, _, _, pixels, _ = self.profiler.GetImage()
+        image = np.asarray(pixels, dtype=np.uint8).reshape(roi_height, roi_width)
+        return xz_data, image, precision
+
+    # ------------------------------------------------------------------ async API
+
+    async def _run(self, device, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executors[device], fn, *args)
+
+    async def read_position_no_async(self):
+        return await self._run("plc", self.read_position_no)
+
+    async def set_light_async(self, on):
+        return await self._run("plc", self.set_light, on)
+
+    async def select_profiler_setup_async(self, position_no):
+        return await self._run("profiler", self.select_profiler_setup, position_no)
+
+    async def grab_frame_async(self, exposure=None, pixel_format=None):
+        return await self._run("camera", self.grab_frame, exposure, pixel_format)
+
+    async def read_profile_async(self):
+        return await self._run("profiler", self.read_profile)
+
+
+def encode_jpeg(image):
+    import cv2
+    ok, buf = cv2.imencode(".jpg", image)
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return buf.tobytes()
@@ -1,5 +1,4 @@
 # -- coding: utf-8 --
-import sys
 import psutil
 import cv2
 import numpy as np
@@ -20,6 +19,10 @@ gc.enable()
 # from presenceOrientationCheckService import yoloPresence
 
 
+class CameraError(Exception):
+    """Recoverable camera failure (replaces the former sys.exit() calls)."""
+
+
 winfun_ctype = CFUNCTYPE
 
 stMsgTyp = POINTER(c_uint)
@@ -38,86 +41,86 @@ class Camera:
         self.frame = None
         self.nPayloadSize = 0
         self.stFrameInfo = None
+        # BGR (colour, default), Mono8 (sensor sends Mono8) or BayerGray
+        # (sensor keeps its format, the SDK converts straight to gray)
+        self.output_format = "BGR"
+        self.default_pixel_format = None
+        # Sensor readout window: (offset_x, offset_y, binning) in full-resolution pixels
+        self.readout = (0, 0, 1)
+        self._readout_key = (None, 1)
+        self._buffers = {}
+        self.device_info = None
+        self.disconnect_event = threading.Event()
+        self.disconnected_at = None
+        self.reconnect_stats = {"connects": 0, "failures": 0, "last_latency_s": None, "max_latency_s": 0.0}
 
     def initialize(self):
+        """
+        Find the camera, open it and keep it connected until close().
+        Blocks; run it in a thread. Failures are logged and retried with
+        backoff instead of exiting the process.
+        """
         SDKVersion = MvCamera.MV_CC_GetSDKVersion()
         print("SDKVersion[0x%x]" % SDKVersion)
-
-        deviceList = MV_CC_DEVICE_INFO_LIST()
-        tlayerType = MV_GIGE_DEVICE | MV_USB_DEVICE
-
         self.CALL_BACK_FUN = EventInfoCallBack(self.exception_callback)
-        ret = MvCamera.MV_CC_EnumDevices(tlayerType, deviceList)
-        if ret != 0:
-            print("enum devices fail! ret[0x%x]" % ret)
-            sys.exit()
-
-        if deviceList.nDeviceNum == 0:
-            print("find no device!")
-            sys.exit()
-
-        print("Find %d devices!" % deviceList.nDeviceNum)
-
-        nConnectionNum = 0
-        print(deviceList.nDeviceNum, 'p'*9)
-        for i in range(0, deviceList.nDeviceNum):
-            mvcc_dev_info = cast(deviceList.pDeviceInfo[i], POINTER(
-                MV_CC_DEVICE_INFO)).contents
-            if mvcc_dev_info.nTLayerType == MV_GIGE_DEVICE:
-                print("\ngige device: [%d]" % i)
-                strModeName = ""
-
-                ##### CHANGED ###############
-                # for per in mvcc_dev_info.SpecialInfo.stGigEInfo.chUserDefinedName:
-                #    strModeName = strModeName + chr(per)
-                # print("device model name: %s" % strModeName)
-
-                # Print the MAC address
-                # mac_address = ':'.join(
-                #    format(x, '02x') for x in mvcc_dev_info.SpecialInfo.stGigEInfo.chMacAddress)
-                # print("MAC address: {}".format(mac_address))
-
-                # print("MAC address: {}".format(mvcc_dev_info.SpecialInfo.stGigEInfo.chMacAddress))
-
-                # cnt=0
-
-                ##########################################################
-                for per in mvcc_dev_info.SpecialInfo.stGigEInfo.chUserDefinedName:
-                    strModeName = strModeName + chr(per)
-                    # print(chr(per),cnt)
-                    # cnt+=1
-                print("device model name: %s" % strModeName)
-                # strModeName = repr(strModeName).split("\\")[0].split("'")[-1]
-                nConnectionNum = i
-                if str(strModeName) == self.camStrconvert(self.camStr):
-                    print('Connected... ', self.camStr)
-                    break
-
-                # nip1 = ((mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0xff000000) >> 24)
-                # nip2 = ((mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0x00ff0000) >> 16)
-                # nip3 = ((mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0x0000ff00) >> 8)
-                # nip4 = (mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp & 0x000000ff)
-                # print("current ip: %d.%d.%d.%d\n" % (nip1, nip2, nip3, nip4))
-
-        if int(nConnectionNum) >= deviceList.nDeviceNum:
-            print("intput error!")
-            sys.exit()
-
-        hThreadHandle = None
-        try:
-            hThreadHandle = threading.Thread(target=self.reconnect)
-            hThreadHandle.start()
-        except:
-            print("error: unable to start thread")
-
-        hThreadHandle.join()
+        self.reconnect()
         self.g_bConnect = False
         self.clear()
-        pass
 
     def exception_callback(self, msgType=0, pUser=None):
+        if self.g_bConnect:
+            self.disconnected_at = time.perf_counter()
         self.g_bConnect = False
-        pass
+        self.disconnect_event.set()
+
+    def close(self):
+        """Stop the reconnect loop; initialize() then releases the device."""
+        self.g_bExit = True
+        self.disconnect_event.set()
+
+    @staticmethod
+    def _device_name(mvcc_dev_info):
+        if mvcc_dev_info.nTLayerType == MV_GIGE_DEVICE:
+            raw = mvcc_dev_info.SpecialInfo.stGigEInfo.chUserDefinedName
+        else:
+            raw = mvcc_dev_info.SpecialInfo.stUsb3VInfo.chUserDefinedName
+        return bytes(raw).split(b"\x00", 1)[0].decode("ascii", "ignore")
+
+    @staticmethod
+    def _device_id(mvcc_dev_info):
+        """Serial number and (for GigE) IP of a device, for logs."""
+        if mvcc_dev_info.nTLayerType == MV_GIGE_DEVICE:
+            info = mvcc_dev_info.SpecialInfo.stGigEInfo
+            ip = info.nCurrentIp
+            address = "%d.%d.%d.%d" % ((ip >> 24) & 0xff, (ip >> 16) & 0xff, (ip >> 8) & 0xff, ip & 0xff)
+        else:
+            info = mvcc_dev_info.SpecialInfo.stUsb3VInfo
+            address = "usb"
+        serial = bytes(info.chSerialNumber).split(b"\x00", 1)[0].decode("ascii", "ignore")
+        return f"{serial}@{address}"
+
+    def find_device(self):
+        """Enumerate GigE/USB devices and cache the info of the one named camStr."""
+        deviceList = MV_CC_DEVICE_INFO_LIST()
+        ret = MvCamera.MV_CC_EnumDevices(MV_GIGE_DEVICE | MV_USB_DEVICE, deviceList)
+        if ret != 0:
+            raise CameraError("enum devices fail! ret[0x%x]" % ret)
+        if deviceList.nDeviceNum == 0:
+            raise CameraError("find no device!")
+
+        wanted = self.camStr[:15]
+        names = []
+        for i in range(0, deviceList.nDeviceNum):
+            mvcc_dev_info = cast(deviceList.pDeviceInfo[i], POINTER(MV_CC_DEVICE_INFO)).contents
+            name = self._device_name(mvcc_dev_info)
+            names.append(name)
+            if name == wanted:
+                # Copy: the list's memory is owned by the SDK enumeration
+                self.device_info = MV_CC_DEVICE_INFO()
+                memmove(byref(self.device_info), byref(mvcc_dev_info), sizeof(MV_CC_DEVICE_INFO))
+                print(f"Found camera {name} ({self._device_id(self.device_info)})")
+                return self.device_info
+        raise CameraError(f"camera {wanted} not among {names}")
 
     @staticmethod
     def camStrconvert(camStr):
@@ -165,127 +168,259 @@ class Camera:
             return None
 
 
-    def reconnect(self):
-        while True:
-            if self.g_bConnect:
-                time.sleep(1)
-                continue
+    def open_device(self, stDeviceList):
+        """Open a device from its cached info and start grabbing. Raises CameraError."""
+        self.cam = MvCamera()
+        ret = self.cam.MV_CC_CreateHandle(stDeviceList)
+        if ret != 0:
+            raise CameraError("create handle fail! ret[0x%x]" % ret)
 
-            self.clear()
+        ret = self.cam.MV_CC_OpenDevice(MV_ACCESS_Exclusive, 0)
+        if ret != 0:
+            raise CameraError("open device fail! ret[0x%x]" % ret)
 
-            print("connecting..........")
+        # ch:探测网络最佳包大小(只对GigE相机有效) | en:Detection network optimal package size(It only works for the GigE camera)
+        if stDeviceList.nTLayerType == MV_GIGE_DEVICE:
+            nPacketSize = self.cam.MV_CC_GetOptimalPacketSize()
+            if int(nPacketSize) > 0:
+                ret = self.cam.MV_CC_SetIntValue("GevSCPSPacketSize", nPacketSize)
+                if ret != 0:
+                    print("Warning: Set Packet Size fail! ret[0x%x]" % ret)
+            else:
+                print("Warning: Get Packet Size fail! ret[0x%x]" % nPacketSize)
 
-            deviceList = MV_CC_DEVICE_INFO_LIST()
+        # ch:设置触发模式为off | en:Set trigger mode as off
+        ret = self.cam.MV_CC_SetEnumValue("TriggerMode", MV_TRIGGER_MODE_OFF)
+        if ret != 0:
+            raise CameraError("set trigger mode fail! ret[0x%x]" % ret)
 
-            # ch:枚举设备 | en:Enum device
-            ret = MvCamera.MV_CC_EnumDevices(
-                MV_GIGE_DEVICE | MV_USB_DEVICE, deviceList)
-            if ret != 0:
-                print("enum devices fail! ret[0x%x]" % ret)
-                time.sleep(1)
-                continue
+        # ch:获取数据包大小 | en:Get payload size
+        stParam = MVCC_INTVALUE()
+        memset(byref(stParam), 0, sizeof(MVCC_INTVALUE))
+        ret = self.cam.MV_CC_GetIntValue("PayloadSize", stParam)
+        if ret != 0:
+            raise CameraError("get payload size fail! ret[0x%x]" % ret)
+        nPayloadSize = stParam.nCurValue
+
+        # The device keeps its pixel format and readout across reconnects;
+        # only the first connect defines the default format.
+        stEnum = MVCC_ENUMVALUE()
+        memset(byref(stEnum), 0, sizeof(MVCC_ENUMVALUE))
+        if self.cam.MV_CC_GetEnumValue("PixelFormat", stEnum) == 0:
+            if self.default_pixel_format is None:
+                self.default_pixel_format = stEnum.nCurValue
+            mono = stEnum.nCurValue == PixelType_Gvsp_Mono8 and self.default_pixel_format != PixelType_Gvsp_Mono8
+            self.output_format = "Mono8" if mono else "BGR"
+        self._readout_key = None  # unknown until set_readout() applies one
+
+        ret = self.cam.MV_CC_RegisterExceptionCallBack(self.CALL_BACK_FUN, None)
+        if ret != 0:
+            raise CameraError("exception callback fail! ret[0x%x]" % ret)
 
-            if deviceList.nDeviceNum == 0:
-                print("find no device!")
-                time.sleep(1)
-                continue
+        # ch:开始取流 | en:Start grab image
+        ret = self.cam.MV_CC_StartGrabbing()
+        if ret != 0:
+            raise CameraError("start grabbing fail! ret[0x%x]" % ret)
+        self.nPayloadSize = nPayloadSize
+        self.stFrameInfo = MV_FRAME_OUT_INFO_EX()
+        memset(byref(self.stFrameInfo), 0, sizeof(self.stFrameInfo))
 
-            print("Find %d devices!" % deviceList.nDeviceNum)
-
-            nConnectionNum = 0
-            # dev=[]
-            for i in range(0, deviceList.nDeviceNum):
-                mvcc_dev_info = cast(deviceList.pDeviceInfo[i], POINTER(
-                    MV_CC_DEVICE_INFO)).contents
-                print(mvcc_dev_info.SpecialInfo, '0'*6)
-                if mvcc_dev_info is None:
-                    continue
-                if mvcc_dev_info.nTLayerType == MV_GIGE_DEVICE:
-                    print("\ngige device: [%d]" % i)
-                    strModeName = ""
-                    for per in mvcc_dev_info.SpecialInfo.stGigEInfo.chUserDefinedName:
-                        strModeName = strModeName + chr(per)
-                    print("device model name: %s" % strModeName)
-                    # dev.append(strModeName)
-                    # print(repr(strModeName).split("\\")[0].split("'")[-1])
-                    nConnectionNum = i
-                    if str(strModeName) == self.camStrconvert(self.camStr):
-                        print('jiji', self.camStrconvert(self.camStr))
-                        break
-
-            if int(nConnectionNum) >= deviceList.nDeviceNum:
-                print("intput error!")
-                sys.exit()
-
-            # ch:创建相机实例 | en:Creat Camera Object
-            self.cam = MvCamera()
-
-            # ch:选择设备并创建句柄| en:Select device and create handle
-            stDeviceList = cast(deviceList.pDeviceInfo[int(
-                nConnectionNum)], POINTER(MV_CC_DEVICE_INFO)).contents
-
-            ret = self.cam.MV_CC_CreateHandle(stDeviceList)
-            if ret != 0:
-                print("create handle fail! ret[0x%x]" % ret)
-                sys.exit()
+    def reconnect(self):
+        """
+        Keep the camera connected. The matched device's info is cached, so a
+        reconnect reopens it directly; the device list is only enumerated
+        again when that fails (e.g. the camera got a new IP). Retries back off
+        from 0.1 s to 5 s. Grab buffers are kept across reconnects.
+        """
+        backoff = 0.1
+        while not self.g_bExit:
+            if self.g_bConnect:
+                self.disconnect_event.wait()
+                self.disconnect_event.clear()
+                continue
 
-            # ch:打开设备 | en:Open device
-            ret = self.cam.MV_CC_OpenDevice(MV_ACCESS_Exclusive, 0)
-            if ret != 0:
-                print("open device fail! ret[0x%x]" % ret)
-                sys.exit()
+            self.clear()
+            if self.disconnected_at is None:
+                self.disconnected_at = time.perf_counter()
+            print("connecting..........")
+            try:
+                if self.device_info is None:
+                    self.find_device()
+                try:
+                    self.open_device(self.device_info)
+                except CameraError as e:
+                    print(f"Reopening cached device failed ({e}), enumerating again.")
+                    self.clear()
+                    self.find_device()
+                    self.open_device(self.device_info)
+            except CameraError as e:
+                print(f"Camera connect failed: {e}. Retrying in {backoff:.1f} s")
+                self.clear()
+                self.reconnect_stats["failures"] += 1
+                self.disconnect_event.wait(backoff)
+                self.disconnect_event.clear()
+                backoff = min(backoff * 2, 5.0)
+                continue
 
+            latency = time.perf_counter() - self.disconnected_at
+            self.disconnected_at = None
+            backoff = 0.1
+            stats = self.reconnect_stats
+            stats["connects"] += 1
+            stats["last_latency_s"] = round(latency, 3)
+            stats["max_latency_s"] = max(stats["max_latency_s"], stats["last_latency_s"])
             self.g_bConnect = True
-
-            # ch:探测网络最佳包大小(只对GigE相机有效) | en:Detection network optimal package size(It only works for the GigE camera)
-            if stDeviceList.nTLayerType == MV_GIGE_DEVICE:
-                nPacketSize = self.cam.MV_CC_GetOptimalPacketSize()
-                if int(nPacketSize) > 0:
-                    ret = self.cam.MV_CC_SetIntValue(
-                        "GevSCPSPacketSize", nPacketSize)
-                    if ret != 0:
-                        print("Warning: Set Packet Size fail! ret[0x%x]" % ret)
-                else:
-                    print(
-                        "Warning: Get Packet Size fail! ret[0x%x]" % nPacketSize)
-
-            # ch:设置触发模式为off | en:Set trigger mode as off
-            ret = self.cam.MV_CC_SetEnumValue(
-                "TriggerMode", MV_TRIGGER_MODE_OFF)
+            print(f"Camera connected in {latency:.3f} s ({self._device_id(self.device_info)})")
+
+    def set_output_format(self, output_format=None):
+        """
+        Select the frame format returned by get_image_mv: BGR, Mono8 or BayerGray.
+        Mono8 switches the sensor's PixelFormat (grabbing is restarted and the
+        payload size re-read), which cuts transfer and memory by about 3x;
+        the other two keep the sensor's default format.
+        """
+        output_format = output_format or "BGR"
+        if output_format not in ("BGR", "Mono8", "BayerGray"):
+            print(f"Unknown output format {output_format}, using BGR")
+            output_format = "BGR"
+        if output_format == self.output_format or not self.g_bConnect:
+            return self.output_format == output_format
+
+        if output_format == "Mono8":
+            pixel_format = PixelType_Gvsp_Mono8
+        elif self.output_format == "Mono8":
+            pixel_format = self.default_pixel_format
+        else:
+            pixel_format = None
+
+        if pixel_format is not None:
+            self.cam.MV_CC_StopGrabbing()
+            ret = self.cam.MV_CC_SetEnumValue("PixelFormat", pixel_format)
             if ret != 0:
-                print("set trigger mode fail! ret[0x%x]" % ret)
-                sys.exit()
-
-            # ch:获取数据包大小 | en:Get payload size
+                print("set pixel format fail! ret[0x%x]" % ret)
             stParam = MVCC_INTVALUE()
             memset(byref(stParam), 0, sizeof(MVCC_INTVALUE))
-
-            ret = self.cam.MV_CC_GetIntValue("PayloadSize", stParam)
+            if self.cam.MV_CC_GetIntValue("PayloadSize", stParam) == 0:
+                self.nPayloadSize = stParam.nCurValue
+            self.cam.MV_CC_StartGrabbing()
             if ret != 0:
-                print("get payload size fail! ret[0x%x]" % ret)
-                sys.exit()
-            nPayloadSize = stParam.nCurValue
+                return False
 
-            ret = self.cam.MV_CC_RegisterExceptionCallBack(
-                self.CALL_BACK_FUN, None)
-            if ret != 0:
-                print("exception callback fail! ret[0x%x]" % ret)
-                sys.exit()
+        self.output_format = output_format
+        print(f"Camera output format: {output_format}")
+        return True
 
-            # ch:开始取流 | en:Start grab image
-            ret = self.cam.MV_CC_StartGrabbing()
-            if ret != 0:
-                print("start grabbing fail! ret[0x%x]" % ret)
-                sys.exit()
-            self.nPayloadSize = nPayloadSize
-            self.stFrameInfo = MV_FRAME_OUT_INFO_EX()
-            memset(byref(self.stFrameInfo), 0, sizeof(self.stFrameInfo))
-            # try:
-            #     hThreadHandle = threading.Thread(target=self.image_buf_thread, args=(nPayloadSize,))
-            #     hThreadHandle.start()
-            # except:
-            #     print("error: unable to start thread")
-        pass
+    def _get_int(self, name):
+        stParam = MVCC_INTVALUE()
+        memset(byref(stParam), 0, sizeof(MVCC_INTVALUE))
+        ret = self.cam.MV_CC_GetIntValue(name, stParam)
+        return stParam if ret == 0 else None
+
+    def _set_int(self, name, value):
+        ret = self.cam.MV_CC_SetIntValue(name, int(value))
+        if ret != 0:
+            print("set %s to %d fail! ret[0x%x]" % (name, value, ret))
+        return ret == 0
+
+    def set_readout(self, window=None, binning=1):
+        """
+        Read out only a window of the sensor.
+        window: (x, y, w, h) in full-resolution sensor pixels, None for the whole sensor.
+        binning: 1, 2 or 4 (BinningHorizontal/BinningVertical), if the camera supports it.
+        The window is snapped to the camera's increments and clamped to the sensor;
+        grabbing is restarted and the payload size re-read only when the readout
+        changes. Returns self.readout = (offset_x, offset_y, binning) of the applied
+        window in full-resolution pixels, or None when the camera is not connected
+        or the window could not be applied (the readout is then unknown).
+        """
+        if not self.g_bConnect:
+            return None
+        key = (tuple(window) if window else None, binning)
+        if key == self._readout_key:
+            return self.readout
+
+        self.cam.MV_CC_StopGrabbing()
+        try:
+            self._set_int("OffsetX", 0)
+            self._set_int("OffsetY", 0)
+            applied_binning = 1
+            if self.cam.MV_CC_SetEnumValue("BinningHorizontal", binning) == 0 and \
+                    self.cam.MV_CC_SetEnumValue("BinningVertical", binning) == 0:
+                applied_binning = binning
+            elif binning != 1:
+                print(f"Binning {binning} not supported, reading out without binning")
+                self.cam.MV_CC_SetEnumValue("BinningHorizontal", 1)
+                self.cam.MV_CC_SetEnumValue("BinningVertical", 1)
+
+            width_info = self._get_int("Width")
+            height_info = self._get_int("Height")
+            max_w, max_h = width_info.nMax, height_info.nMax
+            if window:
+                x, y, w, h = (int(v) // applied_binning for v in window)
+                w_inc, h_inc = max(width_info.nInc, 1), max(height_info.nInc, 1)
+                w = min(max(-(-w // w_inc) * w_inc, width_info.nMin), max_w)
+                h = min(max(-(-h // h_inc) * h_inc, height_info.nMin), max_h)
+            else:
+                x, y, w, h = 0, 0, max_w, max_h
+            self._set_int("Width", w)
+            self._set_int("Height", h)
+
+            offset_x = self._get_int("OffsetX")
+            offset_y = self._get_int("OffsetY")
+            x = min(max(x, 0), offset_x.nMax) // max(offset_x.nInc, 1) * max(offset_x.nInc, 1)
+            y = min(max(y, 0), offset_y.nMax) // max(offset_y.nInc, 1) * max(offset_y.nInc, 1)
+            self._set_int("OffsetX", x)
+            self._set_int("OffsetY", y)
+
+            payload = self._get_int("PayloadSize")
+            if payload is not None:
+                self.nPayloadSize = payload.nCurValue
+            self.readout = (x * applied_binning, y * applied_binning, applied_binning)
+            self._readout_key = key
+            print(f"Camera readout {w}x{h} at ({x}, {y}), binning {applied_binning}")
+        except Exception as e:
+            print(f"Setting camera readout failed: {e}")
+            # Some of the settings may have been applied: force the next call to set all of them
+            self._readout_key = None
+            return None
+        finally:
+            self.cam.MV_CC_StartGrabbing()
+        return self.readout
+
+    def _grab_buffer(self):
+        """Grab buffer for the current payload size, reused across frames (one per size)."""
+        buf = self._buffers.get(self.nPayloadSize)
+        if buf is None:
+            buf = (c_ubyte * self.nPayloadSize)()
+            self._buffers[self.nPayloadSize] = buf
+            if len(self._buffers) > 8:
+                self._buffers.pop(next(iter(self._buffers)))
+        return buf
+
+    def _gray_frame(self, data_buf):
+        """Single-channel frame: a Mono8 payload as is, any other pixel format converted to Mono8 by the SDK."""
+        width, height = self.stFrameInfo.nWidth, self.stFrameInfo.nHeight
+        if self.stFrameInfo.enPixelType == PixelType_Gvsp_Mono8:
+            self.frame = np.frombuffer(data_buf, np.uint8, count=width * height).reshape(height, width).copy()
+            return self.frame
+
+        dst_buf = (c_ubyte * (width * height))()
+        stConvertParam = MV_CC_PIXEL_CONVERT_PARAM()
+        memset(byref(stConvertParam), 0, sizeof(stConvertParam))
+        stConvertParam.nWidth = width
+        stConvertParam.nHeight = height
+        stConvertParam.pSrcData = data_buf
+        stConvertParam.nSrcDataLen = self.stFrameInfo.nFrameLen
+        stConvertParam.enSrcPixelType = self.stFrameInfo.enPixelType
+        stConvertParam.enDstPixelType = PixelType_Gvsp_Mono8
+        stConvertParam.pDstBuffer = dst_buf
+        stConvertParam.nDstBufferSize = width * height
+        ret = self.cam.MV_CC_ConvertPixelType(stConvertParam)
+        if ret != 0:
+            print("convert pixel to mono fail! ret[0x%x]" % ret)
+            return None
+        self.frame = np.frombuffer(dst_buf, np.uint8).reshape(height, width)
+        return self.frame
 
     def convert_pixel_format(self, data_buf, stFrameInfo):
         nparr = None
@@ -311,9 +446,7 @@ class Camera:
             ret = self.cam.MV_CC_ConvertPixelType(stConvertParam)
             print(">>>>> RET >>>>>>", ret)
             if ret != 0:
-                print("convert pixel fail! ret[0x%x]" % ret)
-                del data_buf
-                sys.exit()
+                raise CameraError("convert pixel fail! ret[0x%x]" % ret)
 
             # print("Convent OK")
             try:
@@ -352,7 +485,8 @@ class Camera:
         #print("Exposure Setting Completed")
         stFrameInfo = MV_FRAME_OUT_INFO_EX()
         memset(byref(stFrameInfo), 0, sizeof(stFrameInfo))
-        data_buf = (c_ubyte * self.nPayloadSize)()
+        data_buf = self._grab_buffer()
+        failed_grabs = 0
         previous = None
         nparr = []
         while True:
@@ -369,6 +503,14 @@ class Camera:
 
             ret = self.cam.MV_CC_GetOneFrameTimeout(
                 data_buf, self.nPayloadSize, self.stFrameInfo, 1000)
+            if ret != 0:
+                failed_grabs += 1
+                print("get one frame fail! ret[0x%x]" % ret)
+                if failed_grabs >= 3:
+                    return None
+                continue
+            if self.output_format != "BGR":
+                return self._gray_frame(data_buf)
 
             pDataForRGB = self.stFrameInfo.nWidth * self.stFrameInfo.nHeight * 3
             if pDataForRGB is not None:
@@ -390,11 +532,9 @@ class Camera:
                 stConvertParam.pDstBuffer = (c_ubyte * pDataForRGB)()
                 stConvertParam.nDstBufferSize = pDataForRGB
                 nRet = self.cam.MV_CC_ConvertPixelType(stConvertParam)
-                # print(ret)
-                if ret != 0:
-                    print("convert pixel fail! ret[0x%x]" % ret)
-                    del data_buf
-                    sys.exit()
+                if nRet != 0:
+                    print("convert pixel fail! ret[0x%x]" % nRet)
+                    return None
 
                 # print("Convent OK")
                 try:
@@ -442,7 +582,6 @@ class Camera:
                     raise Exception("save file executed failed")
                 # return nparr
                 if self.frame is not None:
-                    cv2.imwrite("MVS_Frame.jpg",self.frame)
                     return self.frame
                 else:
                     pass
@@ -467,6 +606,7 @@ class Camera:
                 print("destroy handle fail! ret[0x%x]" % ret)
                 # sys.exit()
                 # pass
+            self.cam = None
 
 
 # save_dir = "./bottleData/13Sept2022/"
@@ -0,0 +1,79 @@
+import os
+import queue
+import threading
+
+
+class FramePersister:
+    """
+    Background JPEG writer for grabbed frames.
+
+    Each frame is encoded once on a worker thread and written to its
+    primary path. Extra copies (raw_images/pos_N.jpg) are hard links to that
+    file, fall back to writing the same encoded bytes when linking is not
+    possible (other filesystem), or are skipped entirely.
+    """
+
+    def __init__(self, copies="link", jpeg_quality=95):
+        if copies not in ("link", "copy", "skip"):
+            raise ValueError(f"Unknown copy mode: {copies}")
+        self.copies = copies
+        self.jpeg_quality = jpeg_quality
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="frame-persister", daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, path, copy_paths=()):
+        """Queue a frame for writing. Returns immediately; the frame must not be modified afterwards."""
+        self.queue.put((frame, path, tuple(copy_paths)))
+
+    def _run(self):
+        import cv2
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            frame, path, copy_paths = item
+            try:
+                ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if not ok:
+                    raise RuntimeError("JPEG encoding failed")
+                data = buf.tobytes()
+                self._write(path, data)
+                print(f"Image saved to {path}")
+                if self.copies != "skip":
+                    for copy_path in copy_paths:
+                        self._copy(path, copy_path, data)
+                        print(f"Raw image saved to {copy_path}")
+            except Exception as e:
+                print(f"[FramePersister] Failed to save {path}: {e}")
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def _write(path, data):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def _copy(self, src, dst, data):
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        if self.copies == "link":
+            tmp = dst + ".tmp"
+            try:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                os.link(src, tmp)
+                os.replace(tmp, dst)
+                return
+            except OSError:
+                pass
+        self._write(dst, data)
+
+    def flush(self):
+        """Block until every queued frame is written."""
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
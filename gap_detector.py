@@ -159,4 +159,20 @@ class GapDetector:
         plt.ylabel('Z Height')
         plt.grid(True)
         plt.legend()
-        plt.show() 
\ No newline at end of file
+        plt.show() 
+
+
+_worker_detectors = {}
+
+
+def detect_gaps_in_worker(x_data: np.ndarray, z_data: np.ndarray, config: GapConfig) -> List[Tuple[float, float, float]]:
+    """
+    Process-pool entry point for gap detection.
+    Keeps one GapDetector per config in each worker so the GPU probe runs once.
+    """
+    key = tuple(sorted(config.__dict__.items()))
+    detector = _worker_detectors.get(key)
+    if detector is None:
+        detector = GapDetector(config)
+        _worker_detectors[key] = detector
+    return detector.detect_gaps(x_data, z_data)
@@ -0,0 +1,113 @@
+import json
+import os
+from typing import List
+
+import numpy as np
+
+from profile_grid import interp_rows, pad_profiles, sort_profile_rows
+
+
+class HeightMap:
+    """
+    2-D height map assembled from a profiler sweep.
+
+    Rows are profiles, columns are a common X grid. Z values, the per-row
+    coordinate (encoder value or timestamp) and a validity mask are written
+    incrementally into memory-mapped .npy files as profiles arrive, so the
+    map is complete as soon as the sweep ends. The files start at
+    `capacity` rows, double when full and are cut to the written rows by
+    finish(). HeightMap.load() opens a finished map read-only without
+    parsing anything.
+    """
+
+    def __init__(self, directory, x_grid, capacity=512):
+        self.directory = directory
+        self.x_grid = np.asarray(x_grid, dtype=np.float64)
+        self.capacity = capacity
+        self.rows = 0
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "x.npy"), self.x_grid)
+        self._open(capacity)
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def _open(self, capacity):
+        k = len(self.x_grid)
+        self.z = np.lib.format.open_memmap(self._path("z"), mode="w+", dtype=np.float32, shape=(capacity, k))
+        self.valid = np.lib.format.open_memmap(self._path("valid"), mode="w+", dtype=np.bool_, shape=(capacity, k))
+        self.coords = np.lib.format.open_memmap(self._path("coords"), mode="w+", dtype=np.float64, shape=(capacity,))
+        self.capacity = capacity
+
+    def _grow(self, needed):
+        """Double the backing files, keeping the rows written so far."""
+        new_capacity = max(needed, self.capacity * 2)
+        old = {
+            "z": np.array(self.z[:self.rows]),
+            "valid": np.array(self.valid[:self.rows]),
+            "coords": np.array(self.coords[:self.rows]),
+        }
+        self.flush()
+        del self.z, self.valid, self.coords
+        self._open(new_capacity)
+        self.z[:self.rows] = old["z"]
+        self.valid[:self.rows] = old["valid"]
+        self.coords[:self.rows] = old["coords"]
+
+    def append_profiles(self, x_list: List[np.ndarray], z_list: List[np.ndarray], coords: List[float]):
+        """Resample a batch of profiles onto the X grid and append them as rows."""
+        if not x_list:
+            return
+        x_rows, z_rows, lengths = pad_profiles(x_list, z_list)
+        x_rows, z_rows = sort_profile_rows(x_rows, z_rows, lengths)
+        z, valid = interp_rows(x_rows, z_rows, lengths, self.x_grid)
+
+        n = len(z)
+        if self.rows + n > self.capacity:
+            self._grow(self.rows + n)
+        self.z[self.rows:self.rows + n] = z
+        self.valid[self.rows:self.rows + n] = valid
+        self.coords[self.rows:self.rows + n] = coords
+        self.rows += n
+
+    def flush(self):
+        self.z.flush()
+        self.valid.flush()
+        self.coords.flush()
+        with open(os.path.join(self.directory, "height_map.json"), "w") as f:
+            json.dump({"rows": self.rows, "columns": len(self.x_grid)}, f)
+
+    def finish(self):
+        """Cut the files to the written rows and flush everything to disk. Returns the number of rows."""
+        if self.rows < self.capacity:
+            kept = {
+                "z": np.array(self.z[:self.rows]),
+                "valid": np.array(self.valid[:self.rows]),
+                "coords": np.array(self.coords[:self.rows]),
+            }
+            del self.z, self.valid, self.coords
+            for name, data in kept.items():
+                with open(self._path(name) + ".tmp", "wb") as f:
+                    np.save(f, data)
+                os.replace(self._path(name) + ".tmp", self._path(name))
+            self.z = np.load(self._path("z"), mmap_mode="r+")
+            self.valid = np.load(self._path("valid"), mmap_mode="r+")
+            self.coords = np.load(self._path("coords"), mmap_mode="r+")
+            self.capacity = self.rows
+        self.flush()
+        return self.rows
+
+    @staticmethod
+    def load(directory):
+        """
+        Open a finished height map read-only.
+        Returns a dict with x (k,), coords (n,), z (n, k) float32 and valid (n, k).
+        """
+        with open(os.path.join(directory, "height_map.json"), "r") as f:
+            rows = json.load(f)["rows"]
+        return {
+            "x": np.load(os.path.join(directory, "x.npy")),
+            "coords": np.load(os.path.join(directory, "coords.npy"), mmap_mode="r")[:rows],
+            "z": np.load(os.path.join(directory, "z.npy"), mmap_mode="r")[:rows],
+            "valid": np.load(os.path.join(directory, "valid.npy"), mmap_mode="r")[:rows],
+        }
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+def _hasher():
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def frame_digest(frame):
+    """Hash of a frame's pixels (ndarray) or of an image file's bytes (path)."""
+    h = _hasher()
+    if isinstance(frame, np.ndarray):
+        h.update(f"{frame.shape}{frame.dtype}".encode("ascii"))
+        h.update(np.ascontiguousarray(frame).data)
+    else:
+        with open(frame, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class InspectionCache:
+    """
+    Inspection results keyed by frame hash + settings fingerprint.
+
+    The memory tier is an LRU of max_entries results; the optional disk tier
+    keeps one JSON file per key in disk_dir so results survive restarts and
+    re-runs of archived scans. A result is only returned while its
+    composite image still exists.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+        self._file_digests = {}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def file_digest(self, path):
+        """Hash of a reference file, recomputed only when its size or mtime changes."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_size, st.st_mtime_ns)
+        cached = self._file_digests.get(path)
+        if cached is None or cached[0] != stamp:
+            h = _hasher()
+            with open(path, "rb") as f:
+                h.update(f.read())
+            cached = (stamp, h.hexdigest())
+            self._file_digests[path] = cached
+        return cached[1]
+
+    def key(self, frame, **settings):
+        """Cache key for a frame inspected with the given settings (reference digest, ROI, filters...)."""
+        fingerprint = json.dumps(settings, sort_keys=True, default=str)
+        return frame_digest(frame) + "-" + hashlib.blake2b(fingerprint.encode("utf-8"), digest_size=8).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                if os.path.exists(result["composite"]):
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return result
+                del self.entries[key]
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "r") as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                result = None
+            if result is not None and os.path.exists(result.get("composite", "")):
+                self._remember(key, result)
+                with self.lock:
+                    self.stats["disk_hits"] += 1
+                return result
+        with self.lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, result):
+        self._remember(key, result)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            with open(path + ".tmp", "w") as f:
+                json.dump(result, f)
+            os.replace(path + ".tmp", path)
+
+    def _remember(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
@@ -0,0 +1,127 @@
+import glob
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+
+@dataclass
+class LaserLineConfig:
+    # Same meaning as ox.ConfigureProfileAlgorithmParameters
+    MIN_PEAK_HEIGHT: int = 20     # Peak intensity below this -> no point in the column
+    THRESHOLD_VALUE: int = 50     # Intensity threshold (absolute) or percent of the peak (relative)
+    THRESHOLD_TYPE: int = 0       # 0: absolute, 1: relative to the column peak
+    MIN_PEAK_WIDTH: int = 2       # Minimum rows above threshold around the peak
+
+
+class LaserLineExtractor:
+    """
+    Sub-pixel laser-line extraction from a raw sensor image (rows = Z
+    direction, columns = X direction).
+
+    For every column the brightest row is taken as the peak, the run of rows
+    above threshold that contains it as the line, and the intensity-weighted
+    center of gravity of that run (threshold subtracted) as the sub-pixel
+    line position. All columns are processed together in a few NumPy passes.
+    """
+
+    def __init__(self, config: Optional[LaserLineConfig] = None):
+        self.config = config or LaserLineConfig()
+
+    def extract(self, image: np.ndarray, row_offset: int = 0, col_offset: int = 0,
+                row_binning: int = 1, col_binning: int = 1) -> Dict[str, np.ndarray]:
+        """
+        Returns a dict of per-column arrays:
+        - column: sensor column of each image column (ROI offset and binning applied)
+        - peak_row, peak_value: brightest row (sensor rows) and its intensity
+        - centroid: sub-pixel line position in sensor rows (NaN where invalid)
+        - width: rows in the run around the peak
+        - valid: column passed MIN_PEAK_HEIGHT and MIN_PEAK_WIDTH
+        """
+        cfg = self.config
+        img = np.asarray(image, dtype=np.float32)
+        rows, cols = img.shape
+        col_idx = np.arange(cols)
+
+        peak = img.argmax(axis=0)
+        peak_value = img[peak, col_idx]
+        if cfg.THRESHOLD_TYPE == 1:
+            threshold = peak_value * (cfg.THRESHOLD_VALUE / 100.0)
+        else:
+            threshold = np.full(cols, float(cfg.THRESHOLD_VALUE), dtype=np.float32)
+
+        # Rows above threshold with no below-threshold row between them and
+        # the peak form the peak's run: equal running count of "below" rows.
+        above = img >= threshold[None, :]
+        below_count = np.cumsum(~above, axis=0)
+        run = above & (below_count == below_count[peak, col_idx][None, :])
+
+        weights = np.where(run, img - threshold[None, :], 0.0)
+        weight_sum = weights.sum(axis=0)
+        row_sum = (weights * np.arange(rows, dtype=np.float32)[:, None]).sum(axis=0)
+        width = run.sum(axis=0)
+
+        valid = (peak_value >= cfg.MIN_PEAK_HEIGHT) & (width >= cfg.MIN_PEAK_WIDTH) & (weight_sum > 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            centroid = np.where(valid, row_sum / weight_sum, np.nan)
+
+        # Binned pixels cover `binning` sensor rows/columns; use their center
+        return {
+            "column": col_offset + col_idx * col_binning + (col_binning - 1) / 2.0,
+            "peak_row": row_offset + peak * row_binning,
+            "peak_value": peak_value,
+            "centroid": (row_offset + centroid * row_binning + (row_binning - 1) / 2.0).astype(np.float32),
+            "width": width.astype(np.int32),
+            "valid": valid,
+        }
+
+    def extract_file(self, path: str) -> Dict[str, np.ndarray]:
+        """Extract the line from an archived laser image (PNG saved by capture_laser_image)."""
+        import cv2
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise FileNotFoundError(path)
+        return self.extract(image)
+
+
+def save_line(path: str, line: Dict[str, np.ndarray]):
+    np.savez_compressed(path, **line)
+
+
+def reprocess_directory(directory: str = "laser_images", pattern: str = "laser_pos*.png",
+                        config: Optional[LaserLineConfig] = None) -> int:
+    """
+    Re-extract the line from every archived laser image and write
+    <image>_line.npz next to it. Returns the number of images processed.
+    Archived PNGs carry no ROI offset or binning, so positions are image rows/columns.
+    """
+    extractor = LaserLineExtractor(config)
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    start = time.perf_counter()
+    for path in paths:
+        line = extractor.extract_file(path)
+        save_line(os.path.splitext(path)[0] + "_line.npz", line)
+        print(f"[LaserLine] {os.path.basename(path)}: {int(line['valid'].sum())}/{len(line['valid'])} columns")
+    if paths:
+        elapsed = time.perf_counter() - start
+        print(f"[LaserLine] {len(paths)} images in {elapsed:.2f} s ({elapsed / len(paths) * 1000:.1f} ms/image)")
+    return len(paths)
+
+
+if __name__ == "__main__":
+    import sys
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else "laser_images"
+    if reprocess_directory(directory) == 0:
+        print(f"No laser images in {directory}, timing a synthetic 1024x1280 image.")
+        rows, cols = np.mgrid[0:1024, 0:1280]
+        center = 500.0 + 80.0 * np.sin(cols / 200.0)
+        image = np.clip(220.0 * np.exp(-0.5 * ((rows - center) / 2.5) ** 2), 0, 255).astype(np.uint8)
+        extractor = LaserLineExtractor()
+        start = time.perf_counter()
+        line = extractor.extract(image)
+        elapsed = time.perf_counter() - start
+        error = np.nanmax(np.abs(line["centroid"] - center[0]))
+        print(f"{int(line['valid'].sum())} columns in {elapsed * 1000:.1f} ms, max centroid error {error:.3f} px")
@@ -1,16 +1,24 @@
-import base64
 import zlib
 import numpy as np
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Header, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
 import uuid
 from typing import List, Optional, Dict, Any
 import asyncio
 import yaml
-from gap_detector import GapDetector, GapConfig
+from gap_detector import GapConfig, detect_gaps_in_worker
+from master_store import MasterProfileStore
+from acquire_payload import (
+    MULTIPART_MEDIA_TYPE, make_blob, wants_multipart, blobs_to_json,
+    blobs_to_references, new_boundary, iter_multipart
+)
+from offload import Offloader, StageTimings, read_file
+from xz_codec import encode_xz, LEGACY_FORMAT
+from devices import DeviceSession, encode_jpeg
+from area_detector import AreaConfig, detect_height_map_in_worker
 import os
-import json
 
 app = FastAPI(title="Robotic Inspection System API")
 
@@ -22,8 +30,36 @@ PLC_CONFIG = config["PLC"]
 PLC_REGISTERS = config["PLC_Registers"]
 POSITION_ACTIONS = config["Position_Wise_Actions"]
 USE_CAMERA = config["Use_Camera"]
+XZ_CODEC = config.get("XZ_Codec")  # None keeps the legacy zlib float32 "xz_array" format (default)
+USE_HARDWARE = config.get("Use_Hardware", False)  # False serves placeholder data
+AREA_CONFIG = AreaConfig(**(config.get("Area_Detection") or {}))
+PROFILER_DATA_DIR = config.get("Profiler_Data_Dir", "profiler_data")  # Sweeps written by the PLC loop
 # WELD_ROIS = config["Weld_Reference_ROIs"]  # Placeholder for future use
 
+# Blocking I/O runs on a thread pool, gap detection on a process pool
+OFFLOAD = Offloader()
+
+# Devices are opened once at startup and kept warm between requests
+DEVICES = DeviceSession(config)
+
+@app.on_event("startup")
+def start_offload():
+    OFFLOAD.start()
+
+@app.on_event("startup")
+def open_devices():
+    if USE_HARDWARE:
+        uses_profiler = any("Profiler" in actions for actions in POSITION_ACTIONS.values())
+        DEVICES.open(use_camera=USE_CAMERA, use_profiler=uses_profiler)
+
+@app.on_event("shutdown")
+def stop_offload():
+    OFFLOAD.shutdown()
+
+@app.on_event("shutdown")
+def close_devices():
+    DEVICES.close()
+
 # New Pydantic models for profiler data
 class FeatureThresholds(BaseModel):
     position_tolerance: float
@@ -66,7 +102,8 @@ class DetectedFeature(BaseModel):
     width: float
     depth: float
     confidence: float
-    center_point: List[float]
+    center_point: List[float]  # [x, depth]
+    y_center: Optional[float] = None  # travel coordinate, height map features only
     validation: Optional[FeatureValidation] = None
 
 class ProfilerDetectionResult(BaseModel):
@@ -76,6 +113,10 @@ class ProfilerDetectionResult(BaseModel):
     is_valid: bool
     validation_message: str
 
+class HeightMapRequest(BaseModel):
+    position_no: int
+    sweep_id: str  # profiler_data/<sweep_id>, e.g. "pos_10_20250101_120000"
+
 # Pydantic models for request and response
 class AcquireRequest(BaseModel):
     position_no: int  # Changed from event_id to match config
@@ -113,33 +154,48 @@ class InspectionResponse(BaseModel):
     data: Dict[str, List[SensorData]]
     analytics: Dict[str, List[AnalyticsObject]]
 
-# Placeholder for profiler data acquisition
-async def acquire_profiler_data() -> tuple[np.ndarray, bytes]:
-    # Replace with your actual profiler code
-    xz_data = np.array([[i, np.sin(i / 10.0)] for i in range(100)], dtype=np.float32)
-    with open("placeholder_profiler_image.jpg", "rb") as f:
-        image_data = f.read()
-    return xz_data, image_data
-
-# Placeholder for camera image acquisition
+# Profiler data acquisition (placeholder data when Use_Hardware is off)
+async def acquire_profiler_data() -> tuple[np.ndarray, bytes, Optional[int]]:
+    """Returns (xz_data, JPEG image, decimals of the sensor's points or None for placeholder data)."""
+    if DEVICES.profiler is None:
+        xz_data = np.array([[i, np.sin(i / 10.0)] for i in range(100)], dtype=np.float32)
+        image_data = await OFFLOAD.run_io(read_file, "placeholder_profiler_image.jpg")
+        return xz_data, image_data, None
+    xz_data, image, precision = await DEVICES.read_profile_async()
+    image_data = await OFFLOAD.run_io(encode_jpeg, image)
+    return xz_data, image_data, precision
+
+# Camera image acquisition (placeholder image when Use_Hardware is off)
 async def acquire_camera_image() -> bytes:
-    # Replace with your actual camera code
-    with open("placeholder_camera_image.jpg", "rb") as f:
-        image_data = f.read()
-    return image_data
-
-# Placeholder for triggering light via PLC
-async def trigger_light() -> None:
-    # Replace with PLC write to Light_Trigger register (address 10)
-    pass
-
-# Placeholder for reading PLC position number
+    if DEVICES.camera is None:
+        return await OFFLOAD.run_io(read_file, "placeholder_camera_image.jpg")
+    frame = await DEVICES.grab_frame_async()
+    if frame is None:
+        raise RuntimeError("Camera not connected")
+    return await OFFLOAD.run_io(encode_jpeg, frame)
+
+# Light control via the PLC Light_Trigger register
+async def trigger_light(on: bool = True) -> None:
+    if DEVICES.plc is not None:
+        await DEVICES.set_light_async(on)
+
+# PLC Position_No register
 async def read_plc_position_no() -> int:
-    # Replace with PLC read from Position_No register (address 100)
-    return 1  # Dummy value
+    if DEVICES.plc is None:
+        return 1  # Dummy value without hardware
+    return await DEVICES.read_position_no_async()
 
 @app.post("/acquire", response_model=InspectionResponse)
-async def acquire_data(request: AcquireRequest):
+async def acquire_data(request: AcquireRequest, response: Response, accept: Optional[str] = Header(None)):
+    """
+    Acquire sensor data for a position.
+    Responds with the JSON schema by default. Clients sending
+    "Accept: multipart/mixed" get a streamed multipart body instead: a JSON
+    part with the same document (raw_data.value holds "cid:" references)
+    followed by the raw sensor blobs.
+    Per-stage durations are returned in the Server-Timing header.
+    """
+    timings = StageTimings()
     # Validate position number
     position_str = str(request.position_no)
     if position_str not in POSITION_ACTIONS:
@@ -168,7 +224,7 @@ async def acquire_data(request: AcquireRequest):
     # Get actions for the position
     actions = POSITION_ACTIONS[position_str]
     sensor_tasks = []
-    sensor_data = []
+    sensor_blobs = []
     xz_data = None  # Store for analytics
 
     # Process actions
@@ -191,7 +247,10 @@ async def acquire_data(request: AcquireRequest):
             await trigger_light()
 
     # Execute sensor tasks concurrently
-    results = await asyncio.gather(*sensor_tasks, return_exceptions=True)
+    with timings.stage("acquire"):
+        results = await asyncio.gather(*sensor_tasks, return_exceptions=True)
+    if "Light" in actions and USE_CAMERA:
+        await trigger_light(False)
 
     # Process sensor results
     for idx, action in enumerate([a for a in actions if a in ["Profiler", "Camera"] and (a != "Camera" or USE_CAMERA)]):
@@ -200,40 +259,29 @@ async def acquire_data(request: AcquireRequest):
         
         acquisition_time = datetime.utcnow().isoformat() + "Z"
         if action == "Profiler":
-            xz_data, image_data = results[idx]
-            compressed_xz = zlib.compress(xz_data.tobytes())
-            sensor_data.append({
-                "type": "profiler",
-                "raw_data": {
-                    "format": "xz_array",
-                    "value": base64.b64encode(compressed_xz).decode("utf-8")
-                },
-                "acquisition_time": acquisition_time
-            })
-            sensor_data.append({
-                "type": "profiler",
-                "raw_data": {
-                    "format": "image_jpeg",
-                    "value": base64.b64encode(image_data).decode("utf-8")
-                },
-                "acquisition_time": acquisition_time
-            })
+            xz_data, image_data, precision = results[idx]
+            # A thread only keeps the event loop free: the NumPy filters and Python code hold the
+            # GIL for most of the encode. One profile is small enough that pickling it to the
+            # process pool would cost about as much as encoding it.
+            with timings.stage("compress"):
+                if XZ_CODEC:
+                    # Quantized at the precision the sensor reported, so no resolution is lost
+                    options = {k: v for k, v in XZ_CODEC.items() if k != "quantize"}
+                    options["precision"] = precision if XZ_CODEC.get("quantize", True) else None
+                    compressed_xz, xz_format = await OFFLOAD.run_io(encode_xz, xz_data, **options)
+                else:
+                    compressed_xz = await OFFLOAD.run_io(zlib.compress, xz_data.tobytes())
+                    xz_format = LEGACY_FORMAT
+            sensor_blobs.append(make_blob("profiler", xz_format, compressed_xz, acquisition_time))
+            sensor_blobs.append(make_blob("profiler", "image_jpeg", image_data, acquisition_time))
         elif action == "Camera":
             image_data = results[idx]
-            sensor_data.append({
-                "type": "camera",
-                "raw_data": {
-                    "format": "image_jpeg",
-                    "value": base64.b64encode(image_data).decode("utf-8")
-                },
-                "acquisition_time": acquisition_time
-            })
-
-    response_data["data"]["sensors"] = sensor_data
+            sensor_blobs.append(make_blob("camera", "image_jpeg", image_data, acquisition_time))
 
     # Process profiler data if available
     if "Profiler" in actions and xz_data is not None:
-        profiler_result = await process_profiler_data(xz_data, request.position_no)
+        with timings.stage("analytics"):
+            profiler_result = await process_profiler_data(xz_data, request.position_no)
         
         # Convert profiler results to analytics objects
         for feature in profiler_result.features:
@@ -252,8 +300,35 @@ async def acquire_data(request: AcquireRequest):
             }
             response_data["analytics"]["objects"].append(analytics_object)
 
+    if wants_multipart(accept):
+        response_data["data"]["sensors"] = blobs_to_references(sensor_blobs)
+        OFFLOAD.record(timings)
+        boundary = new_boundary()
+        return StreamingResponse(
+            iter_multipart(response_data, sensor_blobs, boundary),
+            media_type=f"{MULTIPART_MEDIA_TYPE}; boundary={boundary}",
+            headers={"Server-Timing": timings.server_timing()}
+        )
+
+    with timings.stage("encode"):
+        # base64 holds the GIL; the thread keeps the event loop serving other requests
+        response_data["data"]["sensors"] = await OFFLOAD.run_io(blobs_to_json, sensor_blobs)
+    OFFLOAD.record(timings)
+    response.headers["Server-Timing"] = timings.server_timing()
     return response_data
 
+@app.get("/stage_timings")
+def get_stage_timings():
+    """
+    Aggregated per-stage timings (count, mean_ms, max_ms) of /acquire requests,
+    plus the camera's reconnect counters and latency when hardware is used.
+    """
+    stats = OFFLOAD.stats()
+    camera = DEVICES.camera_stats()
+    if camera is not None:
+        stats = dict(stats, camera=camera)
+    return stats
+
 # Simplified analytics (replace with your logic)
 async def analyze_profiler_data(xz_data: np.ndarray) -> List[Dict[str, Any]]:
     # Simulate detecting a hole and a nut
@@ -286,13 +361,7 @@ async def process_profiler_data(xz_data: np.ndarray, event_id: int) -> ProfilerD
     Process raw profiler data to detect holes and nuts
     Returns detection results with positions and validation
     """
-    # Get master data for this event
-    master_data = config.get("Profiler_Master_Data", {}).get(f"event_{event_id}")
-    if not master_data:
-        raise HTTPException(status_code=400, detail=f"No master data found for event {event_id}")
-
-    # Convert master data to Pydantic model
-    master = ProfilerMasterData(**master_data)
+    master = get_profiler_master(event_id)
 
     # Initialize gap detector
     gap_config = GapConfig(
@@ -303,14 +372,13 @@ async def process_profiler_data(xz_data: np.ndarray, event_id: int) -> ProfilerD
         MAX_GROUP_JOIN_GAP=3,
         USE_GPU=True
     )
-    gap_detector = GapDetector(gap_config)
 
     # Extract x and z data
     x_data = xz_data[:, 0]
     z_data = xz_data[:, 1]
 
-    # Detect gaps
-    detected_gaps = gap_detector.detect_gaps(x_data, z_data)
+    # Detect gaps in a worker process so the event loop stays responsive
+    detected_gaps = await OFFLOAD.run_cpu(detect_gaps_in_worker, x_data, z_data, gap_config)
 
     # Convert gaps to detected features
     detected_features = []
@@ -321,12 +389,7 @@ async def process_profiler_data(xz_data: np.ndarray, event_id: int) -> ProfilerD
         feature_type = "hole" if avg_depth < 0 else "nut"
         
         # Calculate confidence based on multiple factors
-        width_match = any(abs(width - m.width) <= m.thresholds.width_tolerance 
-                         for m in (master.hole_positions if feature_type == "hole" else master.nut_positions))
-        depth_match = any(abs(avg_depth - m.thresholds.expected_depth) <= m.thresholds.depth_tolerance 
-                         for m in (master.hole_positions if feature_type == "hole" else master.nut_positions))
-        
-        confidence = 0.95 if width_match and depth_match else 0.85
+        confidence = feature_confidence(feature_type, width, avg_depth, master)
 
         # Create feature with validation
         feature = DetectedFeature(
@@ -344,6 +407,72 @@ async def process_profiler_data(xz_data: np.ndarray, event_id: int) -> ProfilerD
         feature.validation = validation
         detected_features.append(feature)
 
+    return summarize_features(detected_features, master)
+
+def get_profiler_master(event_id: int) -> ProfilerMasterData:
+    """
+    Load the hole/nut master data for an event from config
+    """
+    master_data = config.get("Profiler_Master_Data", {}).get(f"event_{event_id}")
+    if not master_data:
+        raise HTTPException(status_code=400, detail=f"No master data found for event {event_id}")
+    return ProfilerMasterData(**master_data)
+
+def feature_confidence(feature_type: str, width: float, depth: float, master: ProfilerMasterData) -> float:
+    """
+    Confidence from whether width and depth match any master feature of the same type
+    """
+    master_features = master.hole_positions if feature_type == "hole" else master.nut_positions
+    width_match = any(abs(width - m.width) <= m.thresholds.width_tolerance for m in master_features)
+    depth_match = any(abs(depth - m.thresholds.expected_depth) <= m.thresholds.depth_tolerance for m in master_features)
+    return 0.95 if width_match and depth_match else 0.85
+
+def resolve_height_map(sweep_id: str) -> str:
+    """
+    Height map directory of a sweep. Only sweeps under PROFILER_DATA_DIR can
+    be analyzed; ids that resolve anywhere else are rejected.
+    """
+    root = os.path.realpath(PROFILER_DATA_DIR)
+    directory = os.path.realpath(os.path.join(root, sweep_id, "height_map"))
+    if os.path.commonpath([root, directory]) != root or os.path.dirname(os.path.dirname(directory)) != root:
+        raise HTTPException(status_code=400, detail=f"Invalid sweep id: {sweep_id}")
+    if not os.path.isdir(directory):
+        raise HTTPException(status_code=404, detail=f"Height map not found for sweep {sweep_id}")
+    return directory
+
+@app.post("/analyze_height_map", response_model=ProfilerDetectionResult)
+async def analyze_height_map(request: HeightMapRequest):
+    """
+    Detect holes and nuts as areas on a sweep's height map and validate them
+    against the same master data used for single profiles
+    """
+    master = get_profiler_master(request.position_no)
+    directory = resolve_height_map(request.sweep_id)
+
+    blobs = await OFFLOAD.run_cpu(detect_height_map_in_worker, directory, AREA_CONFIG)
+
+    detected_features = []
+    for blob in blobs:
+        width = blob["x_max"] - blob["x_min"]
+        feature = DetectedFeature(
+            type=blob["type"],
+            x_min=blob["x_min"],
+            x_max=blob["x_max"],
+            width=width,
+            depth=blob["depth"],
+            confidence=feature_confidence(blob["type"], width, blob["depth"], master),
+            center_point=[(blob["x_min"] + blob["x_max"]) / 2, blob["depth"]],
+            y_center=(blob["y_min"] + blob["y_max"]) / 2,
+        )
+        feature.validation = validate_feature(feature, master)
+        detected_features.append(feature)
+
+    return summarize_features(detected_features, master)
+
+def summarize_features(detected_features: List[DetectedFeature], master: ProfilerMasterData) -> ProfilerDetectionResult:
+    """
+    Check feature counts and per-feature validations against master data
+    """
     # Count features by type
     holes = [f for f in detected_features if f.type == "hole"]
     nuts = [f for f in detected_features if f.type == "nut"]
@@ -481,16 +610,12 @@ class CompareProfileDataV2(BaseModel):
     holes: list[FeatureWithThresholds]
     nuts: list[FeatureWithThresholds]
 
-# In-memory storage for master data (new format)
-MASTER_DATA_FILE = "master_profiles.json"
+# Persistent storage for master data (new format)
+MASTER_DATA_FILE = "master_profiles.json"  # Legacy single-file store, imported once
+MASTER_DATA_DIR = "master_profiles"
 
-# Load master data from file at startup
-if os.path.exists(MASTER_DATA_FILE):
-    with open(MASTER_DATA_FILE, "r") as f:
-        try:
-            MASTER_DATA_STORE_V2 = json.load(f)
-        except Exception:
-            MASTER_DATA_STORE_V2 = {}
+MASTER_STORE = MasterProfileStore(MASTER_DATA_DIR)
+MASTER_STORE.import_legacy_json(MASTER_DATA_FILE)
 
 @app.post("/add_master_profile")
 def add_master_profile_v2(data: MasterProfileDataV2 = Body(...)):
@@ -502,10 +627,7 @@ def add_master_profile_v2(data: MasterProfileDataV2 = Body(...)):
     - nuts: List of features with thresholds
     - global_thresholds: Thresholds for validation
     """
-    MASTER_DATA_STORE_V2[data.event_name] = data.dict()
-    # Save to file for persistence
-    with open(MASTER_DATA_FILE, "w") as f:
-        json.dump(MASTER_DATA_STORE_V2, f, indent=2)
+    MASTER_STORE.put(data.event_name, data.dict())
     return {"message": f"Master data for event '{data.event_name}' added successfully."}
 
 @app.post("/compare_to_master")
@@ -518,7 +640,7 @@ def compare_to_master_v2(data: CompareProfileDataV2 = Body(...)):
     - nuts: List of features (with thresholds for comparison)
     Returns per-feature pass/fail and deviation details.
     """
-    master = MASTER_DATA_STORE_V2.get(data.event_name)
+    master = MASTER_STORE.get(data.event_name)
     if not master:
         return {"error": f"No master data found for event '{data.event_name}'"}
 
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+class MasterProfileStore:
+    """
+    Durable store for master profiles.
+
+    Feature metadata (holes, nuts, thresholds) is kept in a SQLite index so a
+    new or updated event is a single-row upsert. The raw X/Z profile of each
+    event is written to its own .npz file and is only read back when a
+    comparison actually needs it.
+    """
+
+    def __init__(self, root="master_profiles"):
+        self.root = root
+        self.raw_dir = os.path.join(root, "raw")
+        os.makedirs(self.raw_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS master_profiles ("
+            "event_name TEXT PRIMARY KEY, "
+            "metadata TEXT NOT NULL, "
+            "raw_file TEXT, "
+            "updated_at REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def _raw_path(self, event_name):
+        # The readable prefix is lossy ("a/b" and "a_b" sanitize alike), the hash keeps names distinct
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in event_name)
+        digest = hashlib.blake2b(event_name.encode("utf-8"), digest_size=8).hexdigest()
+        return os.path.join(self.raw_dir, f"{safe_name}-{digest}.npz")
+
+    def _write_raw(self, path, raw_profile):
+        """Write the raw profile next to its final path, then atomically swap it in."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.raw_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    X=np.asarray(raw_profile.get("X", []), dtype=np.float32),
+                    Z=np.asarray(raw_profile.get("Z", []), dtype=np.float32),
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put(self, event_name, data):
+        """
+        Insert or replace the master profile for an event.
+        - data: dict with raw_profile, holes, nuts, global_thresholds
+        """
+        metadata = {k: v for k, v in data.items() if k != "raw_profile"}
+        raw_profile = data.get("raw_profile")
+        raw_file = None
+
+        with self.lock:
+            if raw_profile is not None:
+                raw_path = self._raw_path(event_name)
+                self._write_raw(raw_path, raw_profile)
+                raw_file = os.path.basename(raw_path)
+
+            with self.db:
+                self.db.execute(
+                    "INSERT INTO master_profiles (event_name, metadata, raw_file, updated_at) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(event_name) DO UPDATE SET "
+                    "metadata=excluded.metadata, raw_file=excluded.raw_file, updated_at=excluded.updated_at",
+                    (event_name, json.dumps(metadata), raw_file, time.time()),
+                )
+
+    def get(self, event_name, include_raw=False):
+        """
+        Return the master profile for an event, or None if it does not exist.
+        The raw profile is only loaded when include_raw is True.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT metadata, raw_file FROM master_profiles WHERE event_name = ?",
+                (event_name,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        master = json.loads(row[0])
+        if include_raw:
+            raw = self.load_raw_profile(event_name)
+            master["raw_profile"] = {
+                "X": raw["X"].tolist() if raw else [],
+                "Z": raw["Z"].tolist() if raw else [],
+            }
+        return master
+
+    def load_raw_profile(self, event_name):
+        """Load the raw X/Z arrays of an event, or None if none were stored."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT raw_file FROM master_profiles WHERE event_name = ?",
+                (event_name,),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+
+        with np.load(os.path.join(self.raw_dir, row[0])) as raw:
+            return {"X": raw["X"], "Z": raw["Z"]}
+
+    def list_events(self):
+        with self.lock:
+            rows = self.db.execute("SELECT event_name FROM master_profiles ORDER BY event_name").fetchall()
+        return [r[0] for r in rows]
+
+    def delete(self, event_name):
+        """Delete an event. Returns True if it existed."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT raw_file FROM master_profiles WHERE event_name = ?",
+                (event_name,),
+            ).fetchone()
+            if row is None:
+                return False
+            with self.db:
+                self.db.execute("DELETE FROM master_profiles WHERE event_name = ?", (event_name,))
+            if row[0] is not None:
+                raw_path = os.path.join(self.raw_dir, row[0])
+                if os.path.exists(raw_path):
+                    os.remove(raw_path)
+        return True
+
+    def import_legacy_json(self, path):
+        """
+        One-time migration from the old master_profiles.json format.
+        Only runs while the store is empty so restarts do not re-import.
+        """
+        if not os.path.exists(path) or self.list_events():
+            return 0
+
+        with open(path, "r") as f:
+            try:
+                legacy = json.load(f)
+            except Exception as e:
+                print(f"[MasterStore] Could not read legacy file {path}: {e}")
+                return 0
+
+        for event_name, data in legacy.items():
+            self.put(event_name, data)
+        print(f"[MasterStore] Imported {len(legacy)} master profiles from {path}")
+        return len(legacy)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
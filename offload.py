@@ -0,0 +1,97 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+
+class StageTimings:
+    """Wall-clock duration of each named stage of one request, in milliseconds."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def server_timing(self) -> str:
+        """Format the stages as a Server-Timing header value."""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
+
+
+class Offloader:
+    """
+    Runs blocking work off the event loop.
+    - run_io: file and device I/O on a thread pool
+    - run_cpu: CPU-heavy analytics on a process pool (thread pool fallback)
+    Also aggregates per-stage timings across requests.
+    """
+
+    def __init__(self, io_workers: int = 8, cpu_workers: int = 2):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.io_pool = None
+        self.cpu_pool = None
+        self.lock = threading.Lock()
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def start(self):
+        self.io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="io")
+        try:
+            self.cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+        except Exception as e:
+            print(f"[Offload] Process pool unavailable, using threads for CPU work: {e}")
+            self.cpu_pool = ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix="cpu")
+
+    def shutdown(self):
+        if self.io_pool is not None:
+            self.io_pool.shutdown(wait=False)
+            self.io_pool = None
+        if self.cpu_pool is not None:
+            self.cpu_pool.shutdown(wait=False)
+            self.cpu_pool = None
+
+    async def run_io(self, fn: Callable, *args, **kwargs) -> Any:
+        if self.io_pool is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, functools.partial(fn, *args, **kwargs))
+
+    async def run_cpu(self, fn: Callable, *args, **kwargs) -> Any:
+        """fn and its arguments must be picklable (module-level function)."""
+        if self.cpu_pool is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_pool, functools.partial(fn, *args, **kwargs))
+
+    def record(self, timings: StageTimings):
+        with self.lock:
+            for name, ms in timings.stages.items():
+                entry = self.totals.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                entry["count"] += 1
+                entry["total_ms"] += ms
+                entry["max_ms"] = max(entry["max_ms"], ms)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return {
+                name: {
+                    "count": entry["count"],
+                    "mean_ms": entry["total_ms"] / entry["count"],
+                    "max_ms": entry["max_ms"],
+                }
+                for name, entry in self.totals.items()
+            }
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,88 @@
+import json
+
+
+class ProfileFilter:
+    """
+    Ingest filter for profiler records.
+
+    Runs on the ReadProfile() tuples of a capture window before anything is
+    written or analysed. Dropped profiles are not kept individually; each
+    run of consecutive drops with the same reason is stored as one entry
+    (reason, count, first/last block id and timestamp), so an empty sweep
+    leaves a compact audit instead of thousands of empty records.
+    """
+
+    def __init__(self, config):
+        filter_cfg = config.get("Profiler_Ingest_Filter") or {}
+        self.min_length = filter_cfg.get("min_length", 2)
+        self.require_valid = filter_cfg.get("require_valid", True)
+        self.drop_alarm = filter_cfg.get("drop_alarm", True)
+        quality_ids = filter_cfg.get("quality_ids") or []  # empty: accept any quality
+        self.quality_ids = set(quality_ids)
+        self.reset()
+
+    def reset(self):
+        self.kept = 0
+        self.dropped = {}
+        self.runs = []
+        self._run = None
+
+    def reason(self, profile):
+        """Drop reason for one ReadProfile() tuple, or None to keep it."""
+        _, _, _, valid, alarm, quality, _, length, _, _, z, _ = profile
+        if z is None or length < self.min_length:
+            return "length"
+        if self.require_valid and not valid:
+            return "invalid"
+        if self.drop_alarm and alarm:
+            return "alarm"
+        if self.quality_ids and quality not in self.quality_ids:
+            return "quality"
+        return None
+
+    def filter(self, profiles):
+        """Returns the profiles that pass, recording the dropped ones as runs."""
+        kept = []
+        for profile in profiles:
+            reason = self.reason(profile)
+            if reason is None:
+                self._close_run()
+                kept.append(profile)
+                continue
+            self.dropped[reason] = self.dropped.get(reason, 0) + 1
+            block_id, timestamp = profile[0], profile[6]
+            run = self._run
+            if run is not None and run["reason"] == reason:
+                run["count"] += 1
+                run["last_block"] = block_id
+                run["last_timestamp"] = timestamp
+            else:
+                self._close_run()
+                self._run = {
+                    "reason": reason, "count": 1,
+                    "first_block": block_id, "last_block": block_id,
+                    "first_timestamp": timestamp, "last_timestamp": timestamp,
+                }
+        self.kept += len(kept)
+        return kept
+
+    def _close_run(self):
+        if self._run is not None:
+            self.runs.append(self._run)
+            self._run = None
+
+    def summary(self):
+        self._close_run()
+        return {
+            "kept": self.kept,
+            "dropped": sum(self.dropped.values()),
+            "dropped_by_reason": dict(self.dropped),
+            "runs": list(self.runs),
+        }
+
+    def write_audit(self, path):
+        """Write the summary as JSON. Returns it."""
+        summary = self.summary()
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
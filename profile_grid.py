@@ -0,0 +1,154 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def interp_rows(x_rows: np.ndarray, z_rows: np.ndarray, lengths: np.ndarray, x_grid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Resample many profiles onto a common X grid at once.
+    - x_rows, z_rows: (n, m) arrays, row i valid up to lengths[i], X ascending per row
+    - x_grid: (k,) target X positions
+    Returns (z, valid) with z of shape (n, k) float32 (NaN where invalid) and a
+    boolean validity mask (grid point inside the row's X range).
+
+    Equivalent to np.interp per row, done with one searchsorted over all rows
+    by offsetting every row into its own disjoint X band.
+    """
+    n, m = x_rows.shape
+    k = len(x_grid)
+    if n == 0:
+        return np.empty((0, k), dtype=np.float32), np.zeros((0, k), dtype=bool)
+
+    lengths = np.asarray(lengths, dtype=np.int64)
+    cols = np.arange(m)
+    in_row = cols[None, :] < lengths[:, None]
+
+    x = x_rows.astype(np.float64)
+    x_lo = np.where(in_row, x, np.inf).min(axis=1)
+    x_hi = np.where(in_row, x, -np.inf).max(axis=1)
+
+    # Pad the unused tail of each row with its last X so rows stay sorted
+    last_idx = np.maximum(lengths - 1, 0)
+    x = np.where(in_row, x, x[np.arange(n), last_idx][:, None])
+
+    span = float(max(np.ptp(x_grid), np.nanmax(np.where(lengths > 0, x_hi - x_lo, 0)), 1.0)) * 4.0
+    base = float(min(x_grid.min(), np.where(lengths > 0, x_lo, np.inf).min()))
+    offsets = (np.arange(n) * span)[:, None]
+    flat_x = (x - base + offsets).ravel()
+    flat_q = (x_grid[None, :] - base + offsets)
+
+    idx = np.searchsorted(flat_x, flat_q.ravel(), side="right").reshape(n, k) - 1
+    row_start = (np.arange(n) * m)[:, None]
+    idx = np.clip(idx, row_start, row_start + np.maximum(last_idx[:, None] - 1, 0))
+
+    z_flat = z_rows.astype(np.float64).ravel()
+    x0, x1 = flat_x[idx], flat_x[idx + 1]
+    z0, z1 = z_flat[idx], z_flat[idx + 1]
+    denom = np.where(x1 > x0, x1 - x0, 1.0)
+    w = np.clip((flat_q - x0) / denom, 0.0, 1.0)
+    z = z0 + w * (z1 - z0)
+
+    valid = (x_grid[None, :] >= x_lo[:, None]) & (x_grid[None, :] <= x_hi[:, None]) & (lengths[:, None] > 1)
+    z = np.where(valid, z, np.nan).astype(np.float32)
+    return z, valid
+
+
+def pad_profiles(x_list: List[np.ndarray], z_list: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Stack variable-length profiles into (n, max_len) arrays plus their lengths."""
+    lengths = np.array([len(x) for x in x_list], dtype=np.int64)
+    width = int(lengths.max()) if len(lengths) else 0
+    x_rows = np.zeros((len(x_list), width), dtype=np.float64)
+    z_rows = np.zeros((len(x_list), width), dtype=np.float64)
+    for i, (x, z) in enumerate(zip(x_list, z_list)):
+        x_rows[i, :len(x)] = x
+        z_rows[i, :len(z)] = z
+    return x_rows, z_rows, lengths
+
+
+def sort_profile_rows(x_rows: np.ndarray, z_rows: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sort every row by X (the sensor may report X descending)."""
+    cols = np.arange(x_rows.shape[1])
+    keys = np.where(cols[None, :] < lengths[:, None], x_rows, np.inf)
+    order = np.argsort(keys, axis=1, kind="stable")
+    return np.take_along_axis(x_rows, order, axis=1), np.take_along_axis(z_rows, order, axis=1)
+
+
+def resample_travel(travel: np.ndarray, rows: np.ndarray, step: float,
+                    start: Optional[float] = None, stop: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Resample profiles onto a uniform travel grid.
+    - travel: (n,) travel coordinate of each profile (e.g. encoder counts * mm/count)
+    - rows: (n, k) profiles already on a common X grid (NaN = invalid)
+    Returns (travel_grid, resampled) where resampled has shape (len(travel_grid), k).
+    Rows are linearly blended between the two nearest profiles; repeated travel
+    values (robot stalled) are averaged first.
+    """
+    order = np.argsort(travel, kind="stable")
+    travel = np.asarray(travel, dtype=np.float64)[order]
+    rows = rows[order]
+
+    unique_travel, first, counts = np.unique(travel, return_index=True, return_counts=True)
+    if len(unique_travel) != len(travel):
+        group = np.repeat(np.arange(len(unique_travel)), counts)
+        finite = np.isfinite(rows)
+        sums = np.zeros((len(unique_travel), rows.shape[1]))
+        hits = np.zeros((len(unique_travel), rows.shape[1]))
+        np.add.at(sums, group, np.where(finite, rows, 0.0))
+        np.add.at(hits, group, finite)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rows = np.where(hits > 0, sums / hits, np.nan)
+        travel = unique_travel
+
+    start = travel[0] if start is None else start
+    stop = travel[-1] if stop is None else stop
+    grid = np.arange(start, stop + step * 0.5, step)
+    if len(travel) < 2:
+        return grid, np.full((len(grid), rows.shape[1]), np.nan, dtype=np.float32)
+
+    i1 = np.clip(np.searchsorted(travel, grid, side="right"), 1, len(travel) - 1)
+    i0 = i1 - 1
+    w = np.clip((grid - travel[i0]) / (travel[i1] - travel[i0]), 0.0, 1.0)[:, None]
+    resampled = rows[i0] * (1.0 - w) + rows[i1] * w
+    outside = (grid < travel[0]) | (grid > travel[-1])
+    resampled[outside] = np.nan
+    return grid, resampled.astype(np.float32)
+
+
+class EncoderSweep:
+    """
+    Collects encoder-triggered profiles for one position and turns them into a
+    fixed-size (travel x X) array on uniform grids.
+    """
+
+    def __init__(self, x_grid: np.ndarray, travel_step: float, mm_per_count: float = 1.0):
+        self.x_grid = np.asarray(x_grid, dtype=np.float64)
+        if self.x_grid.ndim != 1 or len(self.x_grid) == 0:
+            raise ValueError(f"x_grid must be a non-empty 1-D grid, got shape {self.x_grid.shape}")
+        if not travel_step > 0:
+            raise ValueError(f"travel_step must be positive, got {travel_step}")
+        self.travel_step = travel_step
+        self.mm_per_count = mm_per_count
+        self.encoders = []
+        self.x_list = []
+        self.z_list = []
+
+    def append(self, encoder, x, z):
+        if len(x) < 2:
+            return
+        self.encoders.append(encoder)
+        self.x_list.append(np.asarray(x, dtype=np.float64))
+        self.z_list.append(np.asarray(z, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.encoders)
+
+    def finish(self):
+        """Returns (travel_grid, x_grid, z) with z of shape (len(travel_grid), len(x_grid))."""
+        if not self.encoders:
+            return np.empty(0), self.x_grid, np.empty((0, len(self.x_grid)), dtype=np.float32)
+        x_rows, z_rows, lengths = pad_profiles(self.x_list, self.z_list)
+        x_rows, z_rows = sort_profile_rows(x_rows, z_rows, lengths)
+        rows, _ = interp_rows(x_rows, z_rows, lengths, self.x_grid)
+        travel = np.asarray(self.encoders, dtype=np.float64) * self.mm_per_count
+        travel_grid, z = resample_travel(travel, rows, self.travel_step)
+        return travel_grid, self.x_grid, z
@@ -0,0 +1,94 @@
+import numpy as np
+
+
+class RunningProfileStats:
+    """
+    Per-point running statistics (Welford mean/variance, min/max, valid
+    count) of X and Z over repeated profiles of a stationary part, kept in
+    preallocated arrays indexed by point number. Batches are merged with
+    the parallel form of Welford's update, so the cost per poll is a few
+    array operations regardless of batch size.
+    """
+
+    def __init__(self, max_points=2048):
+        self.max_points = max_points
+        self.count = np.zeros(max_points, dtype=np.int64)
+        self.mean = np.zeros((max_points, 2), dtype=np.float64)
+        self.m2 = np.zeros((max_points, 2), dtype=np.float64)
+        self.min = np.full((max_points, 2), np.inf)
+        self.max = np.full((max_points, 2), -np.inf)
+        self.profiles = 0
+
+    def update(self, x_list, z_list):
+        """Add a batch of profiles (sequences of X and Z values)."""
+        if not x_list:
+            return
+        lengths = np.minimum([len(x) for x in x_list], self.max_points)
+        width = int(lengths.max())
+        if width == 0:
+            return
+        batch = np.zeros((len(x_list), width, 2), dtype=np.float64)
+        for i, (x, z, n) in enumerate(zip(x_list, z_list, lengths)):
+            batch[i, :n, 0] = np.asarray(x[:n], dtype=np.float64)
+            batch[i, :n, 1] = np.asarray(z[:n], dtype=np.float64)
+        mask = (np.arange(width)[None, :] < lengths[:, None])[..., None]
+
+        n_b = mask[..., 0].sum(axis=0)
+        hit = n_b > 0
+        safe_n = np.maximum(n_b, 1)[:, None]
+        mean_b = np.where(mask, batch, 0.0).sum(axis=0) / safe_n
+        m2_b = (np.where(mask, batch - mean_b[None], 0.0) ** 2).sum(axis=0)
+
+        n_a = self.count[:width]
+        n = n_a + n_b
+        delta = mean_b - self.mean[:width]
+        ratio = np.where(hit, n_b / np.maximum(n, 1), 0.0)[:, None]
+        self.mean[:width] += delta * ratio
+        self.m2[:width] += np.where(hit[:, None], m2_b + delta ** 2 * (n_a * ratio[:, 0])[:, None], 0.0)
+        self.count[:width] = n
+        np.minimum(self.min[:width], np.where(mask, batch, np.inf).min(axis=0), out=self.min[:width])
+        np.maximum(self.max[:width], np.where(mask, batch, -np.inf).max(axis=0), out=self.max[:width])
+        self.profiles += len(x_list)
+
+    def variance(self):
+        """Sample variance per point (NaN where fewer than two samples)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where((self.count > 1)[:, None], self.m2 / (self.count - 1)[:, None], np.nan)
+
+    def ci_halfwidth(self, z_score=1.96):
+        """Half-width of the confidence interval of each point's mean (NaN below two samples)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return z_score * np.sqrt(self.variance() / self.count[:, None])
+
+    def points(self):
+        """Number of leading point indices that received at least one sample."""
+        hit = np.flatnonzero(self.count)
+        return int(hit[-1]) + 1 if len(hit) else 0
+
+    def center_ci(self, z_score=1.96, coverage=0.95):
+        """
+        Confidence of the center profile: the `coverage` quantile of the Z
+        confidence half-widths over all points with at least two samples.
+        NaN until there are enough samples.
+        """
+        halfwidth = self.ci_halfwidth(z_score)[:self.points(), 1]
+        halfwidth = halfwidth[np.isfinite(halfwidth)]
+        return float(np.quantile(halfwidth, coverage)) if len(halfwidth) else float("nan")
+
+    def converged(self, tolerance, z_score=1.96, coverage=0.95, min_profiles=20):
+        """True once min_profiles arrived and center_ci() is below tolerance."""
+        return self.profiles >= min_profiles and self.center_ci(z_score, coverage) < tolerance
+
+    def save(self, path, **metadata):
+        """Write the statistics for the used points, plus metadata scalars, as one .npz record."""
+        n = self.points()
+        np.savez(
+            path,
+            count=self.count[:n].astype(np.int32),
+            mean=self.mean[:n].astype(np.float32),
+            std=np.sqrt(self.variance()[:n]).astype(np.float32),
+            min=self.min[:n].astype(np.float32),
+            max=self.max[:n].astype(np.float32),
+            profiles=self.profiles,
+            **metadata,
+        )
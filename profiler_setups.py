@@ -0,0 +1,101 @@
+import json
+import threading
+
+
+class ProfilerSetupManager:
+    """
+    Per-position sensor parameter setups for the profiler.
+
+    Each configured position gets a numbered sensor storage. At startup the
+    field of view, resampling, resolution and exposure of every setup are
+    applied once and saved with StoreParameterSetup(); arriving at a position
+    then switches all of them with a single LoadParameterSetup() call, so the
+    sensor only sends the region of interest at the requested resolution.
+    Positions without a setup use the default storage.
+
+    Sensor storages survive a reconnect, so after the first connect only
+    setups whose configuration changed (or whose store failed) are written
+    again.
+    """
+
+    def __init__(self, config):
+        setups_cfg = config.get("Profiler_Setups") or {}
+        self.default_storage = setups_cfg.get("default_storage", 0)
+        self.setups = {int(k): v for k, v in (setups_cfg.get("positions") or {}).items()}
+        self.lock = threading.Lock()
+        self.active_storage = None
+        self.stored = False
+        self.stored_setups = {}  # storage -> configuration last written to it
+
+    def enabled(self):
+        return bool(self.setups)
+
+    def storage_for(self, position_no):
+        setup = self.setups.get(position_no)
+        return setup["storage"] if setup else self.default_storage
+
+    def _apply(self, profiler, setup):
+        fov = setup.get("field_of_view")
+        if fov:
+            profiler.ConfigureFieldOfView(*fov)  # limit left, limit right, offset, height
+        resampling = setup.get("resampling")
+        if resampling is not None:
+            profiler.ConfigureResampling(resampling.get("enabled", True), resampling.get("grid", 0.0))
+        resolution = setup.get("resolution")
+        if resolution:
+            profiler.ConfigureResolution(*resolution)  # X resolution, Z resolution
+        if setup.get("exposure") is not None:
+            profiler.ConfigureExposureTime(setup["exposure"])
+
+    def store_all(self, profiler):
+        """
+        Write every configured setup that is not yet in its sensor storage,
+        then reload the default storage. Call after login. A setup that fails
+        is logged and skipped; returns the positions that failed.
+        """
+        if not self.enabled():
+            return []
+        failed = []
+        with self.lock:
+            changed = False
+            for position_no, setup in sorted(self.setups.items()):
+                storage = setup["storage"]
+                fingerprint = json.dumps(setup, sort_keys=True, default=str)
+                if self.stored_setups.get(storage) == fingerprint:
+                    continue
+                changed = True
+                try:
+                    # Start each setup from the default so unset parameters match it
+                    profiler.LoadParameterSetup(self.default_storage)
+                    self._apply(profiler, setup)
+                    profiler.StoreParameterSetup(storage)
+                except Exception as e:
+                    self.stored_setups.pop(storage, None)
+                    failed.append(position_no)
+                    print(f"[ProfilerSetups] Position {position_no} could not be stored in setup {storage}: {e}")
+                    continue
+                self.stored_setups[storage] = fingerprint
+                print(f"[ProfilerSetups] Position {position_no} stored in setup {storage}")
+            if changed:
+                profiler.LoadParameterSetup(self.default_storage)
+                self.active_storage = self.default_storage
+            self.stored = not failed
+        return failed
+
+    def select(self, profiler, position_no):
+        """Load the setup for a position. No sensor call if it is already active."""
+        if not self.enabled():
+            return
+        storage = self.storage_for(position_no)
+        with self.lock:
+            if storage == self.active_storage:
+                return
+            profiler.LoadParameterSetup(storage)
+            self.active_storage = storage
+        print(f"[ProfilerSetups] Loaded setup {storage} for position {position_no}")
+
+    def reset(self):
+        """Forget the active storage (e.g. after a reconnect). Stored setups are kept."""
+        with self.lock:
+            self.active_storage = None
+            self.stored = False
@@ -0,0 +1,127 @@
+import threading
+import time
+
+
+class ProfilerStreamManager:
+    """
+    Owns one long-lived oxstream for the profiler.
+
+    The stream is created, tuned and started once. Captures arm and disarm a
+    window on it per position instead of creating a new streaming client each
+    time. There is one queue, so only one window is open at a time: arming
+    another position waits up to arm_timeout for the open window to be
+    disarmed and then refuses. Queue depth and overflow counters are tracked so the queue and
+    receive buffer sizes can be tuned against the measured line rate.
+    """
+
+    def __init__(self, config):
+        stream_cfg = config.get("Profiler_Stream", {})
+        self.queue_size = stream_cfg.get("queue_size", 10000)
+        self.receive_buffer_size = stream_cfg.get("receive_buffer_size", 4 * 1024 * 1024)
+        self.full_queue_handling = stream_cfg.get("full_queue_handling", 0)  # 0: drop oldest, 1: ignore newest
+        self.arm_timeout = stream_cfg.get("arm_timeout", 2.0)
+
+        self.stream = None
+        self.lock = threading.Lock()
+        self.window_closed = threading.Condition(self.lock)
+        self.armed_for = None
+        self.armed_at = None
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.profiles_read = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.overflow_events = 0
+        self.line_rate_hz = 0.0
+
+    def open(self, profiler):
+        """Create, tune and start the stream on a connected ox instance."""
+        with self.lock:
+            self._close_stream()
+            stream = profiler.CreateStream()
+            stream.SetQueueSize(self.queue_size)
+            stream.SetReceiveBufferSize(self.receive_buffer_size)
+            stream.SetFullQueueHandling(self.full_queue_handling)
+            stream.Start()
+            self.stream = stream
+            print(
+                f"[ProfilerStream] Started (queue {stream.GetQueueSize()}, "
+                f"rx buffer {stream.GetReceiveBufferSize()}, full queue handling {stream.GetFullQueueHandling()})"
+            )
+
+    def is_open(self):
+        return self.stream is not None
+
+    def arm(self, position_no):
+        """
+        Start a capture window: drop stale profiles and reset the counters.
+        Raises RuntimeError while another position's window stays armed.
+        """
+        with self.lock:
+            if not self.window_closed.wait_for(lambda: self.armed_for in (None, position_no), self.arm_timeout):
+                raise RuntimeError(f"Profiler stream window still armed for position {self.armed_for}")
+            if self.stream is None:
+                raise RuntimeError("Profiler stream not open")
+            self.stream.ClearProfileQueue()
+            self.reset_counters()
+            self.armed_for = position_no
+            self.armed_at = time.time()
+
+    def disarm(self, position_no):
+        """End the capture window. Returns the window's counters."""
+        with self.lock:
+            stats = self.stats()
+            if self.armed_for == position_no:
+                self.armed_for = None
+                self.armed_at = None
+                self.window_closed.notify_all()
+            return stats
+
+    def read_available(self, position_no, flush=False):
+        """
+        Drain all queued profiles for an armed window.
+        Returns a list of ReadProfile() tuples (empty if the window is not armed).
+        flush is accepted for parity with UdpProfileReceiver; nothing is held back here.
+        """
+        with self.lock:
+            if self.stream is None or self.armed_for != position_no:
+                return []
+
+            depth = self.stream.GetProfileCount()
+            self.queue_depth = depth
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+            if depth >= self.queue_size:
+                self.overflow_events += 1
+
+            profiles = [self.stream.ReadProfile() for _ in range(depth)]
+            self.profiles_read += len(profiles)
+            elapsed = time.time() - self.armed_at
+            if elapsed > 0:
+                self.line_rate_hz = self.profiles_read / elapsed
+            return profiles
+
+    def stats(self):
+        return {
+            "profiles_read": self.profiles_read,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_size": self.queue_size,
+            "overflow_events": self.overflow_events,
+            "line_rate_hz": round(self.line_rate_hz, 1),
+        }
+
+    def _close_stream(self):
+        if self.stream is not None:
+            try:
+                self.stream.Stop()
+                self.stream.Close()
+            except Exception as e:
+                print(f"[ProfilerStream] Error closing stream: {e}")
+            self.stream = None
+            self.armed_for = None
+            self.window_closed.notify_all()
+
+    def close(self):
+        with self.lock:
+            self._close_stream()
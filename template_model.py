@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class TemplateModel:
+    """
+    Golden template of one weld position: per-pixel Welford mean and M2 of
+    the aligned ROI over OK captures, in float32.
+
+    Persisted as <directory>/pos_N.npy (stacked mean and M2) plus
+    pos_N.json (sample count). An update is O(pixels); scoring is a z-score
+    map whose pixels above z_threshold count as anomalous area.
+    """
+
+    def __init__(self, directory, position, shape=None):
+        self.directory = directory
+        self.position = str(position)
+        self.count = 0
+        self.unsaved = 0
+        self.mean = self.m2 = None
+        self.lock = threading.Lock()
+        if shape is not None:
+            self._allocate(shape)
+
+    @property
+    def array_path(self):
+        return os.path.join(self.directory, f"pos_{self.position}.npy")
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.directory, f"pos_{self.position}.json")
+
+    @property
+    def shape(self):
+        return None if self.mean is None else self.mean.shape
+
+    def _allocate(self, shape):
+        self.mean = np.zeros(shape, dtype=np.float32)
+        self.m2 = np.zeros(shape, dtype=np.float32)
+        self.count = 0
+
+    @classmethod
+    def load(cls, directory, position):
+        """Model from disk, or an empty one when nothing was saved yet."""
+        model = cls(directory, position)
+        if os.path.exists(model.array_path) and os.path.exists(model.meta_path):
+            data = np.load(model.array_path)
+            with open(model.meta_path, "r") as f:
+                meta = json.load(f)
+            model.mean = np.ascontiguousarray(data[0], dtype=np.float32)
+            model.m2 = np.ascontiguousarray(data[1], dtype=np.float32)
+            model.count = int(meta["count"])
+        return model
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            data = np.stack([self.mean, self.m2])
+            meta = {"count": self.count, "shape": list(self.mean.shape), "updated": time.time()}
+            self.unsaved = 0
+        with open(self.array_path + ".tmp", "wb") as f:
+            np.save(f, data)
+        os.replace(self.array_path + ".tmp", self.array_path)
+        with open(self.meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def update(self, roi_img):
+        """Add one aligned OK ROI. A different ROI shape restarts the model."""
+        x = np.asarray(roi_img, dtype=np.float32)
+        with self.lock:
+            if self.mean is None or self.mean.shape != x.shape:
+                self._allocate(x.shape)
+            self.count += 1
+            self.unsaved += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            x -= self.mean
+            delta *= x
+            self.m2 += delta
+
+    def ready(self, min_samples):
+        return self.mean is not None and self.count >= min_samples
+
+    def score(self, roi_img, z_threshold=4.0, sigma_floor=4.0):
+        """
+        Returns (z map as float32, anomalous area as a fraction of the ROI).
+        Pixels further than z_threshold standard deviations from the mean
+        are anomalous; sigma_floor (grey levels) keeps pixels that never
+        varied in the OK set from flagging on sensor noise.
+        """
+        with self.lock:
+            mean = self.mean.copy()
+            variance = self.m2 / max(self.count - 1, 1)
+        z = np.abs(np.asarray(roi_img, dtype=np.float32) - mean)
+        z /= np.sqrt(np.maximum(variance, sigma_floor ** 2))
+        return z, float(np.count_nonzero(z > z_threshold)) / z.size
+
+
+if __name__ == "__main__":
+    import glob
+    import sys
+
+    import cv2
+    import yaml
+
+    from weldInspector import WeldInspector
+
+    if len(sys.argv) < 3:
+        print("Usage: python template_model.py <position> <ok images or glob>... [--config Config/config.yaml]")
+        sys.exit(1)
+    args = sys.argv[1:]
+    config_path = "Config/config.yaml"
+    if "--config" in args:
+        i = args.index("--config")
+        config_path = args[i + 1]
+        del args[i:i + 2]
+    with open(config_path, "r") as f:
+        config = yaml.safe_load(f)
+
+    position, patterns = args[0], args[1:]
+    config["Weld_Template_Model"] = dict(config.get("Weld_Template_Model") or {}, enabled=True)
+    inspector = WeldInspector(config)
+    paths = sorted(p for pattern in patterns for p in glob.glob(pattern))
+    start = time.perf_counter()
+    for path in paths:
+        if not inspector.learn(position, cv2.imread(path, cv2.IMREAD_GRAYSCALE), save=False):
+            print(f"[Template] Skipped {path}")
+    model = inspector.template_model(position)
+    if model is not None and model.count:
+        model.save()
+        print(f"[Template] POS {position}: {model.count} samples, shape {model.shape}, "
+              f"{(time.perf_counter() - start) / max(len(paths), 1) * 1000:.1f} ms/image -> {model.array_path}")
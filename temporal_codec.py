@@ -0,0 +1,262 @@
+import struct
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from xz_codec import _compress, _decompress, available_codecs, parse_format
+
+SEQUENCE_FORMAT = "xz_sequence"
+_CHUNK_SIZE = struct.Struct("<I")
+
+
+# ---------------------------------------------------------------------- varint
+
+def zigzag_varint_encode(values: np.ndarray) -> bytes:
+    """Zig-zag map int16 values to unsigned and pack them as LEB128 varints (1-3 bytes each)."""
+    v = np.asarray(values, dtype=np.int32)
+    u = ((v << 1) ^ (v >> 31)).astype(np.uint32)
+    nbytes = 1 + (u >= 1 << 7) + (u >= 1 << 14)
+    ends = np.cumsum(nbytes)
+    out = np.empty(int(ends[-1]) if len(ends) else 0, dtype=np.uint8)
+    starts = ends - nbytes
+    for k in range(3):
+        has = nbytes > k
+        more = nbytes > k + 1
+        out[starts[has] + k] = ((u[has] >> (7 * k)) & 0x7F) | (more[has].astype(np.uint32) << 7)
+    return out.tobytes()
+
+
+def zigzag_varint_decode(data: bytes, count: int) -> np.ndarray:
+    """Inverse of zigzag_varint_encode. Returns `count` int32 values."""
+    b = np.frombuffer(data, dtype=np.uint8)
+    if count == 0:
+        return np.empty(0, dtype=np.int32)
+    last = (b & 0x80) == 0
+    ends = np.flatnonzero(last)
+    if len(ends) != count:
+        raise ValueError(f"Varint stream holds {len(ends)} values, expected {count}")
+    starts = np.empty(count, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    group = np.repeat(np.arange(count), ends - starts + 1)
+    shift = (np.arange(len(b)) - starts[group]) * 7
+    u = np.bincount(group, weights=((b & 0x7F).astype(np.int64) << shift), minlength=count).astype(np.int64)
+    return ((u >> 1) ^ -(u & 1)).astype(np.int32)
+
+
+# ---------------------------------------------------------------------- chunks
+
+def _quantize(profiles: Sequence[np.ndarray], precision: int):
+    lengths = np.array([len(p) for p in profiles], dtype=np.uint32)
+    if len(profiles):
+        flat = np.concatenate([np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in profiles])
+    else:
+        flat = np.empty((0, 2))
+    return lengths, np.rint(flat * (10 ** precision)).astype(np.int32)
+
+
+def encode_chunk(profiles: Sequence[np.ndarray], keyframe_interval: int = 32, precision: int = 3,
+                 codec: str = "zlib", level: int = 1) -> bytes:
+    """
+    Encode consecutive (N, 2) XZ profiles.
+    A profile is a keyframe (int32 values) every keyframe_interval profiles,
+    when its length differs from the previous one, or when a point moved by
+    more than an int16; every other profile is stored as zig-zag varint
+    int16 deltas against the previous profile.
+    """
+    lengths, q = _quantize(profiles, precision)
+    n = len(lengths)
+    index = np.arange(n)
+    key = (index % keyframe_interval) == 0
+    key[1:] |= lengths[1:] != lengths[:-1]
+
+    # Per-point delta against the same point of the previous profile
+    point_profile = np.repeat(index, lengths)
+    prev = np.arange(len(q)) - np.repeat(lengths.astype(np.int64), lengths)
+    delta = q - q[np.maximum(prev, 0)]
+
+    if len(q):
+        offsets = np.concatenate([[0], np.cumsum(lengths[:-1], dtype=np.int64)])
+        overflow_pt = (np.abs(delta) > np.iinfo(np.int16).max).any(axis=1)
+        nonempty = lengths > 0
+        overflow = np.zeros(n, dtype=bool)
+        overflow[nonempty] = np.logical_or.reduceat(overflow_pt, offsets[nonempty])
+        key[1:] |= overflow[1:]
+
+    key_points = key[point_profile]
+    header = _CHUNK_SIZE.pack(n) + lengths.astype("<u4").tobytes() + key.astype(np.uint8).tobytes()
+    keyframes = q[key_points].astype("<i4")
+    varints = zigzag_varint_encode(delta[~key_points].ravel())
+    raw = header + _CHUNK_SIZE.pack(keyframes.size) + keyframes.tobytes() + varints
+    return _compress(raw, codec, level)
+
+
+def decode_chunk(payload: bytes, precision: int = 3, codec: str = "zlib") -> List[np.ndarray]:
+    """Inverse of encode_chunk. Returns a list of (N, 2) float32 arrays."""
+    raw = _decompress(payload, codec)
+    (n,) = _CHUNK_SIZE.unpack_from(raw, 0)
+    pos = _CHUNK_SIZE.size
+    lengths = np.frombuffer(raw, dtype="<u4", count=n, offset=pos).astype(np.int64)
+    pos += 4 * n
+    key = np.frombuffer(raw, dtype=np.uint8, count=n, offset=pos).astype(bool)
+    pos += n
+    (key_count,) = _CHUNK_SIZE.unpack_from(raw, pos)
+    pos += _CHUNK_SIZE.size
+    keyframes = np.frombuffer(raw, dtype="<i4", count=key_count, offset=pos).reshape(-1, 2)
+    pos += 4 * key_count
+
+    total = int(lengths.sum())
+    key_points = key[np.repeat(np.arange(n), lengths)]
+    values = np.empty((total, 2), dtype=np.int32)
+    values[key_points] = keyframes
+    values[~key_points] = zigzag_varint_decode(raw[pos:], 2 * (total - len(keyframes))).reshape(-1, 2)
+
+    # Profiles between two keyframes share one length, so each segment is a
+    # (profiles, points, 2) block whose cumulative sum restores the values.
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    key_idx = np.flatnonzero(key)
+    bounds = np.append(key_idx, n)
+    for first, stop in zip(bounds[:-1], bounds[1:]):
+        block = values[offsets[first]:offsets[stop]].reshape(stop - first, lengths[first], 2)
+        np.cumsum(block, axis=0, out=block)
+
+    points = (values / (10 ** precision)).astype(np.float32)
+    return np.split(points, offsets[1:-1]) if n else []
+
+
+# ---------------------------------------------------------------------- files
+
+def sequence_format(codec: str, keyframe_interval: int, precision: int) -> str:
+    return f"{SEQUENCE_FORMAT};codec={codec};keyframe={keyframe_interval};precision={precision}"
+
+
+class TemporalProfileWriter:
+    """
+    Writes a profile recording as '<format>\\n' followed by length-prefixed
+    chunks of chunk_profiles profiles each. Every chunk starts with a
+    keyframe, so chunks decode independently.
+    """
+
+    def __init__(self, path: str, keyframe_interval: int = 32, precision: int = 3,
+                 codec: str = "zlib", level: int = 1, chunk_profiles: int = 256):
+        if codec not in available_codecs():
+            print(f"[TemporalCodec] Codec '{codec}' not installed, falling back to zlib.")
+            codec = "zlib"
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.precision = precision
+        self.codec = codec
+        self.level = level
+        self.chunk_profiles = chunk_profiles
+        self.pending = []
+        self.count = 0
+        self.f = open(path, "wb")
+        self.f.write(sequence_format(codec, keyframe_interval, precision).encode("ascii") + b"\n")
+
+    def append(self, x, z):
+        xz = np.empty((len(x), 2), dtype=np.float64)
+        xz[:, 0] = x
+        xz[:, 1] = z
+        self.pending.append(xz)
+        self.count += 1
+        if len(self.pending) >= self.chunk_profiles:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        payload = encode_chunk(self.pending, self.keyframe_interval, self.precision, self.codec, self.level)
+        self.f.write(_CHUNK_SIZE.pack(len(payload)))
+        self.f.write(payload)
+        self.pending = []
+
+    def close(self):
+        if self.f is not None:
+            self.flush()
+            self.f.close()
+            self.f = None
+
+
+def read_profile_sequence(path: str) -> List[np.ndarray]:
+    """Read a file written by TemporalProfileWriter into (N, 2) float32 arrays."""
+    profiles = []
+    with open(path, "rb") as f:
+        params = parse_format(f.readline().decode("ascii").strip())
+        precision = int(params["precision"])
+        while True:
+            size = f.read(_CHUNK_SIZE.size)
+            if len(size) < _CHUNK_SIZE.size:
+                break
+            (n,) = _CHUNK_SIZE.unpack(size)
+            profiles.extend(decode_chunk(f.read(n), precision, params["codec"]))
+    return profiles
+
+
+# ---------------------------------------------------------------------- benchmark
+
+def benchmark(profiles: List[np.ndarray], precision: int = 3, repeat: int = 3,
+              chunk_profiles: int = 256) -> List[Dict[str, float]]:
+    """Size ratio vs. the text log and MB/s (encode/decode) per keyframe interval and codec."""
+    text_bytes = sum(
+        len(f"Timestamp: 0, Length: {len(p)}\n") + len("X: " + ",".join(map(str, p[:, 0])) + "\n")
+        + len("Z: " + ",".join(map(str, p[:, 1])) + "\n\n")
+        for p in profiles
+    )
+    raw_bytes = sum(p.astype(np.float32).nbytes for p in profiles)
+    chunks = [profiles[i:i + chunk_profiles] for i in range(0, len(profiles), chunk_profiles)]
+    scale = 10.0 ** -precision
+    results = []
+    for codec in available_codecs():
+        for interval in (1, 8, 32, 256):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                encoded = [encode_chunk(c, interval, precision, codec) for c in chunks]
+            encode_s = (time.perf_counter() - start) / repeat
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                decoded = [p for payload in encoded for p in decode_chunk(payload, precision, codec)]
+            decode_s = (time.perf_counter() - start) / repeat
+
+            error = max(float(np.abs(a - b).max(initial=0.0)) for a, b in zip(profiles, decoded))
+            if len(decoded) != len(profiles) or error > scale:
+                raise AssertionError(f"Round trip failed ({codec}, keyframe {interval}): max error {error}")
+
+            size = sum(len(payload) for payload in encoded)
+            results.append({
+                "name": sequence_format(codec, interval, precision),
+                "text_ratio": text_bytes / size,
+                "float32_ratio": raw_bytes / size,
+                "encode_mb_s": raw_bytes / encode_s / 1e6,
+                "decode_mb_s": raw_bytes / decode_s / 1e6,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    import glob
+    import sys
+
+    from xz_codec import load_profile_log
+
+    paths = sys.argv[1:] or glob.glob("profiler_centers/*/profile_center.txt") + glob.glob("profiler_data/*/profile_log.txt")
+    profiles = [p for path in paths for p in load_profile_log(path)]
+    if not profiles:
+        print("No non-empty profiles in recordings, using a synthetic stationary capture.")
+        rng = np.random.default_rng(0)
+        x = np.linspace(-40.0, 40.0, 1280)
+        z = 120.0 + 3.0 * np.sin(x / 7.0) - 5.0 * ((x > 5) & (x < 9))
+        profiles = [np.stack([x, z + rng.normal(0.0, 0.005, len(x))], axis=1).astype(np.float32) for _ in range(2000)]
+
+    # Round trip with varying lengths and a jump that forces an int32 keyframe
+    check = [p for p in profiles[:40]] + [profiles[0][:100], profiles[0][:100] + 100.0]
+    decoded = decode_chunk(encode_chunk(check, 16), 3)
+    assert all(np.allclose(a, b, atol=1e-3) for a, b in zip(check, decoded)), "round trip mismatch"
+    values = np.array([0, 1, -1, 63, -64, 64, 8191, -8192, 8192, 32767, -32768], dtype=np.int32)
+    assert np.array_equal(zigzag_varint_decode(zigzag_varint_encode(values), len(values)), values)
+
+    print(f"{len(profiles)} profiles, codecs available: {', '.join(available_codecs())}")
+    for r in benchmark(profiles):
+        print(f"{r['name']:<55} vs text {r['text_ratio']:7.1f}x  vs float32 {r['float32_ratio']:5.2f}x  "
+              f"enc {r['encode_mb_s']:7.1f} MB/s  dec {r['decode_mb_s']:7.1f} MB/s")
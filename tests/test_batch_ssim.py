@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from batch_ssim import batch_ssim, local_stats
+
+structural_similarity = pytest.importorskip("skimage.metrics").structural_similarity
+
+
+def _images(count, h=61, w=70, seed=0):
+    rng = np.random.default_rng(seed)
+    base = np.clip(128 + 60 * np.sin(np.arange(w) / 9.0)[None, :] + rng.normal(0, 8, (h, w)), 0, 255)
+    test = np.clip(base + rng.normal(0, 10, (h, w)), 0, 255).astype(np.uint8)
+    refs = np.clip(base[None] * rng.uniform(0.8, 1.2, (count, 1, 1)) + rng.normal(0, 10, (count, h, w)), 0, 255)
+    return refs.astype(np.uint8), test
+
+
+@pytest.mark.parametrize("count", [1, 4])
+def test_scores_match_skimage(count):
+    refs, test = _images(count)
+    scores, maps = batch_ssim(local_stats(refs), test)
+    assert scores.shape == (count,)
+    assert maps.shape == refs.shape
+    for ref, score, ssim_map in zip(refs, scores, maps):
+        expected, expected_map = structural_similarity(ref, test, full=True, data_range=255)
+        assert score == pytest.approx(expected, abs=1e-4)
+        assert np.abs(ssim_map - expected_map).max() < 1e-3
+
+
+def test_identical_image_scores_one():
+    refs, test = _images(1)
+    scores, _ = batch_ssim(local_stats(test[None]), test)
+    assert scores[0] == pytest.approx(1.0, abs=1e-6)
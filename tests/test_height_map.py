@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+from height_map import HeightMap
+
+
+def _batch(first, count, x_grid):
+    x = np.linspace(x_grid[0] - 1.0, x_grid[-1] + 1.0, 200)
+    z_list = [2.0 * x + row for row in range(first, first + count)]
+    return [x] * count, z_list, list(range(first, first + count))
+
+
+def test_grow_keeps_rows_and_finish_truncates(tmp_path):
+    directory = str(tmp_path / "height_map")
+    x_grid = np.linspace(-5.0, 5.0, 21)
+    height_map = HeightMap(directory, x_grid, capacity=4)
+    for first in range(0, 15, 5):
+        height_map.append_profiles(*_batch(first, 5, x_grid))
+    assert height_map.rows == 15
+    assert height_map.capacity >= 15
+
+    assert height_map.finish() == 15
+    assert np.load(os.path.join(directory, "z.npy"), mmap_mode="r").shape == (15, len(x_grid))
+    assert np.load(os.path.join(directory, "coords.npy"), mmap_mode="r").shape == (15,)
+
+    loaded = HeightMap.load(directory)
+    assert np.array_equal(loaded["x"], x_grid)
+    assert np.array_equal(loaded["coords"], np.arange(15))
+    assert loaded["valid"].all()
+    expected = 2.0 * x_grid[None, :] + np.arange(15)[:, None]
+    assert np.allclose(loaded["z"], expected, atol=1e-4)
+
+
+def test_grid_points_outside_a_profile_are_invalid(tmp_path):
+    directory = str(tmp_path / "height_map")
+    x_grid = np.linspace(-5.0, 5.0, 11)
+    height_map = HeightMap(directory, x_grid)
+    x = np.linspace(0.0, 5.0, 50)
+    height_map.append_profiles([x[::-1]], [x[::-1] + 1.0], [7.0])
+    height_map.finish()
+
+    loaded = HeightMap.load(directory)
+    assert np.array_equal(loaded["valid"][0], x_grid >= 0.0)
+    assert np.isnan(loaded["z"][0][x_grid < 0.0]).all()
+    assert np.allclose(loaded["z"][0][x_grid >= 0.0], x_grid[x_grid >= 0.0] + 1.0, atol=1e-5)
+
+
+def test_empty_sweep(tmp_path):
+    directory = str(tmp_path / "height_map")
+    height_map = HeightMap(directory, np.arange(3.0))
+    assert height_map.finish() == 0
+    assert HeightMap.load(directory)["z"].shape == (0, 3)
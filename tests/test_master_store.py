@@ -0,0 +1,79 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from master_store import MasterProfileStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MasterProfileStore(str(tmp_path / "master_profiles"))
+    yield store
+    store.close()
+
+
+def _master(offset=0.0):
+    return {
+        "raw_profile": {"X": [0.0, 0.5, 1.0], "Z": [10.0 + offset, 10.5, 11.0]},
+        "holes": [{"x_center": 0.5, "width": 0.2}],
+        "nuts": [],
+        "global_thresholds": {"width_tolerance": 0.1},
+    }
+
+
+def test_put_get_round_trip(store):
+    store.put("event_4", _master())
+    master = store.get("event_4")
+    assert master["holes"] == [{"x_center": 0.5, "width": 0.2}]
+    assert "raw_profile" not in master
+
+    master = store.get("event_4", include_raw=True)
+    assert master["raw_profile"] == {"X": [0.0, 0.5, 1.0], "Z": [10.0, 10.5, 11.0]}
+    raw = store.load_raw_profile("event_4")
+    assert raw["X"].dtype == np.float32
+
+
+def test_put_replaces_existing_event(store):
+    store.put("event_4", _master())
+    store.put("event_4", dict(_master(1.0), holes=[]))
+    assert store.list_events() == ["event_4"]
+    master = store.get("event_4", include_raw=True)
+    assert master["holes"] == []
+    assert master["raw_profile"]["Z"][0] == 11.0
+
+
+def test_names_that_sanitize_alike_keep_their_own_raw_file(store):
+    store.put("a/b", _master(1.0))
+    store.put("a_b", _master(2.0))
+    assert store.load_raw_profile("a/b")["Z"][0] == 11.0
+    assert store.load_raw_profile("a_b")["Z"][0] == 12.0
+    assert len(os.listdir(store.raw_dir)) == 2
+
+
+def test_delete_removes_row_and_raw_file(store):
+    store.put("event_4", _master())
+    assert store.delete("event_4")
+    assert store.get("event_4") is None
+    assert os.listdir(store.raw_dir) == []
+    assert not store.delete("event_4")
+
+
+def test_import_legacy_json_only_into_an_empty_store(store, tmp_path):
+    legacy = tmp_path / "master_profiles.json"
+    legacy.write_text(json.dumps({"event_4": _master(), "event_5": _master(1.0)}))
+    assert store.import_legacy_json(str(legacy)) == 2
+    assert store.list_events() == ["event_4", "event_5"]
+    assert store.get("event_5", include_raw=True)["raw_profile"]["Z"][0] == 11.0
+    assert store.import_legacy_json(str(legacy)) == 0
+
+
+def test_store_survives_reopen(tmp_path):
+    root = str(tmp_path / "master_profiles")
+    store = MasterProfileStore(root)
+    store.put("event_4", _master())
+    store.close()
+    store = MasterProfileStore(root)
+    assert store.get("event_4", include_raw=True)["raw_profile"]["X"] == [0.0, 0.5, 1.0]
+    store.close()
@@ -0,0 +1,40 @@
+import json
+
+from profile_filter import ProfileFilter
+
+
+def _profile(block_id, valid=True, alarm=False, quality=0, length=10):
+    z = None if length == 0 else [0.0] * length
+    return (block_id, False, True, valid, alarm, quality, 1000 + block_id, length, block_id, [0.0] * length, z, None)
+
+
+def test_consecutive_drops_are_one_run(tmp_path):
+    ingest = ProfileFilter({"Profiler_Ingest_Filter": {"quality_ids": [0]}})
+    profiles = (
+        [_profile(i, length=0) for i in range(0, 3)]
+        + [_profile(3), _profile(4)]
+        + [_profile(i, valid=False) for i in range(5, 9)]
+        + [_profile(i, alarm=True) for i in range(9, 11)]
+        + [_profile(11, quality=2), _profile(12)]
+    )
+    kept = ingest.filter(profiles[:6])
+    kept += ingest.filter(profiles[6:])
+    assert [p[0] for p in kept] == [3, 4, 12]
+
+    audit = ingest.write_audit(str(tmp_path / "ingest_audit.json"))
+    assert audit["kept"] == 3
+    assert audit["dropped"] == 10
+    assert audit["dropped_by_reason"] == {"length": 3, "invalid": 4, "alarm": 2, "quality": 1}
+    runs = [(r["reason"], r["count"], r["first_block"], r["last_block"]) for r in audit["runs"]]
+    # The invalid run spans the two filter() calls
+    assert runs == [("length", 3, 0, 2), ("invalid", 4, 5, 8), ("alarm", 2, 9, 10), ("quality", 1, 11, 11)]
+    assert audit["runs"][1]["first_timestamp"] == 1005 and audit["runs"][1]["last_timestamp"] == 1008
+    with open(tmp_path / "ingest_audit.json") as f:
+        assert json.load(f) == audit
+
+
+def test_disabled_checks_keep_everything_but_short_profiles():
+    ingest = ProfileFilter({"Profiler_Ingest_Filter": {"require_valid": False, "drop_alarm": False, "min_length": 5}})
+    kept = ingest.filter([_profile(0, valid=False, alarm=True, quality=7), _profile(1, length=4)])
+    assert [p[0] for p in kept] == [0]
+    assert ingest.summary()["dropped_by_reason"] == {"length": 1}
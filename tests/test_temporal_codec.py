@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from temporal_codec import (
+    TemporalProfileWriter,
+    decode_chunk,
+    encode_chunk,
+    read_profile_sequence,
+    zigzag_varint_decode,
+    zigzag_varint_encode,
+)
+
+
+def _profiles(count=40, points=200, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(-40.0, 40.0, points)
+    z = 120.0 + 3.0 * np.sin(x / 7.0)
+    return [np.stack([x, z + rng.normal(0.0, 0.005, points)], axis=1).astype(np.float32) for _ in range(count)]
+
+
+def test_zigzag_varint_round_trip():
+    values = np.array([0, 1, -1, 63, -64, 64, 8191, -8192, 8192, 32767, -32768], dtype=np.int32)
+    encoded = zigzag_varint_encode(values)
+    assert np.array_equal(zigzag_varint_decode(encoded, len(values)), values)
+    # 1 byte up to |63|, 2 bytes up to |8191|, 3 bytes for the rest of int16
+    assert len(encoded) == 1 + 1 + 1 + 1 + 1 + 2 + 2 + 2 + 3 + 3 + 3
+
+
+def test_zigzag_varint_empty_and_count_mismatch():
+    assert zigzag_varint_encode(np.empty(0, dtype=np.int32)) == b""
+    assert len(zigzag_varint_decode(b"", 0)) == 0
+    with pytest.raises(ValueError):
+        zigzag_varint_decode(zigzag_varint_encode(np.array([1, 2, 3])), 2)
+
+
+@pytest.mark.parametrize("keyframe_interval", [1, 8, 32])
+def test_chunk_round_trip(keyframe_interval):
+    profiles = _profiles()
+    decoded = decode_chunk(encode_chunk(profiles, keyframe_interval, precision=3), precision=3)
+    assert len(decoded) == len(profiles)
+    for original, restored in zip(profiles, decoded):
+        assert restored.shape == original.shape
+        assert np.abs(original - restored).max() <= 1e-3
+
+
+def test_chunk_keyframes_on_length_change_and_large_jump():
+    base = _profiles(count=4)
+    # A shorter profile and a jump past int16 at precision 3 both force a keyframe
+    profiles = base + [base[0][:100], base[0][:100] + 100.0, base[0][:100]]
+    decoded = decode_chunk(encode_chunk(profiles, keyframe_interval=16), precision=3)
+    assert [len(p) for p in decoded] == [len(p) for p in profiles]
+    for original, restored in zip(profiles, decoded):
+        assert np.allclose(original, restored, atol=1e-3)
+
+
+def test_empty_chunk():
+    assert decode_chunk(encode_chunk([])) == []
+
+
+def test_writer_and_read_profile_sequence(tmp_path):
+    profiles = _profiles(count=70)
+    path = tmp_path / "profile_center.xzs"
+    writer = TemporalProfileWriter(str(path), keyframe_interval=8, chunk_profiles=32)
+    for profile in profiles:
+        writer.append(profile[:, 0], profile[:, 1])
+    writer.close()
+
+    decoded = read_profile_sequence(str(path))
+    assert writer.count == len(profiles) == len(decoded)
+    for original, restored in zip(profiles, decoded):
+        assert np.abs(original - restored).max() <= 1e-3
@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+import pytest
+
+from udp_ingest import UdpProfileReceiver, replay_profiles
+
+
+def _profiles(count, points=64):
+    x = np.linspace(-10.0, 10.0, points)
+    return [np.stack([x, 50.0 + np.sin(x + i)], axis=1) for i in range(count)]
+
+
+def _receive_all(receiver, window, expected, timeout=2.0):
+    """Read while datagrams arrive, then close the window with a flushing read."""
+    received = []
+    deadline = time.time() + timeout
+    while receiver.datagrams < expected and time.time() < deadline:
+        received += receiver.read_available(window)
+        time.sleep(0.01)
+    received += receiver.read_available(window, flush=True)
+    return received
+
+
+@pytest.fixture
+def receiver():
+    receiver = UdpProfileReceiver({"Profiler_Stream": {"udp_bind_ip": "127.0.0.1", "udp_port": 0, "max_points": 256}})
+    receiver.open()
+    yield receiver
+    receiver.close()
+
+
+@pytest.mark.parametrize("drop_every, swap_every", [(0, 0), (0, 5), (7, 4)])
+def test_replay_returns_every_sent_profile(receiver, drop_every, swap_every):
+    count = 30
+    profiles = _profiles(count)
+    receiver.arm("test")
+    sent = replay_profiles(profiles, "127.0.0.1", receiver.port, drop_every=drop_every, swap_every=swap_every)
+    received = _receive_all(receiver, "test", sent)
+    stats = receiver.disarm("test")
+
+    dropped = {i for i in range(count) if drop_every and (i + 1) % drop_every == 0}
+    # Only drops in the middle of the run are detectable as lost
+    expected = [i for i in range(count) if i not in dropped]
+    assert [p[0] for p in received] == expected
+    assert stats["lost"] == len(dropped)
+    assert stats["profiles_read"] == len(expected)
+    for profile in received:
+        block = profile[0]
+        assert np.allclose(profile[10] / 100.0, profiles[block][:, 1], atol=0.01)
+    if swap_every:
+        assert stats["reordered"] > 0
+
+
+def test_unflushed_reads_hold_back_the_reorder_window(receiver):
+    receiver.arm("test")
+    sent = replay_profiles(_profiles(20), "127.0.0.1", receiver.port)
+    deadline = time.time() + 2.0
+    while receiver.datagrams < sent and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(receiver.read_available("test")) == sent - receiver.reorder_window
+    assert len(receiver.read_available("test", flush=True)) == receiver.reorder_window
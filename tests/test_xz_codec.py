@@ -0,0 +1,47 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from xz_codec import LEGACY_FORMAT, decode_xz, encode_xz, parse_format
+
+
+def _profile(points=500):
+    x = np.linspace(-40.0, 40.0, points)
+    z = 120.0 + 3.0 * np.sin(x / 7.0)
+    return np.round(np.stack([x, z], axis=1), 3).astype(np.float32)
+
+
+def test_quantized_delta_shuffle_round_trip():
+    xz = _profile()
+    payload, fmt = encode_xz(xz, precision=3)
+    params = parse_format(fmt)
+    assert params["filter"] == "delta+shuffle" and params["precision"] == "3"
+    assert np.abs(decode_xz(payload, fmt) - xz).max() <= 1e-3
+
+
+def test_float_xor_round_trip_is_lossless():
+    xz = _profile() + np.float32(1e-5)
+    payload, fmt = encode_xz(xz, precision=None)
+    assert parse_format(fmt)["filter"] == "xor+shuffle"
+    assert np.array_equal(decode_xz(payload, fmt), xz)
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf, 3e9])
+def test_unquantizable_values_fall_back_to_float(bad):
+    xz = _profile()
+    xz[10, 1] = bad
+    payload, fmt = encode_xz(xz, precision=3)
+    assert "precision" not in parse_format(fmt)
+    assert np.array_equal(decode_xz(payload, fmt), xz, equal_nan=True)
+
+
+@pytest.mark.parametrize("precision", [3, None])
+def test_empty_array(precision):
+    payload, fmt = encode_xz(np.empty((0, 2), dtype=np.float32), precision=precision)
+    assert decode_xz(payload, fmt).shape == (0, 2)
+
+
+def test_legacy_format():
+    xz = _profile()
+    assert np.array_equal(decode_xz(zlib.compress(xz.tobytes()), LEGACY_FORMAT), xz)
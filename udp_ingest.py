@@ -0,0 +1,381 @@
+import socket
+import threading
+import time
+from typing import List
+
+import numpy as np
+
+# Datagram layout: fixed header followed by Length X values and Length Z values.
+# The header carries the same fields as oxstream.ReadProfile(). This layout is
+# NOT yet verified against the sensor's UDP streaming protocol, so
+# DeviceSession rejects transport: udp; check field order and point type
+# against the firmware in use before enabling it. replay_profiles() produces
+# this layout, so the receiver can be exercised without a sensor.
+PROFILE_HEADER_DTYPE = np.dtype([
+    ("block_id", "<u4"),
+    ("flags", "<u2"),        # bit0 config mode, bit1 NTP synced, bit2 values valid, bit3 alarm
+    ("quality", "<u2"),
+    ("timestamp", "<u8"),
+    ("encoder", "<i4"),
+    ("length", "<u2"),
+    ("reserved", "<u2"),
+])
+POINT_DTYPE = np.dtype("<i2")
+
+FLAG_CONFIG_MODE = 0x1
+FLAG_NTP_SYNCED = 0x2
+FLAG_VALUES_VALID = 0x4
+FLAG_ALARM = 0x8
+
+
+class UdpProfileReceiver:
+    """
+    Receives profile datagrams straight into preallocated NumPy buffers.
+
+    A receiver thread drains the socket in batches with recv_into() into a
+    datagram slab, then decodes the whole batch at once with structured dtypes
+    and scatters it into a ring indexed by BlockId. Out-of-order datagrams land
+    in their own slot; block ids that are still missing once the reorder window
+    has passed are counted as lost.
+
+    Exposes the same arm/disarm/read_available/stats interface as
+    ProfilerStreamManager so capture code can use either transport.
+    """
+
+    def __init__(self, config):
+        stream_cfg = config.get("Profiler_Stream", {})
+        self.bind_ip = stream_cfg.get("udp_bind_ip", "0.0.0.0")
+        self.port = stream_cfg.get("udp_port", 5100)
+        self.max_points = stream_cfg.get("max_points", 2048)
+        self.capacity = stream_cfg.get("queue_size", 10000)
+        self.receive_buffer_size = stream_cfg.get("receive_buffer_size", 4 * 1024 * 1024)
+        self.batch_size = stream_cfg.get("udp_batch_size", 256)
+        self.reorder_window = stream_cfg.get("reorder_window", 8)
+        self.arm_timeout = stream_cfg.get("arm_timeout", 2.0)
+
+        self.header_size = PROFILE_HEADER_DTYPE.itemsize
+        self.datagram_size = self.header_size + 2 * self.max_points * POINT_DTYPE.itemsize
+
+        # Receive slab for one batch of raw datagrams
+        self.slab = np.zeros((self.batch_size, self.datagram_size), dtype=np.uint8)
+        self.slab_sizes = np.zeros(self.batch_size, dtype=np.int64)
+
+        # Ring of decoded profiles, slot = block_id % capacity
+        self.ring_header = np.zeros(self.capacity, dtype=PROFILE_HEADER_DTYPE)
+        self.ring_x = np.zeros((self.capacity, self.max_points), dtype=POINT_DTYPE)
+        self.ring_z = np.zeros((self.capacity, self.max_points), dtype=POINT_DTYPE)
+        self.ring_block = np.full(self.capacity, -1, dtype=np.int64)
+
+        self.sock = None
+        self.thread = None
+        self.running = False
+        self.lock = threading.Lock()
+        self.window_closed = threading.Condition(self.lock)
+        self.armed_for = None
+        self.next_block = None
+        self.start_pending = False  # next_block is only a guess until the first read
+        self.last_arrival = None
+        self.max_block = -1
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.profiles_read = 0
+        self.datagrams = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.late = 0
+        self.truncated = 0
+        self.oversized = 0
+        self.overwritten = 0
+        self.max_backlog = 0
+
+    # ------------------------------------------------------------------ lifecycle
+
+    def open(self, profiler=None):
+        """Bind the socket and start the receiver thread. profiler is unused (interface parity)."""
+        if self.sock is not None:
+            return
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_size)
+        self.sock.bind((self.bind_ip, self.port))
+        self.port = self.sock.getsockname()[1]
+        self.sock.settimeout(0.05)
+        self.running = True
+        self.thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self.thread.start()
+        print(f"[UdpIngest] Listening on {self.bind_ip}:{self.port}")
+
+    def is_open(self):
+        return self.sock is not None
+
+    def close(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    # ------------------------------------------------------------------ receive path
+
+    def _receive_batch(self):
+        """Block for the first datagram, then drain without blocking up to batch_size."""
+        count = 0
+        try:
+            self.slab_sizes[0] = self.sock.recv_into(self.slab[0])
+            count = 1
+        except socket.timeout:
+            return 0
+        self.sock.setblocking(False)
+        try:
+            while count < self.batch_size:
+                self.slab_sizes[count] = self.sock.recv_into(self.slab[count])
+                count += 1
+        except (BlockingIOError, InterruptedError):
+            pass
+        finally:
+            self.sock.settimeout(0.05)
+        return count
+
+    def _receive_loop(self):
+        while self.running:
+            try:
+                count = self._receive_batch()
+            except OSError:
+                if not self.running:
+                    break
+                raise
+            if count:
+                self._decode_batch(count)
+
+    def _decode_batch(self, count):
+        slab = self.slab[:count]
+        sizes = self.slab_sizes[:count]
+
+        headers = slab[:, :self.header_size].copy().view(PROFILE_HEADER_DTYPE).ravel()
+        lengths = headers["length"].astype(np.int64)
+
+        # Drop profiles longer than the buffers (their Z offset is unknown)
+        # and datagrams shorter than their declared payload
+        oversized = lengths > self.max_points
+        complete = ~oversized & (sizes >= self.header_size + 2 * lengths * POINT_DTYPE.itemsize)
+        self.oversized += int(np.count_nonzero(oversized))
+        self.truncated += int(np.count_nonzero(~complete & ~oversized))
+        headers, lengths, slab = headers[complete], lengths[complete], slab[complete]
+        if len(headers) == 0:
+            return
+
+        # Gather X and Z for the whole batch with one fancy index each
+        points = slab[:, self.header_size:].view(POINT_DTYPE)
+        cols = np.arange(self.max_points)
+        in_profile = cols[None, :] < lengths[:, None]
+        x = np.where(in_profile, points[:, :self.max_points], 0)
+        z_cols = np.minimum(lengths[:, None] + cols[None, :], 2 * self.max_points - 1)
+        z = np.where(in_profile, np.take_along_axis(points, z_cols, axis=1), 0)
+
+        block_ids = headers["block_id"].astype(np.int64)
+        slots = block_ids % self.capacity
+
+        with self.lock:
+            self.datagrams += len(block_ids)
+            if self.next_block is None:
+                self.next_block = int(block_ids.min())
+                self.start_pending = True
+            elif self.start_pending:
+                # Nothing read yet: an earlier block arriving within the
+                # reorder window moves the start back instead of being late
+                early = block_ids[block_ids >= self.next_block - self.reorder_window]
+                if len(early):
+                    self.next_block = min(self.next_block, int(early.min()))
+
+            stale = block_ids < self.next_block
+            seen = self.ring_block[slots] == block_ids
+            self.duplicates += int(np.count_nonzero(seen & ~stale))
+            # Arrivals with a lower block id than the datagram before them,
+            # including the last one of the previous batch
+            previous = np.empty_like(block_ids)
+            previous[0] = block_ids[0] if self.last_arrival is None else self.last_arrival
+            previous[1:] = block_ids[:-1]
+            self.reordered += int(np.count_nonzero(block_ids < previous))
+            self.last_arrival = int(block_ids[-1])
+            keep = ~stale & ~seen
+            self.late += int(np.count_nonzero(stale))  # arrived after the reorder window passed
+
+            # Slots still holding unread profiles are overwritten (reader too slow)
+            pending = (self.ring_block[slots[keep]] >= self.next_block)
+            self.overwritten += int(np.count_nonzero(pending))
+
+            self.ring_header[slots[keep]] = headers[keep]
+            self.ring_x[slots[keep]] = x[keep]
+            self.ring_z[slots[keep]] = z[keep]
+            self.ring_block[slots[keep]] = block_ids[keep]
+            self.max_block = max(self.max_block, int(block_ids.max()))
+            self.max_backlog = max(self.max_backlog, self.max_block - self.next_block + 1)
+
+    # ------------------------------------------------------------------ capture windows
+
+    def arm(self, position_no):
+        """Same single-window contract as ProfilerStreamManager.arm()."""
+        with self.lock:
+            if not self.window_closed.wait_for(lambda: self.armed_for in (None, position_no), self.arm_timeout):
+                raise RuntimeError(f"UDP receiver window still armed for position {self.armed_for}")
+            if self.sock is None:
+                raise RuntimeError("UDP receiver not open")
+            self.reset_counters()
+            self.armed_for = position_no
+            self.armed_at = time.time()
+            # Discard everything received before the window opened
+            self.next_block = self.max_block + 1 if self.max_block >= 0 else None
+            self.start_pending = False
+
+    def disarm(self, position_no):
+        with self.lock:
+            stats = self.stats()
+            if self.armed_for == position_no:
+                self.armed_for = None
+                self.window_closed.notify_all()
+            return stats
+
+    def read_block(self, flush=False):
+        """
+        Return the profiles that are ready in BlockId order as arrays:
+        (headers, x, z) with x/z of shape (n, max_points). Block ids inside the
+        reorder window are held back unless flush is True.
+        """
+        with self.lock:
+            if self.next_block is None or self.max_block < 0:
+                return self.ring_header[:0].copy(), self.ring_x[:0].copy(), self.ring_z[:0].copy()
+
+            last = self.max_block if flush else self.max_block - self.reorder_window
+            if last < self.next_block:
+                return self.ring_header[:0].copy(), self.ring_x[:0].copy(), self.ring_z[:0].copy()
+
+            wanted = np.arange(self.next_block, last + 1, dtype=np.int64)
+            slots = wanted % self.capacity
+            present = self.ring_block[slots] == wanted
+            self.lost += int(np.count_nonzero(~present))
+            self.next_block = last + 1
+            self.start_pending = False
+
+            slots = slots[present]
+            headers = self.ring_header[slots].copy()
+            x = self.ring_x[slots].copy()
+            z = self.ring_z[slots].copy()
+            self.profiles_read += len(slots)
+            return headers, x, z
+
+    def read_available(self, position_no, flush=False):
+        """
+        ReadProfile()-compatible tuples for an armed window. The last read of
+        a window must pass flush=True, or the newest reorder_window block ids
+        are never returned.
+        """
+        if self.armed_for != position_no:
+            return []
+        headers, x, z = self.read_block(flush)
+        profiles = []
+        for h, xs, zs in zip(headers, x, z):
+            n = int(h["length"])
+            flags = int(h["flags"])
+            profiles.append((
+                int(h["block_id"]), bool(flags & FLAG_CONFIG_MODE), bool(flags & FLAG_NTP_SYNCED),
+                bool(flags & FLAG_VALUES_VALID), bool(flags & FLAG_ALARM), int(h["quality"]),
+                int(h["timestamp"]), n, int(h["encoder"]), xs[:n], zs[:n], None,
+            ))
+        return profiles
+
+    def stats(self):
+        return {
+            "profiles_read": self.profiles_read,
+            "datagrams": self.datagrams,
+            "lost": self.lost,
+            "duplicates": self.duplicates,
+            "reordered": self.reordered,
+            "late": self.late,
+            "truncated": self.truncated,
+            "oversized": self.oversized,
+            "overwritten": self.overwritten,
+            "max_backlog": self.max_backlog,
+            "queue_size": self.capacity,
+        }
+
+
+def encode_datagram(block_id, x, z, timestamp=0, encoder=0, quality=0, flags=FLAG_VALUES_VALID):
+    """Pack one profile into the datagram layout read by UdpProfileReceiver."""
+    header = np.zeros(1, dtype=PROFILE_HEADER_DTYPE)
+    header["block_id"] = block_id
+    header["flags"] = flags
+    header["quality"] = quality
+    header["timestamp"] = timestamp
+    header["encoder"] = encoder
+    header["length"] = len(x)
+    return header.tobytes() + np.asarray(x, dtype=POINT_DTYPE).tobytes() + np.asarray(z, dtype=POINT_DTYPE).tobytes()
+
+
+def replay_profiles(
+    profiles: List[np.ndarray],
+    host: str,
+    port: int,
+    rate_hz: float = 0.0,
+    scale: float = 100.0,
+    drop_every: int = 0,
+    swap_every: int = 0,
+    first_block: int = 0,
+):
+    """
+    Send recorded (N, 2) XZ profiles to a receiver as sensor-style datagrams.
+    - scale: multiplier to the integer point unit (100 -> 1/100 mm)
+    - drop_every / swap_every: simulate loss and reordering for testing
+    """
+    datagrams = []
+    for idx, xz in enumerate(profiles):
+        xi = np.rint(xz[:, 0] * scale)
+        zi = np.rint(xz[:, 1] * scale)
+        datagrams.append(encode_datagram(first_block + idx, xi, zi, timestamp=idx, encoder=idx))
+
+    if drop_every:
+        datagrams = [d for i, d in enumerate(datagrams) if (i + 1) % drop_every]
+    if swap_every:
+        for i in range(0, len(datagrams) - 1, swap_every):
+            datagrams[i], datagrams[i + 1] = datagrams[i + 1], datagrams[i]
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1.0 / rate_hz if rate_hz else 0.0
+    try:
+        for datagram in datagrams:
+            sock.sendto(datagram, (host, port))
+            if interval:
+                time.sleep(interval)
+    finally:
+        sock.close()
+    return len(datagrams)
+
+
+if __name__ == "__main__":
+    import glob
+    import sys
+
+    from xz_codec import load_profile_log
+
+    paths = sys.argv[1:] or glob.glob("profiler_data/*/profile_log.txt")
+    profiles = [p for path in paths for p in load_profile_log(path)]
+    if not profiles:
+        print("No non-empty profiles in recordings, replaying synthetic 1280-point profiles.")
+        x = np.linspace(-40.0, 40.0, 1280, dtype=np.float32)
+        profiles = [np.stack([x, 120.0 + 3.0 * np.sin(x / 7.0 + i / 50.0)], axis=1) for i in range(5000)]
+
+    receiver = UdpProfileReceiver({"Profiler_Stream": {"udp_bind_ip": "127.0.0.1", "udp_port": 0, "max_points": 2048}})
+    receiver.open()
+    receiver.arm("replay")
+
+    start = time.perf_counter()
+    sent = replay_profiles(profiles, "127.0.0.1", receiver.port, rate_hz=2000, drop_every=500, swap_every=97)
+    time.sleep(0.2)
+    received = len(receiver.read_available("replay", flush=True))
+    elapsed = time.perf_counter() - start
+
+    print(f"sent {sent}, received {received} in {elapsed:.2f}s")
+    print(receiver.disarm("replay"))
+    receiver.close()
@@ -1,15 +1,52 @@
 from skimage.metrics import structural_similarity as ssim
 import cv2
 import numpy as np
+import hashlib
 import os
 
+from batch_ssim import batch_ssim, local_stats
+from inspection_cache import InspectionCache
+from template_model import TemplateModel
+from weld_alignment import STRATEGIES, PhaseAligner
+
+SSIM_THRESHOLD = 0.75
+
+
 class WeldInspector:
     def __init__(self, config):
         self.ref_config = config["Weld_Reference_ROIs"]
         self.use_gabor = config.get("Use_Gabor_Filter", False)
         self.results = []
+        self.reference_cache = {}
+        self.stack_stats = {}
         self.output_dir = "inspection_results"
         os.makedirs(self.output_dir, exist_ok=True)
+        cascade_cfg = config.get("Inspection_Cascade") or {}
+        self.cascade_levels = cascade_cfg.get("levels", 1) if cascade_cfg.get("enabled", False) else 0
+        self.cascade_band = cascade_cfg.get("band", 0.2)
+        self.stage_counts = {"coarse": 0, "full": 0}
+        align_cfg = config.get("Weld_Alignment") or {}
+        self.align_strategy = align_cfg.get("strategy", "orb")
+        self.align_positions = {str(k): v for k, v in (align_cfg.get("positions") or {}).items()}
+        for strategy in [self.align_strategy, *self.align_positions.values()]:
+            if strategy not in STRATEGIES:
+                raise ValueError(f"Unknown alignment strategy: {strategy}")
+        self.min_response = align_cfg.get("min_response", 0.15)
+        self.aligner = PhaseAligner(align_cfg.get("margin", 64))
+        template_cfg = config.get("Weld_Template_Model") or {}
+        self.use_template = template_cfg.get("enabled", False)
+        self.template_dir = template_cfg.get("directory", "templates")
+        self.template_min_samples = template_cfg.get("min_samples", 20)
+        self.template_z = template_cfg.get("z_threshold", 4.0)
+        self.template_sigma_floor = template_cfg.get("sigma_floor", 4.0)
+        self.template_max_area = template_cfg.get("max_area", 0.002)
+        self.template_update_on_ok = template_cfg.get("update_on_ok", True)
+        self.template_save_every = template_cfg.get("save_every", 20)
+        self.template_models = {}
+        cache_cfg = config.get("Inspection_Cache") or {}
+        self.result_cache = None
+        if cache_cfg.get("enabled", True):
+            self.result_cache = InspectionCache(cache_cfg.get("max_entries", 256), cache_cfg.get("disk_dir"))
 
     def apply_gabor(self, img):
         filters = []
@@ -50,51 +87,356 @@ class WeldInspector:
         aligned = cv2.warpAffine(test_img, M, (ref_img.shape[1], ref_img.shape[0]))
         return aligned
 
-    def inspect(self, position, test_img_path):
-        print(f"[Inspection] Starting weld inspection for position {position}")
-        ref_data = self.ref_config.get(str(position))
-        if not ref_data:
-            print(f"[Inspection] No reference data found for position {position}")
-            return
+    def load_reference(self, ref_img_path):
+        """Grayscale reference image, read from disk once."""
+        ref_img = self.reference_cache.get(ref_img_path)
+        if ref_img is None:
+            ref_img = cv2.imread(ref_img_path, cv2.IMREAD_GRAYSCALE)
+            if ref_img is not None:
+                self.reference_cache[ref_img_path] = ref_img
+        return ref_img
 
-        roi = ref_data["roi"]
-        ref_img_path = ref_data["reference_image"]
+    def reference_window(self, ref_img_path, origin, shape):
+        """
+        The part of the reference matching a windowed readout: origin is
+        (offset_x, offset_y, binning) in full-resolution pixels, shape the
+        (height, width) of the grabbed frame.
+        """
+        key = (ref_img_path, origin, shape)
+        ref_img = self.reference_cache.get(key)
+        if ref_img is None:
+            full = self.load_reference(ref_img_path)
+            if full is None:
+                return None
+            ox, oy, binning = origin
+            h, w = shape
+            ref_img = full[oy:oy + h * binning, ox:ox + w * binning]
+            if binning != 1:
+                ref_img = cv2.resize(ref_img, (ref_img.shape[1] // binning, ref_img.shape[0] // binning),
+                                     interpolation=cv2.INTER_AREA)
+            self.reference_cache[key] = ref_img
+        return ref_img
 
-        test_img = cv2.imread(test_img_path, cv2.IMREAD_GRAYSCALE)
-        ref_img = cv2.imread(ref_img_path, cv2.IMREAD_GRAYSCALE)
+    @staticmethod
+    def to_gray(test_img):
+        """Accept a file path, a BGR frame or a grayscale frame."""
+        if isinstance(test_img, np.ndarray):
+            if test_img.ndim == 3:
+                return cv2.cvtColor(test_img, cv2.COLOR_BGR2GRAY)
+            return test_img
+        return cv2.imread(test_img, cv2.IMREAD_GRAYSCALE)
 
-        if test_img is None or ref_img is None:
-            print("[Inspection] Could not load test or reference image.")
-            return
+    def pyramid(self, img):
+        if img.ndim == 3:
+            return np.stack([self.pyramid(layer) for layer in img])
+        for _ in range(self.cascade_levels):
+            img = cv2.pyrDown(img)
+        return img
+
+    def reference_pyramid(self, key, ref_img):
+        """Downsampled reference for the coarse stage, computed once per reference/window."""
+        key = ("pyramid", self.cascade_levels) + key
+        coarse = self.reference_cache.get(key)
+        if coarse is None:
+            coarse = self.pyramid(ref_img)
+            self.reference_cache[key] = coarse
+        return coarse
 
-        # Align test image to reference
-        aligned_test_img = self.align_to_reference(ref_img, test_img)
+    def align(self, ref_img, test_img, roi, strategy, margin=None):
+        """
+        Align with the given strategy. Phase correlation is used when its
+        peak response reaches min_response, ORB otherwise. Returns
+        (aligned image, description of the decision).
+        """
+        if strategy != "orb":
+            M, response = self.aligner.estimate(ref_img, test_img, roi, strategy == "phase_logpolar", margin)
+            if response >= self.min_response:
+                aligned = cv2.warpAffine(test_img, M, (ref_img.shape[1], ref_img.shape[0]))
+                return aligned, f"{strategy} dx={M[0, 2]:.2f} dy={M[1, 2]:.2f} response={response:.3f}"
+            fallback = f"{strategy} response {response:.3f} < {self.min_response}, ORB"
+        else:
+            fallback = "orb"
+        return self.align_to_reference(ref_img, test_img), fallback
 
+    @staticmethod
+    def clamp_roi(roi, shape):
         x, y, w, h = roi
-        height, width = aligned_test_img.shape[:2]
-        x = min(x, width - 1)
-        y = min(y, height - 1)
-        w = min(w, width - x)
-        h = min(h, height - y)
+        height, width = shape[:2]
+        x = min(max(x, 0), width - 1)
+        y = min(max(y, 0), height - 1)
+        return x, y, min(w, width - x), min(h, height - y)
+
+    def aligned_crops(self, ref_img, test_img, roi, strategy="orb", margin=None):
+        """Align and cut the ROI out of both images. Returns (ref_crop, test_crop, alignment)."""
+        aligned_test_img, alignment = self.align(ref_img, test_img, roi, strategy, margin)
 
+        x, y, w, h = self.clamp_roi(roi, aligned_test_img.shape)
         test_crop = aligned_test_img[y:y+h, x:x+w]
         ref_crop = ref_img[y:y+h, x:x+w]
 
         if test_crop.shape != ref_crop.shape:
             test_crop = cv2.resize(test_crop, (ref_crop.shape[1], ref_crop.shape[0]))
+        return ref_crop, test_crop, alignment
 
-        if self.use_gabor:
+    def ssim_score(self, ref_crop, test_crop, use_gabor):
+        """SSIM of the (optionally Gabor filtered) crops. Returns (score, diff as uint8, ref_crop, test_crop)."""
+        if use_gabor:
             test_crop = self.apply_gabor(test_crop)
             ref_crop = self.apply_gabor(ref_crop)
 
         score, diff = ssim(ref_crop, test_crop, full=True)
-        diff = (diff * 255).astype(np.uint8)
-        heatmap = cv2.applyColorMap(255 - diff, cv2.COLORMAP_JET)
+        return score, (diff * 255).astype(np.uint8), ref_crop, test_crop
+
+    def batch_ssim_score(self, ref_stack, roi, test_crop, use_gabor):
+        """
+        SSIM of the test ROI against every reference of a (N, h, w) stack in
+        one pass; the references' ROI crops and local statistics are kept
+        per stack and ROI. Returns (best score, diff as uint8, best ref_crop,
+        test_crop, index of the best reference).
+        """
+        x, y, w, h = self.clamp_roi(roi, ref_stack.shape[1:])
+        key = (id(ref_stack), (x, y, w, h), use_gabor)
+        entry = self.stack_stats.get(key)
+        if entry is None or entry[0] is not ref_stack:
+            crops = ref_stack[:, y:y+h, x:x+w]
+            if use_gabor:
+                crops = np.stack([self.apply_gabor(crop) for crop in crops])
+            entry = (ref_stack, crops, local_stats(crops))
+            self.stack_stats[key] = entry
+        _, crops, stats = entry
+
+        if use_gabor:
+            test_crop = self.apply_gabor(test_crop)
+        scores, maps = batch_ssim(stats, test_crop)
+        best = int(np.argmax(scores))
+        diff = (np.clip(maps[best], 0, 1) * 255).astype(np.uint8)
+        return float(scores[best]), diff, crops[best], test_crop, best
+
+    def compare(self, ref_img, test_img, roi, use_gabor, strategy="orb", margin=None, ref_stack=None):
+        """
+        Align, crop the ROI and score. With a reference stack the test is
+        aligned to ref_img (the first reference) and scored against all of
+        them. Returns (score, diff as uint8, ref_crop, test_crop, alignment,
+        index of the best reference or None).
+        """
+        ref_crop, test_crop, alignment = self.aligned_crops(ref_img, test_img, roi, strategy, margin)
+        if ref_stack is not None:
+            score, diff, ref_crop, test_crop, best = self.batch_ssim_score(ref_stack, roi, test_crop, use_gabor)
+            return score, diff, ref_crop, test_crop, alignment, best
+        return self.ssim_score(ref_crop, test_crop, use_gabor) + (alignment, None)
+
+    def template_model(self, position):
+        """The position's golden-template model (loaded on first use), or None when disabled."""
+        if not self.use_template:
+            return None
+        position = str(position)
+        model = self.template_models.get(position)
+        if model is None:
+            model = TemplateModel.load(self.template_dir, position)
+            self.template_models[position] = model
+        return model
+
+    def template_score(self, model, test_crop):
+        """Z-score anomaly map against the template. Returns (score, label, diff as uint8, template, area)."""
+        z, area = model.score(test_crop, self.template_z, self.template_sigma_floor)
+        # Same convention as the SSIM map: 255 = matches, darker = anomalous
+        diff = (255 - np.clip(z * (127.0 / self.template_z), 0, 255)).astype(np.uint8)
+        template = np.clip(model.mean, 0, 255).astype(np.uint8)
+        label = "OK" if area <= self.template_max_area else "NG"
+        return 1.0 - area, label, diff, template, area
 
-        label = "OK" if score > 0.75 else "NG"
+    def learn_crop(self, position, model, crop, save=True):
+        """
+        Add an aligned OK ROI to the template. ROIs of another shape (readout
+        binning) are skipped. With save, the template is written once every
+        save_every updates; save_templates() writes the rest.
+        """
+        if model.shape is not None and model.shape != crop.shape:
+            print(f"[Template] POS {position}: ROI shape {crop.shape} does not match template {model.shape}")
+            return False
+        model.update(crop)
+        if save and model.unsaved >= self.template_save_every:
+            model.save()
+        return True
+
+    def save_templates(self):
+        """Write every template with updates that are not on disk yet."""
+        for model in list(self.template_models.values()):
+            if model.unsaved:
+                model.save()
+
+    @staticmethod
+    def reference_paths(ref_data):
+        """reference_image may be one path or a list of paths (lighting or part variants)."""
+        paths = ref_data["reference_image"]
+        return [paths] if isinstance(paths, str) else list(paths)
+
+    def reference_for(self, ref_data, test_img, origin=None):
+        """
+        Reference image (the first one listed) and ROI for a gray test frame,
+        translated into its readout window if any.
+        """
+        roi = ref_data["roi"]
+        ref_img_path = self.reference_paths(ref_data)[0]
+        if origin is not None:
+            ref_img = self.reference_window(ref_img_path, tuple(origin), test_img.shape[:2])
+            ox, oy, binning = origin
+            roi = [(roi[0] - ox) // binning, (roi[1] - oy) // binning, roi[2] // binning, roi[3] // binning]
+        else:
+            ref_img = self.load_reference(ref_img_path)
+        return ref_img, roi
+
+    def reference_stack(self, ref_data, ref_img, origin=None):
+        """
+        All references of a position stacked into one contiguous (N, h, w)
+        array, built once per position and readout window. Returns
+        (stack, paths), or (None, paths) for a single reference. References
+        that cannot be read or differ in size from the first are left out.
+        """
+        paths = self.reference_paths(ref_data)
+        if len(paths) < 2:
+            return None, paths
+        key = ("stack", tuple(paths), tuple(origin) if origin is not None else None, ref_img.shape)
+        entry = self.reference_cache.get(key)
+        if entry is None:
+            images, kept = [], []
+            for path in paths:
+                if origin is not None:
+                    img = self.reference_window(path, tuple(origin), ref_img.shape[:2])
+                else:
+                    img = self.load_reference(path)
+                if img is None or img.shape != ref_img.shape:
+                    print(f"[Inspection] Skipping reference {path}: missing or not {ref_img.shape[1]}x{ref_img.shape[0]}")
+                    continue
+                images.append(img)
+                kept.append(path)
+            entry = (np.stack(images) if len(images) > 1 else None, kept)
+            self.reference_cache[key] = entry
+        return entry
+
+    def learn(self, position, test_img, origin=None, save=True):
+        """Align a known-good frame (ndarray or path) and add its ROI to the position's template."""
+        ref_data = self.ref_config.get(str(position))
+        model = self.template_model(position)
+        test_img = self.to_gray(test_img)
+        if not ref_data or model is None or test_img is None:
+            return False
+        ref_img, roi = self.reference_for(ref_data, test_img, origin)
+        if ref_img is None:
+            return False
+        strategy = self.align_positions.get(str(position), self.align_strategy)
+        _, crop, _ = self.aligned_crops(ref_img, test_img, roi, strategy)
+        return self.learn_crop(position, model, crop, save)
+
+    def inspect(self, position, test_img, origin=None):
+        """
+        Inspect one position. test_img is the grabbed frame (ndarray, used
+        directly) or the path of a saved image. origin is (offset_x, offset_y,
+        binning) when the frame is a windowed sensor readout; the reference
+        and ROI are then translated into the window.
+        Returns {"score", "label", "composite", "cached"} or None. Identical
+        pixels inspected with the same reference and settings are answered
+        from the result cache without aligning or scoring again.
+        With Inspection_Cascade enabled the ROI is first scored on a pyrDown
+        pyramid level; only scores within `band` of the threshold are
+        re-scored at full resolution (and with Gabor, if enabled). The
+        result's "stage" says which level decided.
+        A position with several reference images is scored against all of
+        them in one batched SSIM pass and takes the best match; the result's
+        "reference" names it.
+        With Weld_Template_Model enabled, a position whose template has
+        min_samples OK parts is scored at full resolution by its z-score
+        anomaly area instead of SSIM, and OK parts are added to the template.
+        """
+        print(f"[Inspection] Starting weld inspection for position {position}")
+        ref_data = self.ref_config.get(str(position))
+        if not ref_data:
+            print(f"[Inspection] No reference data found for position {position}")
+            return
+
+        roi = ref_data["roi"]
+        ref_img_path = self.reference_paths(ref_data)[0]
         mode = "Gabor" if self.use_gabor else "Raw"
-        result_text = f"POS {position} : {label} (SSIM-{mode}: {score:.3f})"
+        strategy = self.align_positions.get(str(position), self.align_strategy)
+        model = self.template_model(position)
+        use_template = model is not None and model.ready(self.template_min_samples)
+
+        cache_key = None
+        if self.result_cache is not None:
+            try:
+                cache_key = self.result_cache.key(
+                    test_img, roi=roi,
+                    references=[self.result_cache.file_digest(path) for path in self.reference_paths(ref_data)],
+                    origin=list(origin) if origin is not None else None, mode=mode, threshold=SSIM_THRESHOLD,
+                    cascade=[self.cascade_levels, self.cascade_band] if self.cascade_levels else None,
+                    alignment=[strategy, self.min_response, self.aligner.margin],
+                    template=[model.count, self.template_z, self.template_sigma_floor, self.template_max_area]
+                    if use_template else None,
+                )
+            except OSError:
+                cache_key = None
+            cached = self.result_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                print("[Inspection]", cached["text"], "(cached)")
+                self.results.append((position, cached["text"], cached["composite"]))
+                return dict(cached, cached=True)
+
+        test_img = self.to_gray(test_img)
+        ref_img = None
+        if test_img is not None:
+            ref_img, roi = self.reference_for(ref_data, test_img, origin)
+
+        if test_img is None or ref_img is None:
+            print("[Inspection] Could not load test or reference image.")
+            return
+        ref_stack, ref_paths = self.reference_stack(ref_data, ref_img, origin)
+        best = None
+
+        stage = "full"
+        # A ready template is more sensitive than coarse SSIM, so it always decides
+        if self.cascade_levels > 0 and not use_template:
+            # Coarse stage: align and score the downsampled images; only
+            # scores inside the band around the threshold go to full resolution.
+            scale = 2 ** self.cascade_levels
+            ref_key = (ref_img_path, tuple(origin) if origin is not None else None, ref_img.shape)
+            coarse_ref = self.reference_pyramid(ref_key, ref_img)
+            coarse_stack = self.reference_pyramid(ref_key + ("stack",), ref_stack) if ref_stack is not None else None
+            coarse_roi = [v // scale for v in roi]
+            score, diff, ref_crop, test_crop, alignment, best = self.compare(
+                coarse_ref, self.pyramid(test_img), coarse_roi, False, strategy, self.aligner.margin // scale,
+                coarse_stack)
+            if abs(score - SSIM_THRESHOLD) > self.cascade_band:
+                stage = "coarse"
+                mode = "Coarse"
+        roi_crop = None
+        metric = None
+        if stage == "full":
+            best = None
+            ref_crop, roi_crop, alignment = self.aligned_crops(ref_img, test_img, roi, strategy)
+            if use_template and model.shape == roi_crop.shape:
+                # Golden template: z-score map and anomalous area instead of SSIM
+                score, label, diff, ref_crop, area = self.template_score(model, roi_crop)
+                test_crop = roi_crop
+                mode = "Template"
+                metric = f"Template: {area * 100:.2f}% above {self.template_z:g} sigma"
+            elif ref_stack is not None:
+                score, diff, ref_crop, test_crop, best = self.batch_ssim_score(ref_stack, roi, roi_crop, self.use_gabor)
+            else:
+                score, diff, ref_crop, test_crop = self.ssim_score(ref_crop, roi_crop, self.use_gabor)
+        self.stage_counts[stage] += 1
+        print(f"[Alignment] POS {position}: {alignment}")
+
+        heatmap = cv2.applyColorMap(255 - diff, cv2.COLORMAP_JET)
+
+        if metric is None:
+            label = "OK" if score > SSIM_THRESHOLD else "NG"
+            metric = f"SSIM-{mode}: {score:.3f}"
+            if best is not None:
+                metric += f", ref {best + 1}/{len(ref_paths)}"
+        result_text = f"POS {position} : {label} ({metric})"
         print("[Inspection]", result_text)
+        if label == "OK" and roi_crop is not None and model is not None and self.template_update_on_ok:
+            self.learn_crop(position, model, roi_crop)
 
         ref_vis = cv2.cvtColor(ref_crop, cv2.COLOR_GRAY2BGR)
         test_vis = cv2.cvtColor(test_crop, cv2.COLOR_GRAY2BGR)
@@ -103,17 +445,118 @@ class WeldInspector:
         color = (0, 255, 0) if label == "OK" else (0, 0, 255)
         cv2.putText(combined, result_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
 
-        filename = os.path.join(self.output_dir, f"scan_pos{position}_{label}_{mode}_SSIM{score:.3f}.jpg")
+        score_name = "Score" if mode == "Template" else "SSIM"
+        # Cached results point at their composite, so it is named per frame and settings
+        # (a later inspection with the same score would otherwise overwrite it)
+        suffix = f"_{hashlib.blake2b(cache_key.encode('ascii'), digest_size=6).hexdigest()}" if cache_key else ""
+        filename = os.path.join(self.output_dir,
+                                f"scan_pos{position}_{label}_{mode}_{score_name}{score:.3f}{suffix}.jpg")
         cv2.imwrite(filename, combined)
 
         self.results.append((position, result_text, combined))
 
+        result = {"score": float(score), "label": label, "composite": filename, "text": result_text, "stage": stage,
+                  "alignment": alignment, "reference": ref_paths[best] if best is not None else ref_img_path}
+        if cache_key:
+            self.result_cache.put(cache_key, result)
+        return dict(result, cached=False)
+
     def show_all_results(self):
         print("[Inspection] Robot returned home. Displaying all weld inspections...")
-        for _, result_text, image in sorted(self.results):
+        self.save_templates()
+        if self.cascade_levels:
+            print(f"[Inspection] Decided at coarse stage: {self.stage_counts['coarse']}, "
+                  f"full resolution: {self.stage_counts['full']}")
+        for _, result_text, image in sorted(self.results, key=lambda r: (r[0], r[1])):
+            if isinstance(image, str):
+                image = cv2.imread(image)
+                if image is None:
+                    continue
             cv2.imshow("Weld Inspection", image)
             print(result_text)
             cv2.waitKey(1000)
         cv2.destroyAllWindows()
         self.results.clear()
 
+
+
+def benchmark_cascade(config, levels=1, band=0.2):
+    """
+    Inspect every reference image and perturbed copies of it (shift, blur,
+    noise, a covered weld) with the full path and the cascade. Returns the
+    mean latency of each, the cascade's stage counts with the mean latency
+    per exit stage, and every case where the two labels disagree.
+    """
+    import tempfile
+    import time
+
+    def make(cascade):
+        cfg = dict(config, Inspection_Cache={"enabled": False},
+                   Inspection_Cascade={"enabled": cascade, "levels": levels, "band": band})
+        inspector = WeldInspector(cfg)
+        inspector.output_dir = tempfile.mkdtemp(prefix="cascade_bench_")
+        return inspector
+
+    rng = np.random.default_rng(0)
+    cases = []
+    for position, ref_data in config["Weld_Reference_ROIs"].items():
+        ref = cv2.imread(WeldInspector.reference_paths(ref_data)[0], cv2.IMREAD_GRAYSCALE)
+        if ref is None:
+            continue
+        x, y, w, h = ref_data["roi"]
+        covered = ref.copy()
+        covered[y + h // 4:y + 3 * h // 4, x + w // 4:x + 3 * w // 4] = int(ref.mean())
+        noisy = np.clip(ref + rng.normal(0, 25, ref.shape), 0, 255).astype(np.uint8)
+        cases += [
+            (position, "reference", ref),
+            (position, "shift", np.roll(ref, (9, -14), axis=(0, 1))),
+            (position, "blur", cv2.GaussianBlur(ref, (9, 9), 3)),
+            (position, "noise", noisy),
+            (position, "covered", covered),
+        ]
+
+    latency = {}
+    results = {}
+    inspectors = {"full": make(False), "cascade": make(True)}
+    for name, inspector in inspectors.items():
+        latency[name], results[name] = [], []
+        for position, _, img in cases:
+            start = time.perf_counter()
+            results[name].append(inspector.inspect(position, img))
+            latency[name].append(time.perf_counter() - start)
+    labels = {name: [r["label"] for r in rs] for name, rs in results.items()}
+    stage_ms = {
+        stage: float(np.mean([t for t, r in zip(latency["cascade"], results["cascade"]) if r["stage"] == stage])) * 1000
+        for stage in ("coarse", "full") if any(r["stage"] == stage for r in results["cascade"])
+    }
+    disagreements = [
+        (position, variant, full, cascade)
+        for (position, variant, _), full, cascade in zip(cases, labels["full"], labels["cascade"])
+        if full != cascade
+    ]
+    return {
+        "cases": len(cases),
+        "full_ms": float(np.mean(latency["full"])) * 1000 if cases else 0.0,
+        "cascade_ms": float(np.mean(latency["cascade"])) * 1000 if cases else 0.0,
+        "stage_counts": inspectors["cascade"].stage_counts,
+        "stage_ms": stage_ms,
+        "disagreements": disagreements,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    import yaml
+
+    with open(sys.argv[1] if len(sys.argv) > 1 else "Config/config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    cascade_cfg = config.get("Inspection_Cascade") or {}
+    report = benchmark_cascade(config, cascade_cfg.get("levels", 1), cascade_cfg.get("band", 0.2))
+    print(f"{report['cases']} inspections: full {report['full_ms']:.1f} ms, cascade {report['cascade_ms']:.1f} ms mean")
+    for stage, count in report["stage_counts"].items():
+        print(f"Cascade exits at {stage}: {count} ({report['stage_ms'].get(stage, 0.0):.1f} ms mean)")
+    for position, variant, full, cascade in report["disagreements"]:
+        print(f"Label mismatch at position {position} ({variant}): full {full}, cascade {cascade}")
+    if not report["disagreements"]:
+        print("No label disagreements.")
@@ -0,0 +1,134 @@
+import cv2
+import numpy as np
+
+STRATEGIES = ("phase", "phase_logpolar", "orb")
+
+
+class PhaseAligner:
+    """
+    Translation (and optionally rotation/scale) estimate by phase
+    correlation on a window around the weld ROI.
+
+    The reference window is Hanning-weighted and transformed once and kept
+    per reference image and window, so every inspection only transforms the
+    test window. With log_polar, rotation and scale are first recovered
+    from the log-polar resampled magnitude spectra (also cached for the
+    reference), the test image is corrected, and the translation is
+    estimated on the corrected window.
+    """
+
+    def __init__(self, margin=64):
+        self.margin = margin
+        self.reference_cache = {}
+
+    @staticmethod
+    def window(roi, shape, margin):
+        """ROI grown by margin and clamped to the image: (x0, y0, x1, y1)."""
+        x, y, w, h = roi
+        height, width = shape[:2]
+        x0, y0 = max(x - margin, 0), max(y - margin, 0)
+        x1, y1 = min(x + w + margin, width), min(y + h + margin, height)
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _spectrum(patch, hann, size):
+        f = patch.astype(np.float32) * hann
+        f = cv2.copyMakeBorder(f, 0, size[0] - f.shape[0], 0, size[1] - f.shape[1], cv2.BORDER_CONSTANT, 0)
+        return cv2.dft(f, flags=cv2.DFT_COMPLEX_OUTPUT)
+
+    @staticmethod
+    def _correlate(ref_spec, test_spec):
+        """
+        Normalized cross-power spectrum peak. Returns ((dx, dy), response):
+        the shift that moves the test onto the reference and the summed
+        correlation around the peak (about 1.0 for a translated copy, near
+        0 for unrelated images).
+        """
+        cross = cv2.mulSpectrums(ref_spec, test_spec, 0, conjB=True)
+        magnitude = cv2.magnitude(cross[..., 0], cross[..., 1])
+        cross /= np.maximum(magnitude, 1e-9)[..., None]
+        corr = cv2.idft(cross, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+        rows, cols = corr.shape
+        py, px = np.unravel_index(int(np.argmax(corr)), corr.shape)
+        ys = (np.arange(py - 1, py + 2) % rows)
+        xs = (np.arange(px - 1, px + 2) % cols)
+        patch = np.maximum(corr[np.ix_(ys, xs)], 0)
+        response = float(patch.sum())
+        if response > 0:
+            dy = py + float((patch.sum(axis=1) * [-1, 0, 1]).sum()) / response
+            dx = px + float((patch.sum(axis=0) * [-1, 0, 1]).sum()) / response
+        else:
+            dy, dx = float(py), float(px)
+        # Peaks past the middle are negative shifts (circular correlation)
+        if dy > rows / 2:
+            dy -= rows
+        if dx > cols / 2:
+            dx -= cols
+        return (dx, dy), response
+
+    @staticmethod
+    def _log_polar(spec):
+        magnitude = cv2.magnitude(spec[..., 0], spec[..., 1])
+        magnitude = np.fft.fftshift(np.log1p(magnitude)).astype(np.float32)
+        rows, cols = magnitude.shape
+        radius = min(rows, cols) / 2.0
+        polar = cv2.warpPolar(magnitude, (cols, rows), (cols / 2.0, rows / 2.0), radius,
+                              cv2.WARP_POLAR_LOG | cv2.INTER_LINEAR)
+        return polar, radius
+
+    def _reference(self, ref_img, bounds, log_polar):
+        key = (id(ref_img), bounds, log_polar)
+        entry = self.reference_cache.get(key)
+        if entry is None or entry["image"] is not ref_img:
+            x0, y0, x1, y1 = bounds
+            patch = ref_img[y0:y1, x0:x1]
+            size = (cv2.getOptimalDFTSize(patch.shape[0]), cv2.getOptimalDFTSize(patch.shape[1]))
+            hann = cv2.createHanningWindow((patch.shape[1], patch.shape[0]), cv2.CV_32F)
+            spec = self._spectrum(patch, hann, size)
+            entry = {"image": ref_img, "hann": hann, "size": size, "spec": spec}
+            if log_polar:
+                # Rotation is only a rotation of the spectrum on a square
+                # frequency grid, so elongated windows are padded to a square
+                side = cv2.getOptimalDFTSize(max(patch.shape))
+                entry["square_size"] = (side, side)
+                polar, radius = self._log_polar(self._spectrum(patch, hann, entry["square_size"]))
+                entry["polar_size"] = polar.shape
+                entry["polar_spec"] = cv2.dft(polar, flags=cv2.DFT_COMPLEX_OUTPUT)
+                entry["radius"] = radius
+            self.reference_cache[key] = entry
+        return entry
+
+    def estimate(self, ref_img, test_img, roi, log_polar=False, margin=None):
+        """
+        Returns (M, response): the 2x3 affine matrix mapping the test image
+        onto the reference and the translation peak response.
+        """
+        bounds = self.window(roi, ref_img.shape, self.margin if margin is None else margin)
+        x0, y0, x1, y1 = bounds
+        ref = self._reference(ref_img, bounds, log_polar)
+        M = np.float32([[1, 0, 0], [0, 1, 0]])
+
+        if log_polar:
+            test_spec = self._spectrum(test_img[y0:y1, x0:x1], ref["hann"], ref["square_size"])
+            polar, _ = self._log_polar(test_spec)
+            (d_log, d_angle), _ = self._correlate(ref["polar_spec"], cv2.dft(polar, flags=cv2.DFT_COMPLEX_OUTPUT))
+            rows, cols = ref["polar_size"]
+            # Magnitude spectra are symmetric: the angle is only known modulo 180 degrees
+            angle = (d_angle * 360.0 / rows + 90.0) % 180.0 - 90.0
+            scale = np.exp(d_log * np.log(ref["radius"]) / cols)
+            if abs(angle) > 1e-3 or abs(scale - 1.0) > 1e-4:
+                center = ((x0 + x1) / 2.0, (y0 + y1) / 2.0)
+                M = cv2.getRotationMatrix2D(center, -angle, 1.0 / scale).astype(np.float32)
+
+        if M[0, 1] != 0 or M[0, 0] != 1:
+            # Only the window is resampled, not the whole frame
+            M_window = M.copy()
+            M_window[:, 2] -= (x0, y0)
+            patch = cv2.warpAffine(test_img, M_window, (x1 - x0, y1 - y0))
+        else:
+            patch = test_img[y0:y1, x0:x1]
+        test_spec = self._spectrum(patch, ref["hann"], ref["size"])
+        (dx, dy), response = self._correlate(ref["spec"], test_spec)
+        M[0, 2] += dx
+        M[1, 2] += dy
+        return M, response
@@ -0,0 +1,253 @@
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LEGACY_FORMAT = "xz_array"
+
+
+def available_codecs() -> List[str]:
+    codecs = ["zlib"]
+    if lz4_frame is not None:
+        codecs.append("lz4")
+    if zstandard is not None:
+        codecs.append("zstd")
+    return codecs
+
+
+def _compress(data: bytes, codec: str, level: int) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, level)
+    if codec == "lz4":
+        return lz4_frame.compress(data, compression_level=level)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unknown XZ codec: {codec}")
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "lz4":
+        return lz4_frame.decompress(data)
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown XZ codec: {codec}")
+
+
+def _shuffle(arr: np.ndarray) -> bytes:
+    """Group byte 0 of every element, then byte 1, ... (HDF5/Blosc style shuffle)."""
+    return arr.view(np.uint8).reshape(-1, arr.dtype.itemsize).T.tobytes()
+
+
+def _unshuffle(data: bytes, dtype: np.dtype) -> np.ndarray:
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, -1).T.copy().view(dtype).ravel()
+
+
+def format_string(codec: str, filters: List[str], precision: Optional[int]) -> str:
+    parts = [LEGACY_FORMAT, f"codec={codec}"]
+    if filters:
+        parts.append("filter=" + "+".join(filters))
+    if precision is not None:
+        parts.append(f"precision={precision}")
+    return ";".join(parts)
+
+
+def parse_format(fmt: str) -> Dict[str, str]:
+    name, *params = fmt.split(";")
+    parsed = {"name": name.strip()}
+    for param in params:
+        key, _, value = param.partition("=")
+        parsed[key.strip()] = value.strip()
+    return parsed
+
+
+def encode_xz(
+    xz_data: np.ndarray,
+    codec: str = "zlib",
+    level: int = 1,
+    delta: bool = True,
+    shuffle: bool = True,
+    precision: Optional[int] = None,
+) -> Tuple[bytes, str]:
+    """
+    Encode an (N, 2) XZ array.
+    - precision: decimal places to keep; values are quantized to int32 at that
+      resolution (the sensor's native X/Z precision). None keeps float32 bits,
+      which is also used when the array holds NaN/inf or values too large to
+      quantize (the returned format says which path was taken).
+    - delta: store differences between consecutive points per axis
+      (integer subtraction when quantized, XOR of the float bits otherwise)
+    - shuffle: byte-shuffle before compression
+    Returns (payload, format) where format is declared in raw_data.format.
+    """
+    if codec not in available_codecs():
+        print(f"[XZCodec] Codec '{codec}' not installed, falling back to zlib.")
+        codec = "zlib"
+
+    # Planar layout (all X, then all Z) keeps each axis contiguous for delta
+    planar = np.ascontiguousarray(np.asarray(xz_data, dtype=np.float32).T)
+    filters = []
+
+    if precision is not None:
+        scaled = np.rint(planar.astype(np.float64) * (10 ** precision))
+        # NaN (missing points) and values past int32 cannot be quantized; the
+        # 2**30 bound also keeps the deltas inside int32
+        if not np.all(np.abs(scaled) < 2 ** 30):
+            print(f"[XZCodec] Values not representable at precision {precision}, storing float32 bits.")
+            precision = None
+
+    if precision is not None:
+        values = scaled.astype(np.int32)
+        if delta:
+            values[:, 1:] = np.diff(values, axis=1)
+            filters.append("delta")
+    else:
+        values = planar.view(np.uint32).copy()
+        if delta:
+            values[:, 1:] ^= values[:, :-1].copy()
+            filters.append("xor")
+
+    if shuffle:
+        raw = _shuffle(values.ravel())
+        filters.append("shuffle")
+    else:
+        raw = values.tobytes()
+
+    return _compress(raw, codec, level), format_string(codec, filters, precision)
+
+
+def decode_xz(payload: bytes, fmt: str) -> np.ndarray:
+    """Decode a payload produced by encode_xz (or the legacy zlib float32 format)."""
+    params = parse_format(fmt)
+    if "codec" not in params:
+        return np.frombuffer(zlib.decompress(payload), dtype=np.float32).reshape(-1, 2)
+
+    filters = params.get("filter", "").split("+") if params.get("filter") else []
+    precision = int(params["precision"]) if "precision" in params else None
+    dtype = np.int32 if precision is not None else np.uint32
+
+    raw = _decompress(payload, params["codec"])
+    if "shuffle" in filters:
+        values = _unshuffle(raw, dtype)
+    else:
+        values = np.frombuffer(raw, dtype=dtype).copy()
+    values = values.reshape(2, -1)
+
+    if "delta" in filters:
+        values = np.cumsum(values, axis=1, dtype=np.int32)
+    elif "xor" in filters:
+        values = np.bitwise_xor.accumulate(values, axis=1)
+
+    if precision is not None:
+        planar = (values / (10 ** precision)).astype(np.float32)
+    else:
+        planar = values.view(np.float32)
+    return np.ascontiguousarray(planar.T)
+
+
+def write_xz_file(path: str, xz_data: np.ndarray, **codec_options) -> str:
+    """Write an XZ array to disk as '<format>\\n<payload>'. Returns the format used."""
+    payload, fmt = encode_xz(xz_data, **codec_options)
+    with open(path, "wb") as f:
+        f.write(fmt.encode("ascii") + b"\n")
+        f.write(payload)
+    return fmt
+
+
+def read_xz_file(path: str) -> np.ndarray:
+    with open(path, "rb") as f:
+        fmt = f.readline().decode("ascii").strip()
+        return decode_xz(f.read(), fmt)
+
+
+def load_profile_log(path: str) -> List[np.ndarray]:
+    """Parse a profile_log.txt / profile_center.txt recording into (N, 2) XZ arrays."""
+    profiles = []
+    x_values = None
+    with open(path, "r") as f:
+        for line in f:
+            if line.startswith("X:"):
+                x_values = line[2:].strip()
+            elif line.startswith("Z:") and x_values is not None:
+                z_values = line[2:].strip()
+                if x_values and z_values:
+                    x = np.array(x_values.split(","), dtype=np.float32)
+                    z = np.array(z_values.split(","), dtype=np.float32)
+                    n = min(len(x), len(z))
+                    profiles.append(np.stack([x[:n], z[:n]], axis=1))
+                x_values = None
+    return profiles
+
+
+def benchmark(profiles: List[np.ndarray], repeat: int = 5) -> List[Dict[str, float]]:
+    """Compression ratio and MB/s (encode/decode) per codec configuration."""
+    configs = []
+    for codec in available_codecs():
+        configs.append({"codec": codec, "delta": False, "shuffle": False, "precision": None})
+        configs.append({"codec": codec, "delta": True, "shuffle": True, "precision": None})
+        configs.append({"codec": codec, "delta": True, "shuffle": True, "precision": 2})
+
+    raw_bytes = sum(p.astype(np.float32).nbytes for p in profiles)
+    results = []
+
+    baseline_start = time.perf_counter()
+    for _ in range(repeat):
+        baseline_size = sum(len(zlib.compress(p.astype(np.float32).tobytes())) for p in profiles)
+    baseline_s = (time.perf_counter() - baseline_start) / repeat
+    results.append({
+        "name": "legacy zlib-6 float32",
+        "ratio": raw_bytes / baseline_size,
+        "encode_mb_s": raw_bytes / baseline_s / 1e6,
+        "decode_mb_s": float("nan"),
+    })
+
+    for options in configs:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            encoded = [encode_xz(p, **options) for p in profiles]
+        encode_s = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for payload, fmt in encoded:
+                decode_xz(payload, fmt)
+        decode_s = (time.perf_counter() - start) / repeat
+
+        size = sum(len(payload) for payload, _ in encoded)
+        results.append({
+            "name": encoded[0][1] if encoded else options["codec"],
+            "ratio": raw_bytes / size,
+            "encode_mb_s": raw_bytes / encode_s / 1e6,
+            "decode_mb_s": raw_bytes / decode_s / 1e6,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    import glob
+    import sys
+
+    paths = sys.argv[1:] or glob.glob("profiler_data/*/profile_log.txt")
+    profiles = [p for path in paths for p in load_profile_log(path)]
+    if not profiles:
+        print("No non-empty profiles in recordings, using a synthetic 1280-point profile.")
+        x = np.linspace(-40.0, 40.0, 1280, dtype=np.float32)
+        z = (120.0 + 3.0 * np.sin(x / 7.0) - 5.0 * ((x > 5) & (x < 9))).astype(np.float32)
+        profiles = [np.stack([x, z + np.float32(0.01 * i)], axis=1) for i in range(200)]
+
+    print(f"{len(profiles)} profiles, codecs available: {', '.join(available_codecs())}")
+    for r in benchmark(profiles):
+        print(f"{r['name']:<55} ratio {r['ratio']:6.2f}  enc {r['encode_mb_s']:8.1f} MB/s  dec {r['decode_mb_s']:8.1f} MB/s")